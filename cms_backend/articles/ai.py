@@ -0,0 +1,543 @@
+# articles/ai.py
+"""
+Gemini client and the shared call path behind every AI feature.
+
+Views (sync and async) go through the ``run_*`` / ``arun_*`` helpers so the
+prompts, result cache and usage accounting live in one place.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from dotenv import load_dotenv
+from google import genai
+from google.genai import types
+from django.db import connection, transaction
+from .models import AIUsage
+from .quota import charge_quota
+from .resilience import get_caller
+from .resilience import get_setting as get_resilience_setting
+from .singleflight import acoalesced_call, coalesced_call
+from .usage import apply_rollups
+from .usage_buffer import buffering_enabled, get_usage_buffer, make_event
+from . import local_sentiment
+from .ai_cache import get_ai_cache, make_key
+from .chunking import get_setting as get_chunking_setting
+from .chunking import split_markdown
+from .fake_gemini import client_from_settings, fake_gemini_enabled
+from .metrics import observe_usage, time_gemini
+from .prompts import (
+    CONTENT_LIMIT,
+    GENERATE_PROMPT,
+    SENTIMENT_CHUNK_PROMPT,
+    SENTIMENT_PROMPT,
+    SENTIMENT_REDUCE_PROMPT,
+    SUMMARIZE_CHUNK_PROMPT,
+    SUMMARIZE_FALLBACK_LIMIT,
+    SUMMARIZE_FALLBACK_PROMPT,
+    SUMMARIZE_PROMPT,
+    SUMMARIZE_REDUCE_PROMPT,
+)
+
+# Load env
+load_dotenv()
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+
+# Init Gemini client (safe); AI_FAKE_GEMINI swaps in the offline stand-in
+try:
+    if fake_gemini_enabled():
+        client = client_from_settings()
+    else:
+        client = genai.Client(api_key=GEMINI_API_KEY) if GEMINI_API_KEY else None
+except Exception as e:
+    print("⚠️ Gemini init error:", e)
+    client = None
+
+# Article field each per-article feature's result is written back to
+ARTICLE_RESULT_FIELDS = {"summarize": "summary", "sentiment": "sentiment"}
+
+# (map prompt, reduce prompt) for articles longer than one chunk
+CHUNKED_PROMPTS = {
+    "summarize": (SUMMARIZE_CHUNK_PROMPT, SUMMARIZE_REDUCE_PROMPT),
+    "sentiment": (SENTIMENT_CHUNK_PROMPT, SENTIMENT_REDUCE_PROMPT),
+}
+
+# Token pricing example: $0.02 per 1k tokens -> 0.00002 per token
+TOKEN_PRICE = 0.00002
+
+
+def extract_gemini_text(resp):
+    """
+    Robust extractor for Gemini generate_content responses.
+    Returns the best available text or empty string.
+    """
+    if not resp:
+        return ""
+
+    # common attribute
+    try:
+        if hasattr(resp, "text") and resp.text:
+            return resp.text.strip()
+    except Exception:
+        pass
+
+    # other possible attributes
+    try:
+        if hasattr(resp, "output_text") and resp.output_text:
+            return resp.output_text.strip()
+    except Exception:
+        pass
+
+    # candidates -> candidate.content.parts[*].text
+    try:
+        if hasattr(resp, "candidates") and resp.candidates:
+            cand = resp.candidates[0]
+            content = getattr(cand, "content", None)
+            parts = getattr(content, "parts", None)
+            if parts:
+                texts = []
+                for p in parts:
+                    # p may be dict-like or object-like
+                    text = getattr(p, "text", None) if hasattr(p, "text") else (p.get("text") if isinstance(p, dict) else None)
+                    if text:
+                        texts.append(text)
+                if texts:
+                    return " ".join(texts).strip()
+    except Exception:
+        pass
+
+    # parsed (if present)
+    try:
+        if hasattr(resp, "parsed") and resp.parsed:
+            return str(resp.parsed).strip()
+    except Exception:
+        pass
+
+    return ""
+
+
+def gemini_config(spec, timeout):
+    """
+    The spec's generation config with ``timeout`` (seconds) as the HTTP timeout.
+    """
+    return types.GenerateContentConfig(**spec.config(), http_options=types.HttpOptions(timeout=int(timeout * 1000)))
+
+
+def call_gemini(spec, prompt):
+    """
+    Run one prompt against Gemini with the spec's model + generation config,
+    through the resilience layer (timeouts, retries, circuit breaker).
+    """
+    def attempt(timeout):
+        with time_gemini(spec.feature, spec.model):
+            resp = client.models.generate_content(
+                model=spec.model,
+                contents=[types.Part(text=prompt)],
+                config=gemini_config(spec, timeout),
+            )
+        return extract_gemini_text(resp)
+
+    return get_caller().call(attempt)
+
+
+def stream_gemini(spec, prompt):
+    """
+    Yield response chunks for one prompt; guarded by the circuit breaker but
+    never retried, since earlier chunks may already be on their way out.
+    """
+    def timed():
+        with time_gemini(spec.feature, spec.model):
+            yield from client.models.generate_content_stream(
+                model=spec.model,
+                contents=[types.Part(text=prompt)],
+                config=gemini_config(spec, get_resilience_setting("TIMEOUT")),
+            )
+
+    return get_caller().guard_stream(timed())
+
+
+def result_cache_key(spec, text):
+    feature = f"{spec.feature}:{spec.stage}" if spec.stage else spec.feature
+    return make_key(feature, spec.model, spec.version, spec.config(), text)
+
+
+def cached_ai_call(spec, text, compute, refresh=False):
+    """
+    Return (result_text, cached, coalesced) for ``spec`` applied to ``text``.
+    ``compute`` is only called on a cache miss (or when ``refresh`` is set),
+    and only once for identical calls in flight at the same time (see
+    articles/singleflight.py); empty results are never cached.
+    """
+    key = result_cache_key(spec, text)
+    cache = get_ai_cache()
+    if not cache.enabled_for(spec.feature):
+        result, coalesced = coalesced_call(key, compute)
+        return result, False, coalesced
+
+    if not refresh:
+        hit = cache.get(key)
+        if hit and hit.get("text"):
+            return hit["text"], True, False
+
+    result, coalesced = coalesced_call(key, compute)
+    if result and not coalesced:
+        # the leader of a coalesced call already stored it
+        cache.set(key, {"text": result}, feature=spec.feature, model=spec.model)
+    return result, False, coalesced
+
+
+def estimate_usage(source_text, output_text, cached=False, coalesced=False):
+    """
+    Return (tokens, estimated_cost). Cached results, and results shared from
+    an identical call already in flight, cost nothing upstream.
+    """
+    if cached or coalesced:
+        return 0, 0.0
+    tokens = max((len(source_text) + len(output_text)) // 4, 1)
+    return tokens, round(tokens * TOKEN_PRICE, 6)
+
+
+def record_usage(user, article, feature, tokens, estimated_cost, cached=False, coalesced=False, local=False):
+    """
+    Record one AI call. With AI_USAGE_BUFFER enabled the row is queued and
+    written in a batch off the request path; otherwise it is inserted now.
+    ``local`` marks results answered in-process without calling Gemini.
+    """
+    charge_quota(user.pk, tokens)
+    observe_usage(feature, tokens, estimated_cost, cached=cached, coalesced=coalesced, local=local)
+    if buffering_enabled():
+        get_usage_buffer().add(
+            make_event(user, article, feature, tokens, estimated_cost, cached=cached, coalesced=coalesced, local=local)
+        )
+        return
+    with transaction.atomic():
+        row = AIUsage.objects.create(
+            user=user,
+            article=article,
+            feature=feature,
+            tokens_used=tokens,
+            estimated_cost=estimated_cost,
+            cached=cached,
+            coalesced=coalesced,
+            local=local,
+        )
+        apply_rollups([row])
+
+
+# ----------------- FEATURES -----------------
+def run_generate(topic, refresh=False):
+    return cached_ai_call(
+        GENERATE_PROMPT, topic, refresh=refresh,
+        compute=lambda: call_gemini(GENERATE_PROMPT, GENERATE_PROMPT.render(topic=topic)),
+    )
+
+
+def lost_branch_biller(tally, sources):
+    """
+    ``on_lost`` for hedged calls: add the input of each losing branch (its
+    answer is empty or never seen) to ``tally``.
+    """
+    if tally is None:
+        return None
+    return lambda name: tally.add(sources[name], "", False, False)
+
+
+def summarize_text(content, refresh=False, tally=None):
+    # trim to reasonable length for model
+    content_short = content[:CONTENT_LIMIT]
+
+    fallback_source = content_short[:SUMMARIZE_FALLBACK_LIMIT]
+    fallback_prompt = SUMMARIZE_FALLBACK_PROMPT.render(content=fallback_source)
+
+    def compute():
+        # the simpler fallback prompt runs if the main one comes back empty, or
+        # (hedged mode) as soon as the main one is slower than HEDGE_DELAY;
+        # the branch whose answer is not used is still billed to ``tally``
+        return get_caller().hedge(
+            lambda: call_gemini(SUMMARIZE_PROMPT, SUMMARIZE_PROMPT.render(content=content_short)),
+            lambda: call_gemini(SUMMARIZE_FALLBACK_PROMPT, fallback_prompt),
+            on_lost=lost_branch_biller(tally, {"primary": content_short, "fallback": fallback_source}),
+        )
+
+    return cached_ai_call(SUMMARIZE_PROMPT, content_short, compute, refresh=refresh)
+
+
+def sentiment_text(content, refresh=False):
+    content_short = content[:CONTENT_LIMIT]
+    return cached_ai_call(
+        SENTIMENT_PROMPT, content_short, refresh=refresh,
+        compute=lambda: call_gemini(SENTIMENT_PROMPT, SENTIMENT_PROMPT.render(content=content_short)),
+    )
+
+
+# ----------------- MAP-REDUCE (long articles) -----------------
+class UsageTally:
+    """
+    Tokens, cost and cache outcomes summed over every model call behind one result.
+    """
+
+    def __init__(self):
+        self.tokens = 0
+        self.estimated_cost = 0.0
+        self.calls = 0
+        self.cached = 0
+        self.coalesced = 0
+        self.lock = threading.Lock()
+
+    def add(self, source_text, output_text, cached, coalesced):
+        tokens, estimated_cost = estimate_usage(source_text, output_text, cached, coalesced)
+        with self.lock:
+            self.tokens += tokens
+            self.estimated_cost += estimated_cost
+            self.calls += 1
+            self.cached += 1 if cached else 0
+            self.coalesced += 1 if coalesced else 0
+
+    def result(self, text, chunks):
+        """
+        Return (text, cached, coalesced, usage): cached when every call was a
+        cache hit, coalesced when none went upstream for this caller.
+        """
+        cached = self.calls > 0 and self.cached == self.calls
+        coalesced = not cached and self.coalesced > 0 and self.cached + self.coalesced == self.calls
+        usage = {"tokens_used": self.tokens, "estimated_cost": round(self.estimated_cost, 6), "chunks": chunks, "tier": "llm"}
+        return text, cached, coalesced, usage
+
+
+def content_chunks(content):
+    if not get_chunking_setting("ENABLED"):
+        return [content]
+    # a chunk is never longer than what a single prompt may carry
+    chunk_chars = min(get_chunking_setting("CHUNK_CHARS"), CONTENT_LIMIT)
+    return split_markdown(content, chunk_chars=chunk_chars) or [content]
+
+
+def reduce_input(partials):
+    return "\n\n".join(f"Section {i}: {text}" for i, text in enumerate(partials, 1) if text)
+
+
+def run_map_reduce(feature, chunks, refresh=False):
+    """
+    Run ``feature`` on every chunk in parallel (at most CONCURRENCY at once),
+    then combine the partial results with the feature's reduce prompt.
+    Chunk results are cached by chunk text, so after an edit only the changed
+    chunks and the reduce step go upstream.
+    """
+    chunk_spec, reduce_spec = CHUNKED_PROMPTS[feature]
+    tally = UsageTally()
+
+    def map_chunk(chunk):
+        try:
+            text, cached, coalesced = cached_ai_call(
+                chunk_spec, chunk, refresh=refresh,
+                compute=lambda: call_gemini(chunk_spec, chunk_spec.render(content=chunk)),
+            )
+        finally:
+            # cache tiers may have opened a DB connection in this worker thread
+            connection.close()
+        tally.add(chunk, text, cached, coalesced)
+        return text
+
+    workers = max(min(get_chunking_setting("CONCURRENCY"), len(chunks)), 1)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{feature}-chunk") as pool:
+        partials = list(pool.map(map_chunk, chunks))
+    if not any(partials):
+        return tally.result("", len(chunks))
+
+    combined = reduce_input(partials)
+    text, cached, coalesced = cached_ai_call(
+        reduce_spec, combined, refresh=refresh,
+        compute=lambda: call_gemini(reduce_spec, reduce_spec.render(content=combined)),
+    )
+    tally.add(combined, text, cached, coalesced)
+    return tally.result(text, len(chunks))
+
+
+def run_article_feature(feature, content, refresh=False):
+    """
+    Run a per-article feature. Returns (text, cached, coalesced, usage), where
+    usage holds tokens_used / estimated_cost summed over every model call and
+    the number of chunks the content was analyzed in.
+    """
+    chunks = content_chunks(content)
+    if len(chunks) > 1:
+        return run_map_reduce(feature, chunks, refresh=refresh)
+    tally = UsageTally()
+    if feature == "summarize":
+        text, cached, coalesced = summarize_text(content, refresh=refresh, tally=tally)
+    else:
+        text, cached, coalesced = sentiment_text(content, refresh=refresh)
+    tally.add(content, text, cached, coalesced)
+    return tally.result(text, 1)
+
+
+def run_summarize(content, refresh=False):
+    return run_article_feature("summarize", content, refresh=refresh)
+
+
+def local_sentiment_result(content, tier=None):
+    """
+    (result, confidence): the run_sentiment result when the local tier
+    answers (no tokens, no cost), else None and the local confidence.
+    """
+    text, confidence = local_sentiment.local_answer(content, tier=tier)
+    if text is None:
+        return None, confidence
+    usage = {"tokens_used": 0, "estimated_cost": 0.0, "chunks": 1, "tier": "local", "confidence": confidence}
+    return (text, False, False, usage), confidence
+
+
+def run_sentiment(content, refresh=False, tier=None):
+    """
+    Local classifier first (see articles/local_sentiment.py); Gemini only
+    below its confidence threshold. usage["tier"] says which one answered.
+    """
+    result, confidence = local_sentiment_result(content, tier=tier)
+    if result:
+        return result
+    if not client:
+        raise RuntimeError("Gemini client not initialized")
+    text, cached, coalesced, usage = run_article_feature("sentiment", content, refresh=refresh)
+    usage["confidence"] = confidence
+    return text, cached, coalesced, usage
+
+
+ARTICLE_RUNNERS = {"summarize": run_summarize, "sentiment": run_sentiment}
+
+
+# ----------------- ASYNC (client.aio) -----------------
+async def acall_gemini(spec, prompt):
+    async def attempt(timeout):
+        with time_gemini(spec.feature, spec.model):
+            resp = await client.aio.models.generate_content(
+                model=spec.model,
+                contents=[types.Part(text=prompt)],
+                config=gemini_config(spec, timeout),
+            )
+        return extract_gemini_text(resp)
+
+    return await get_caller().acall(attempt)
+
+
+async def acached_ai_call(spec, text, compute, refresh=False):
+    """
+    Async twin of cached_ai_call; ``compute`` is a coroutine function.
+    Cache tiers may touch the DB, so they run in the sync thread pool.
+    """
+    key = result_cache_key(spec, text)
+    cache = get_ai_cache()
+    if not cache.enabled_for(spec.feature):
+        result, coalesced = await acoalesced_call(key, compute)
+        return result, False, coalesced
+
+    if not refresh:
+        hit = await sync_to_async(cache.get)(key)
+        if hit and hit.get("text"):
+            return hit["text"], True, False
+
+    result, coalesced = await acoalesced_call(key, compute)
+    if result and not coalesced:
+        await sync_to_async(cache.set)(key, {"text": result}, feature=spec.feature, model=spec.model)
+    return result, False, coalesced
+
+
+async def arun_generate(topic, refresh=False):
+    async def compute():
+        return await acall_gemini(GENERATE_PROMPT, GENERATE_PROMPT.render(topic=topic))
+
+    return await acached_ai_call(GENERATE_PROMPT, topic, compute, refresh=refresh)
+
+
+async def asummarize_text(content, refresh=False, tally=None):
+    content_short = content[:CONTENT_LIMIT]
+
+    fallback_source = content_short[:SUMMARIZE_FALLBACK_LIMIT]
+    fallback_prompt = SUMMARIZE_FALLBACK_PROMPT.render(content=fallback_source)
+
+    async def compute():
+        return await get_caller().ahedge(
+            lambda: acall_gemini(SUMMARIZE_PROMPT, SUMMARIZE_PROMPT.render(content=content_short)),
+            lambda: acall_gemini(SUMMARIZE_FALLBACK_PROMPT, fallback_prompt),
+            on_lost=lost_branch_biller(tally, {"primary": content_short, "fallback": fallback_source}),
+        )
+
+    return await acached_ai_call(SUMMARIZE_PROMPT, content_short, compute, refresh=refresh)
+
+
+async def asentiment_text(content, refresh=False):
+    content_short = content[:CONTENT_LIMIT]
+
+    async def compute():
+        return await acall_gemini(SENTIMENT_PROMPT, SENTIMENT_PROMPT.render(content=content_short))
+
+    return await acached_ai_call(SENTIMENT_PROMPT, content_short, compute, refresh=refresh)
+
+
+async def arun_map_reduce(feature, chunks, refresh=False):
+    """
+    Async twin of run_map_reduce; a semaphore caps the chunks in flight.
+    """
+    chunk_spec, reduce_spec = CHUNKED_PROMPTS[feature]
+    tally = UsageTally()
+    limit = asyncio.Semaphore(max(get_chunking_setting("CONCURRENCY"), 1))
+
+    async def map_chunk(chunk):
+        async def compute():
+            return await acall_gemini(chunk_spec, chunk_spec.render(content=chunk))
+
+        async with limit:
+            text, cached, coalesced = await acached_ai_call(chunk_spec, chunk, compute, refresh=refresh)
+        tally.add(chunk, text, cached, coalesced)
+        return text
+
+    partials = await asyncio.gather(*(map_chunk(chunk) for chunk in chunks))
+    if not any(partials):
+        return tally.result("", len(chunks))
+
+    combined = reduce_input(partials)
+
+    async def reduce():
+        return await acall_gemini(reduce_spec, reduce_spec.render(content=combined))
+
+    text, cached, coalesced = await acached_ai_call(reduce_spec, combined, reduce, refresh=refresh)
+    tally.add(combined, text, cached, coalesced)
+    return tally.result(text, len(chunks))
+
+
+async def arun_article_feature(feature, content, refresh=False):
+    chunks = content_chunks(content)
+    if len(chunks) > 1:
+        return await arun_map_reduce(feature, chunks, refresh=refresh)
+    tally = UsageTally()
+    if feature == "summarize":
+        text, cached, coalesced = await asummarize_text(content, refresh=refresh, tally=tally)
+    else:
+        text, cached, coalesced = await asentiment_text(content, refresh=refresh)
+    tally.add(content, text, cached, coalesced)
+    return tally.result(text, 1)
+
+
+async def arun_summarize(content, refresh=False):
+    return await arun_article_feature("summarize", content, refresh=refresh)
+
+
+async def arun_sentiment(content, refresh=False, tier=None):
+    result, confidence = local_sentiment_result(content, tier=tier)
+    if result:
+        return result
+    if not client:
+        raise RuntimeError("Gemini client not initialized")
+    text, cached, coalesced, usage = await arun_article_feature("sentiment", content, refresh=refresh)
+    usage["confidence"] = confidence
+    return text, cached, coalesced, usage
+
+
+async def arecord_usage(user, article, feature, tokens, estimated_cost, cached=False, coalesced=False, local=False):
+    """
+    ``record_usage`` off the event loop: the quota charge may be a Redis
+    round-trip, and the row and its rollups are written in one transaction.
+    """
+    await sync_to_async(record_usage)(
+        user, article, feature, tokens, estimated_cost, cached=cached, coalesced=coalesced, local=local
+    )
@@ -0,0 +1,270 @@
+# articles/ai_cache.py
+"""
+Content-addressed cache for Gemini results.
+
+Entries are keyed by (feature, model, prompt version, generation config,
+sha256 of the input text), so a result is reused only when every input
+that could change the model output is identical. Lookups walk the
+configured tiers in order (fast in-process LRU first, persistent tier
+after) and backfill the faster tiers on a hit.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .metrics import record_cache_lookup
+
+
+DEFAULTS = {
+    "ENABLED": True,
+    "FEATURES": ["generate", "summarize", "sentiment"],
+    "TTL": 7 * 24 * 3600,
+    "TIERS": [
+        "articles.ai_cache.MemoryTier",
+        "articles.ai_cache.DatabaseTier",
+    ],
+    "MEMORY_MAX_ENTRIES": 1024,
+    "MEMORY_MAX_BYTES": 8 * 1024 * 1024,
+    "FILE_DIR": None,
+}
+
+
+def get_setting(name):
+    return getattr(settings, "AI_CACHE", {}).get(name, DEFAULTS[name])
+
+
+def hash_text(text):
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def make_key(feature, model, version, config, text):
+    """
+    Build the cache key for one model call. ``config`` is the generation
+    config dict; it is serialized with sorted keys so ordering never matters.
+    """
+    head = json.dumps([feature, model, version, config], sort_keys=True)
+    return hashlib.sha256(f"{head}|{hash_text(text)}".encode("utf-8")).hexdigest()
+
+
+# ----------------- TIERS -----------------
+class MemoryTier:
+    """
+    Per-process LRU with per-entry expiry, bounded by entry count and payload bytes.
+    """
+
+    def __init__(self, max_entries=None, max_bytes=None):
+        self.max_entries = max_entries or get_setting("MEMORY_MAX_ENTRIES")
+        self.max_bytes = max_bytes or get_setting("MEMORY_MAX_BYTES")
+        self._data = OrderedDict()  # key -> (expires_at, size, payload)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, _, payload = entry
+            if expires_at is not None and expires_at <= time.time():
+                self._pop(key)
+                return None
+            self._data.move_to_end(key)
+            return payload
+
+    def set(self, key, payload, ttl, feature="", model=""):
+        size = len(payload.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+            self._data[key] = (expires_at, size, payload)
+            self._bytes += size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._data))
+                self._pop(oldest)
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def _pop(self, key):
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+
+class DatabaseTier:
+    """
+    Persistent tier stored in the AIResultCache table; survives worker restarts
+    and is shared by every process pointing at the same database.
+    """
+
+    def get(self, key):
+        from .models import AIResultCache
+
+        entry = AIResultCache.objects.filter(key=key).only("payload", "expires_at").first()
+        if entry is None:
+            return None
+        if entry.expires_at is not None and entry.expires_at <= timezone.now():
+            AIResultCache.objects.filter(key=key).delete()
+            return None
+        return entry.payload
+
+    def set(self, key, payload, ttl, feature="", model=""):
+        from .models import AIResultCache
+
+        expires_at = timezone.now() + timedelta(seconds=ttl) if ttl else None
+        AIResultCache.objects.update_or_create(
+            key=key,
+            defaults={"feature": feature, "model": model, "payload": payload, "expires_at": expires_at},
+        )
+
+    def delete(self, key):
+        from .models import AIResultCache
+
+        AIResultCache.objects.filter(key=key).delete()
+
+    def clear(self):
+        from .models import AIResultCache
+
+        AIResultCache.objects.all().delete()
+
+
+class FileTier:
+    """
+    Persistent tier storing one JSON file per entry under AI_CACHE["FILE_DIR"].
+    Writes go through a temp file + rename so readers never see partial entries.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = str(directory or get_setting("FILE_DIR") or settings.BASE_DIR / "ai_cache")
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as fh:
+                entry = json.load(fh)
+        except (OSError, ValueError):
+            return None
+        if entry.get("expires_at") is not None and entry["expires_at"] <= time.time():
+            self.delete(key)
+            return None
+        return entry.get("payload")
+
+    def set(self, key, payload, ttl, feature="", model=""):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {
+            "feature": feature,
+            "model": model,
+            "payload": payload,
+            "expires_at": time.time() + ttl if ttl else None,
+        }
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                json.dump(entry, fh)
+            os.replace(tmp, path)
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        if not os.path.isdir(self.directory):
+            return
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".json"):
+                    os.remove(os.path.join(root, name))
+
+
+# ----------------- CACHE -----------------
+class AICache:
+    def __init__(self, tiers, ttl, features, enabled=True):
+        self.tiers = tiers
+        self.ttl = ttl
+        self.features = set(features)
+        self.enabled = enabled
+
+    def enabled_for(self, feature):
+        return self.enabled and feature in self.features
+
+    def get(self, key):
+        """
+        Return the cached value dict for ``key`` or None. A hit in a slower
+        tier is copied into every faster tier in front of it.
+        """
+        for index, tier in enumerate(self.tiers):
+            try:
+                payload = tier.get(key)
+            except Exception as e:
+                print("⚠️ AI cache read error:", e)
+                continue
+            if payload is None:
+                continue
+            for faster in self.tiers[:index]:
+                try:
+                    faster.set(key, payload, self.ttl)
+                except Exception:
+                    pass
+            record_cache_lookup("ai_result", True)
+            return json.loads(payload)
+        record_cache_lookup("ai_result", False)
+        return None
+
+    def set(self, key, value, feature="", model=""):
+        payload = json.dumps(value)
+        for tier in self.tiers:
+            try:
+                tier.set(key, payload, self.ttl, feature=feature, model=model)
+            except Exception as e:
+                print("⚠️ AI cache write error:", e)
+
+    def delete(self, key):
+        for tier in self.tiers:
+            tier.delete(key)
+
+    def clear(self):
+        for tier in self.tiers:
+            tier.clear()
+
+
+@lru_cache(maxsize=None)
+def get_ai_cache():
+    """
+    Process-wide cache built from settings.AI_CACHE. Call
+    ``get_ai_cache.cache_clear()`` after changing the settings.
+    """
+    tiers = [import_string(path)() for path in get_setting("TIERS")]
+    return AICache(
+        tiers=tiers,
+        ttl=get_setting("TTL"),
+        features=get_setting("FEATURES"),
+        enabled=get_setting("ENABLED"),
+    )
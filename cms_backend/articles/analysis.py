@@ -0,0 +1,72 @@
+# articles/analysis.py
+"""
+Opt-in auto-analysis of article content.
+
+With AI_AUTO_ANALYSIS["ENABLED"], saving an article whose content hash
+differs from the hash its stored analysis was computed from queues one
+background "analyze" job (run by `manage.py run_ai_worker`). The job
+computes summary and sentiment once and stores them on the article with
+the hash they belong to; the summary is stored unpublished, so article
+lists keep showing only summaries the author published.
+
+The summarize / sentiment actions then answer from the stored fields
+while they match the current content, without calling Gemini.
+"""
+from django.conf import settings
+
+from .ai import ARTICLE_RESULT_FIELDS
+from .jobs import submit_job
+from .models import AIJob
+
+
+DEFAULTS = {
+    "ENABLED": False,
+    "FEATURES": ["summarize", "sentiment"],
+}
+
+
+def get_setting(name):
+    return getattr(settings, "AI_AUTO_ANALYSIS", {}).get(name, DEFAULTS[name])
+
+
+def auto_analysis_enabled():
+    return get_setting("ENABLED")
+
+
+def is_current(article):
+    return bool(article.analyzed_hash) and article.analyzed_hash == article.content_hash
+
+
+def stored_result(article, feature):
+    """
+    The stored result of ``feature`` when it was computed from the current content, else None.
+    """
+    if not is_current(article):
+        return None
+    return getattr(article, ARTICLE_RESULT_FIELDS[feature]) or None
+
+
+def queue_analysis(article, force=False):
+    """
+    Queue an analyze job for ``article`` unless its analysis is current, one is
+    already pending for the same content, or auto-analysis is off (``force``
+    overrides the setting). Returns the new job or None.
+    """
+    if not (force or auto_analysis_enabled()):
+        return None
+    if is_current(article) or not (article.content or "").strip():
+        return None
+    pending = AIJob.objects.filter(
+        article=article,
+        feature="analyze",
+        status__in=[AIJob.QUEUED, AIJob.RUNNING],
+        params__content_hash=article.content_hash,
+    )
+    if pending.exists():
+        return None
+    return submit_job(
+        article.author,
+        "analyze",
+        article=article,
+        params={"content_hash": article.content_hash, "features": list(get_setting("FEATURES"))},
+    )
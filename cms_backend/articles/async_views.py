@@ -0,0 +1,207 @@
+# articles/async_views.py
+"""
+Native async versions of the AI actions, for use under ASGI (daphne/uvicorn).
+
+DRF views are sync-only, so these are plain Django async views. They await
+Gemini through ``client.aio`` and use the async ORM, so one worker process
+can hold hundreds of in-flight AI requests instead of one per thread.
+Request/response shapes match the DRF actions in views.py.
+"""
+import json
+import math
+import traceback
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from . import ai
+from .ai import estimate_usage
+from .analysis import stored_result
+from .models import Article
+from .quota import QuotaExceeded, check_quota
+from .keywords import generated_tags
+from .resilience import AIUnavailable
+
+
+async def authenticate(request):
+    """
+    Resolve the JWT bearer token to a user, or return None.
+    """
+    try:
+        result = await sync_to_async(JWTAuthentication().authenticate)(request)
+    except AuthenticationFailed:
+        return None
+    return result[0] if result else None
+
+
+async def quota_response(user):
+    """
+    Apply the AI_QUOTA limits; return a 429 response when exceeded, else None.
+    """
+    try:
+        await sync_to_async(check_quota)(user)
+    except QuotaExceeded as e:
+        response = JsonResponse({"error": str(e)}, status=429)
+        response["Retry-After"] = str(math.ceil(e.retry_after))
+        return response
+    return None
+
+
+def unavailable_response(error):
+    response = JsonResponse({"error": str(error)}, status=503)
+    if error.retry_after:
+        response["Retry-After"] = str(math.ceil(error.retry_after))
+    return response
+
+
+def refresh_requested(request):
+    return request.GET.get("refresh", "").lower() in ("1", "true", "yes")
+
+
+async def load_article_content(pk):
+    try:
+        article = await Article.objects.only(
+            "id", "content", "content_hash", "analyzed_hash", "summary", "sentiment"
+        ).aget(pk=pk)
+    except Article.DoesNotExist:
+        return None, None
+    return article, (article.content or "").strip()
+
+
+# ---------------- Generate ----------------
+@csrf_exempt
+@require_POST
+async def generate(request):
+    user = await authenticate(request)
+    if not user:
+        return JsonResponse({"error": "Please login first."}, status=401)
+    rejected = await quota_response(user)
+    if rejected:
+        return rejected
+
+    try:
+        payload = json.loads(request.body or b"{}")
+    except ValueError:
+        return JsonResponse({"error": "Invalid JSON body"}, status=400)
+    topic = str(payload.get("topic", "")).strip()
+    if not topic:
+        return JsonResponse({"error": "Topic is required"}, status=400)
+    if not ai.client:
+        return JsonResponse({"error": "Gemini client not initialized"}, status=500)
+
+    try:
+        text, cached, coalesced = await ai.arun_generate(topic, refresh=refresh_requested(request))
+        if not text:
+            return JsonResponse({"error": "Empty AI response"}, status=400)
+
+        tokens, estimated_cost = estimate_usage(topic, text, cached, coalesced)
+        await ai.arecord_usage(user, None, "generate", tokens, estimated_cost, cached=cached, coalesced=coalesced)
+
+        return JsonResponse({
+            "topic": topic,
+            "content": text,
+            "tags": await sync_to_async(generated_tags)(text),
+            "tokens_used": tokens,
+            "estimated_cost": estimated_cost,
+            "cached": cached,
+            "coalesced": coalesced,
+        })
+
+    except AIUnavailable as e:
+        return unavailable_response(e)
+    except Exception as e:
+        print("❌ AI Error (async generate):", e)
+        print(traceback.format_exc())
+        return JsonResponse({"error": str(e)}, status=500)
+
+
+# ---------------- Summarize ----------------
+@csrf_exempt
+@require_POST
+async def summarize(request, pk):
+    user = await authenticate(request)
+    if not user:
+        return JsonResponse({"error": "Please login first."}, status=401)
+    rejected = await quota_response(user)
+    if rejected:
+        return rejected
+
+    article, content = await load_article_content(pk)
+    if article is None:
+        return JsonResponse({"detail": "No Article matches the given query."}, status=404)
+    if not content:
+        return JsonResponse({"error": "Article content is empty"}, status=400)
+    stored = stored_result(article, "summarize")
+    if stored and not refresh_requested(request):
+        return JsonResponse({"summary": stored, "estimated_cost": 0.0, "cached": True, "stored": True})
+    if not ai.client:
+        return JsonResponse({"error": "Gemini client not initialized"}, status=500)
+
+    try:
+        summary, cached, coalesced, usage = await ai.arun_summarize(content, refresh=refresh_requested(request))
+        if not summary:
+            return JsonResponse({"error": "AI returned an empty summary. Try again."}, status=400)
+
+        tokens, estimated_cost = usage["tokens_used"], usage["estimated_cost"]
+        await ai.arecord_usage(user, article, "summarize", tokens, estimated_cost, cached=cached, coalesced=coalesced)
+
+        return JsonResponse({"summary": summary, "estimated_cost": estimated_cost, "cached": cached, "coalesced": coalesced, "chunks": usage["chunks"]})
+
+    except AIUnavailable as e:
+        return unavailable_response(e)
+    except Exception as e:
+        print("❌ Summarization Error (async):", e)
+        print(traceback.format_exc())
+        return JsonResponse({"error": str(e)}, status=500)
+
+
+# ---------------- Sentiment Analysis ----------------
+@csrf_exempt
+@require_POST
+async def sentiment(request, pk):
+    user = await authenticate(request)
+    if not user:
+        return JsonResponse({"error": "Please login first."}, status=401)
+    rejected = await quota_response(user)
+    if rejected:
+        return rejected
+
+    article, content = await load_article_content(pk)
+    if article is None:
+        return JsonResponse({"detail": "No Article matches the given query."}, status=404)
+    if not content:
+        return JsonResponse({"error": "Article content is empty"}, status=400)
+    tier = request.GET.get("tier") or None
+    if tier not in (None, "local", "llm"):
+        return JsonResponse({"error": "tier must be 'local' or 'llm'"}, status=400)
+    stored = stored_result(article, "sentiment")
+    if stored and not refresh_requested(request) and not tier:
+        return JsonResponse({"sentiment": stored, "estimated_cost": 0.0, "cached": True, "stored": True, "tier": "stored"})
+
+    try:
+        sentiment_text, cached, coalesced, usage = await ai.arun_sentiment(content, refresh=refresh_requested(request), tier=tier)
+        if not sentiment_text:
+            return JsonResponse({"error": "Sentiment analysis failed. Empty AI response."}, status=400)
+
+        tokens, estimated_cost = usage["tokens_used"], usage["estimated_cost"]
+        local = usage["tier"] == "local"
+        await ai.arecord_usage(user, article, "sentiment", tokens, estimated_cost, cached=cached, coalesced=coalesced, local=local)
+
+        return JsonResponse({
+            "sentiment": sentiment_text,
+            "estimated_cost": estimated_cost,
+            "cached": cached,
+            "coalesced": coalesced,
+            "chunks": usage["chunks"],
+            "tier": usage["tier"],
+            "confidence": usage["confidence"],
+        })
+
+    except AIUnavailable as e:
+        return unavailable_response(e)
+    except Exception as e:
+        print("❌ Sentiment Error (async):", e)
+        print(traceback.format_exc())
+        return JsonResponse({"error": str(e)}, status=500)
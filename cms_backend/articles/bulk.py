@@ -0,0 +1,293 @@
+# articles/bulk.py
+"""
+Bulk summarize / sentiment over many articles with bounded parallel fan-out.
+
+Used by POST /api/articles/bulk-analyze/ and `manage.py bulk_analyze`.
+Each (article, feature) pair becomes one task on a thread pool capped at
+AI_BULK["CONCURRENCY"]; task starts are additionally paced by a per-user
+rate limiter, and each task takes one request from the user's AI quota
+(waiting up to MAX_QUOTA_WAIT seconds for it) before calling Gemini, so one
+POST cannot spend more than the quota allows. Sentiment is first classified
+locally for every article in one batch; only the articles the local tier is
+unsure about become tasks. Results are yielded as they complete and every
+AIUsage row is written with a single bulk_create once the run has finished.
+
+If the client disconnects, queued tasks are cancelled rather than run;
+tasks already running are billed when they finish.
+"""
+import json
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import ai, local_sentiment
+from .metrics import observe_usage
+from .models import AIUsage, Article
+from .quota import QuotaExceeded, charge_quota, check_quota
+from .response_cache import article_changed
+from .usage import apply_rollups
+
+
+DEFAULTS = {
+    "CONCURRENCY": 8,
+    "RATE_PER_MINUTE": 120,
+    "MAX_ARTICLES": 1000,
+    # longest a task waits for the user's per-minute AI quota to refill
+    "MAX_QUOTA_WAIT": 60,
+}
+
+BULK_FEATURES = ("summarize", "sentiment")
+
+
+def get_setting(name):
+    return getattr(settings, "AI_BULK", {}).get(name, DEFAULTS[name])
+
+
+class RateLimiter:
+    """
+    Spaces task starts evenly so that at most ``per_minute`` begin per minute.
+    """
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute else 0
+        self.next_at = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            start = max(time.monotonic(), self.next_at)
+            self.next_at = start + self.interval
+        delay = start - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def limiter_for(user, per_minute):
+    """
+    One limiter per user per process, so concurrent bulk runs by the same
+    user share a single budget.
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(user.pk)
+        if limiter is None or limiter.interval != (60.0 / per_minute if per_minute else 0):
+            limiter = _limiters[user.pk] = RateLimiter(per_minute)
+        return limiter
+
+
+def resolve_articles(ids=None, filters=None):
+    """
+    Build the article queryset from explicit ``ids`` or a whitelisted ``filters`` dict:
+    author (username), missing_summary, missing_sentiment, created_after, created_before.
+    """
+    qs = Article.objects.all()
+    if ids:
+        return qs.filter(pk__in=ids).order_by("id")
+
+    filters = filters or {}
+    if filters.get("author"):
+        qs = qs.filter(author__username=filters["author"])
+    if filters.get("missing_summary"):
+        qs = qs.filter(Q(summary__isnull=True) | Q(summary=""))
+    if filters.get("missing_sentiment"):
+        qs = qs.filter(Q(sentiment__isnull=True) | Q(sentiment=""))
+    for key, lookup in (("created_after", "created_at__gte"), ("created_before", "created_at__lt")):
+        if filters.get(key):
+            value = parse_datetime(str(filters[key]))
+            if value is None:
+                raise ValueError(f"Invalid datetime for {key}")
+            qs = qs.filter(**{lookup: value})
+    return qs.order_by("id")
+
+
+def make_result(article, feature, text, cached, coalesced, usage):
+    return {
+        "article": article.pk,
+        "feature": feature,
+        ai.ARTICLE_RESULT_FIELDS[feature]: text,
+        "tokens_used": usage["tokens_used"],
+        "estimated_cost": usage["estimated_cost"],
+        "cached": cached,
+        "coalesced": coalesced,
+        "tier": usage["tier"],
+    }
+
+
+def take_quota(user):
+    """
+    Take one request from the user's AI quota, waiting for the per-minute
+    bucket to refill; raises QuotaExceeded when the wait would be too long.
+    """
+    while True:
+        try:
+            return check_quota(user)
+        except QuotaExceeded as e:
+            if e.retry_after > get_setting("MAX_QUOTA_WAIT"):
+                raise
+            time.sleep(e.retry_after)
+
+
+def analyze_one(article, feature, limiter, refresh, confidence=None, user=None):
+    """
+    ``confidence`` is set for sentiment the local tier already declined.
+    With ``user`` the call is counted against that user's AI quota.
+    """
+    limiter.wait()
+    try:
+        content = (article.content or "").strip()
+        if not content:
+            return {"article": article.pk, "feature": feature, "error": "Article content is empty"}, None
+        if user is not None:
+            take_quota(user)
+        if feature == "sentiment":
+            text, cached, coalesced, usage = ai.run_sentiment(content, refresh=refresh, tier="llm")
+            usage["confidence"] = confidence
+        else:
+            text, cached, coalesced, usage = ai.ARTICLE_RUNNERS[feature](content, refresh=refresh)
+        if not text:
+            return {"article": article.pk, "feature": feature, "error": "Empty AI response"}, None
+        return make_result(article, feature, text, cached, coalesced, usage), text
+    except QuotaExceeded as e:
+        return {"article": article.pk, "feature": feature, "error": str(e), "retry_after": round(e.retry_after)}, None
+    except Exception as e:
+        print(f"❌ Bulk {feature} error (article {article.pk}):", e)
+        print(traceback.format_exc())
+        return {"article": article.pk, "feature": feature, "error": str(e)}, None
+    finally:
+        # worker threads each hold their own DB connection
+        connection.close()
+
+
+def bill_late(user, article, feature, owner, future):
+    """
+    Record the spend of a task that finished after its run was abandoned.
+    """
+    try:
+        result, text = future.result()
+        if text is not None:
+            ai.record_usage(
+                user, article, feature, result["tokens_used"], result["estimated_cost"],
+                cached=result["cached"], coalesced=result["coalesced"],
+            )
+    except Exception as e:
+        print(f"❌ Bulk {feature} billing error (article {article.pk}):", e)
+        print(traceback.format_exc())
+    finally:
+        if threading.get_ident() != owner:
+            connection.close()
+
+
+def iter_bulk_analysis(
+    user, articles, features, concurrency=None, rate_per_minute=None, save=False, refresh=False, enforce_quota=True,
+):
+    """
+    Yield one result dict per (article, feature) as it completes, then a final
+    ``{"done": true, ...}`` totals dict. With ``save``, results are written back
+    to articles the user authored (any article for staff). ``enforce_quota``
+    counts every Gemini call against the user's AI quota.
+    """
+    concurrency = concurrency or get_setting("CONCURRENCY")
+    if rate_per_minute is None:
+        rate_per_minute = get_setting("RATE_PER_MINUTE")
+    limiter = limiter_for(user, rate_per_minute)
+
+    articles = list(articles.only("id", "content", "author_id", "summary", "sentiment", "summary_published"))
+    usage_rows = []
+    updated = {}
+    totals = {"done": True, "articles": len(articles), "succeeded": 0, "failed": 0, "tokens_used": 0, "estimated_cost": 0.0}
+
+    def collect(article, feature, result, text):
+        if text is None:
+            totals["failed"] += 1
+            return result
+        totals["succeeded"] += 1
+        totals["tokens_used"] += result["tokens_used"]
+        totals["estimated_cost"] += result["estimated_cost"]
+        usage_rows.append(AIUsage(
+            user=user,
+            article=article,
+            feature=feature,
+            tokens_used=result["tokens_used"],
+            estimated_cost=result["estimated_cost"],
+            cached=result["cached"],
+            coalesced=result["coalesced"],
+            local=result["tier"] == "local",
+        ))
+        if save and (user.is_staff or article.author_id == user.pk):
+            setattr(article, ai.ARTICLE_RESULT_FIELDS[feature], text)
+            if feature == "summarize":
+                article.summary_published = True
+            updated[article.pk] = article
+        return result
+
+    # one vectorized local pass; confident answers never reach the pool
+    local = {}
+    if "sentiment" in features:
+        answers = local_sentiment.local_answers([(article.content or "").strip() for article in articles])
+        local = {article.pk: answer for article, answer in zip(articles, answers)}
+
+    pool = ThreadPoolExecutor(max_workers=concurrency)
+    futures = {}
+    quota_user = user if enforce_quota else None
+    try:
+        for article in articles:
+            for feature in features:
+                text, confidence = local.get(article.pk, (None, None)) if feature == "sentiment" else (None, None)
+                if text and (article.content or "").strip():
+                    usage = {"tokens_used": 0, "estimated_cost": 0.0, "tier": "local"}
+                    yield collect(article, feature, make_result(article, feature, text, False, False, usage), text)
+                    continue
+                future = pool.submit(analyze_one, article, feature, limiter, refresh, confidence, quota_user)
+                futures[future] = (article, feature)
+        for future in as_completed(futures):
+            article, feature = futures.pop(future)
+            yield collect(article, feature, *future.result())
+    finally:
+        # runs even if the client disconnects mid-stream: queued tasks are
+        # cancelled instead of awaited, finished ones are billed below and
+        # the ones still running bill themselves when they complete
+        pool.shutdown(wait=False, cancel_futures=True)
+        for future, (article, feature) in futures.items():
+            if future.cancelled():
+                continue
+            if future.done():
+                collect(article, feature, *future.result())
+            else:
+                future.add_done_callback(partial(bill_late, user, article, feature, threading.get_ident()))
+        with transaction.atomic():
+            AIUsage.objects.bulk_create(usage_rows, batch_size=500)
+            apply_rollups(usage_rows)
+        charge_quota(user.pk, sum(row.tokens_used for row in usage_rows))
+        for row in usage_rows:
+            observe_usage(row.feature, row.tokens_used, row.estimated_cost, cached=row.cached, coalesced=row.coalesced, local=row.local)
+        if updated:
+            now = timezone.now()
+            for article in updated.values():
+                article.updated_at = now
+            fields = [ai.ARTICLE_RESULT_FIELDS[f] for f in features] + ["updated_at"]
+            if "summarize" in features:
+                fields.append("summary_published")
+            Article.objects.bulk_update(list(updated.values()), fields, batch_size=500)
+            article_changed(*updated)
+
+    totals["estimated_cost"] = round(totals["estimated_cost"], 6)
+    totals["saved"] = len(updated)
+    yield totals
+
+
+def ndjson_lines(results):
+    for item in results:
+        yield json.dumps(item) + "\n"
@@ -0,0 +1,186 @@
+# articles/chunking.py
+"""
+Split long markdown articles into chunks for map-reduce analysis.
+
+Chunks follow the document's structure: each heading starts a new section,
+sections longer than CHUNK_CHARS are packed paragraph by paragraph, and
+only a paragraph that is itself too long is cut (at a sentence end, else
+at whitespace). Fenced code blocks are their own blocks; one that is too
+long is cut between lines, and every piece is closed and reopened with the
+original fence (language included) so each chunk stays valid markdown.
+Sections shorter than MIN_CHUNK_CHARS are merged into the next one.
+
+Because boundaries come from headings, editing one section normally
+changes only that section's chunk, so the other chunks keep their cached
+results (see ai.run_map_reduce).
+"""
+import re
+
+from django.conf import settings
+
+
+DEFAULTS = {
+    "ENABLED": True,
+    "CHUNK_CHARS": 3000,
+    "MIN_CHUNK_CHARS": 400,
+    "MAX_CHUNKS": 24,
+    "CONCURRENCY": 4,
+}
+
+HEADING = re.compile(r"^#{1,6}\s")
+FENCE = re.compile(r"^(```|~~~)")
+
+
+def get_setting(name):
+    return getattr(settings, "AI_CHUNKING", {}).get(name, DEFAULTS[name])
+
+
+def iter_blocks(text):
+    """
+    Yield (is_heading, block) for each heading line and paragraph.
+    """
+    current = []
+    in_fence = False
+    for line in text.splitlines():
+        if FENCE.match(line.strip()):
+            in_fence = not in_fence
+            if in_fence and current:
+                # a fence is always a block of its own
+                yield False, "\n".join(current)
+                current = []
+            current.append(line)
+            if not in_fence:
+                yield False, "\n".join(current)
+                current = []
+        elif in_fence:
+            current.append(line)
+        elif HEADING.match(line):
+            if current:
+                yield False, "\n".join(current)
+                current = []
+            yield True, line.strip()
+        elif not line.strip():
+            if current:
+                yield False, "\n".join(current)
+                current = []
+        else:
+            current.append(line)
+    if current:
+        yield False, "\n".join(current)
+
+
+def split_sections(text):
+    """
+    Group blocks into sections (lists of blocks), each starting at a heading.
+    """
+    sections = []
+    current = []
+    for is_heading, block in iter_blocks(text):
+        if is_heading and current:
+            sections.append(current)
+            current = []
+        current.append(block)
+    if current:
+        sections.append(current)
+    return sections
+
+
+def cut_block(block, limit):
+    """
+    Cut an oversized block into pieces of at most ``limit`` characters.
+    """
+    if FENCE.match(block.lstrip()) and len(block) > limit:
+        return cut_fence(block, limit)
+    pieces = []
+    while len(block) > limit:
+        window = block[:limit]
+        cut = max(window.rfind(". "), window.rfind("\n"))
+        if cut <= 0:
+            cut = window.rfind(" ")
+        if cut <= 0:
+            cut = limit - 1
+        pieces.append(block[:cut + 1].strip())
+        block = block[cut + 1:].strip()
+    if block:
+        pieces.append(block)
+    return pieces
+
+
+def cut_fence(block, limit):
+    """
+    Cut an oversized fenced code block between lines, wrapping every piece in
+    the block's opening fence line and a matching closing fence.
+    """
+    lines = block.split("\n")
+    opener = lines[0].strip()
+    closer = FENCE.match(opener).group(1)
+    body = lines[1:-1] if len(lines) > 1 and lines[-1].strip() == closer else lines[1:]
+    room = max(limit - len(opener) - len(closer) - 2, 1)
+
+    pieces = []
+    current = []
+    size = 0
+    for line in body:
+        # a single line longer than the room left is cut like prose
+        for part in cut_block(line, room) if len(line) > room else [line]:
+            if current and size + len(part) > room:
+                pieces.append(current)
+                current, size = [], 0
+            current.append(part)
+            size += len(part) + 1
+    if current:
+        pieces.append(current)
+    return ["\n".join([opener, *piece, closer]) for piece in pieces]
+
+
+def pack(blocks, limit):
+    chunks = []
+    current = []
+    size = 0
+    for block in blocks:
+        for piece in cut_block(block, limit):
+            if current and size + len(piece) > limit:
+                chunks.append("\n\n".join(current))
+                current, size = [], 0
+            current.append(piece)
+            size += len(piece) + 2
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def split_markdown(text, chunk_chars=None, min_chars=None, max_chunks=None):
+    """
+    Return the chunks of ``text``; a single chunk when it fits in ``chunk_chars``.
+    If there would be more than ``max_chunks``, the chunk size (and with it
+    the size below which sections are merged) is doubled until there are not.
+    """
+    chunk_chars = chunk_chars or get_setting("CHUNK_CHARS")
+    min_chars = get_setting("MIN_CHUNK_CHARS") if min_chars is None else min_chars
+    max_chunks = max_chunks or get_setting("MAX_CHUNKS")
+    text = (text or "").strip()
+    if len(text) <= chunk_chars:
+        return [text] if text else []
+
+    sections = split_sections(text)
+    while True:
+        chunks = []
+        pending = []
+        for section in sections:
+            section = pending + section
+            if sum(len(block) for block in section) < min_chars:
+                pending = section
+                continue
+            pending = []
+            chunks.extend(pack(section, chunk_chars))
+        if pending:
+            tail = "\n\n".join(pending)
+            if chunks and len(chunks[-1]) + len(tail) + 2 <= chunk_chars:
+                chunks[-1] = f"{chunks[-1]}\n\n{tail}"
+            else:
+                chunks.extend(pack(pending, chunk_chars))
+        if len(chunks) <= max_chunks:
+            return chunks
+        # sections are never packed together, so merge more of them as well
+        chunk_chars *= 2
+        min_chars = max(min_chars, chunk_chars // 2)
@@ -0,0 +1,80 @@
+# articles/conditional.py
+"""
+Conditional GET for article list and detail responses.
+
+Validators come from one cheap query run before anything is serialized:
+detail responses get a strong ETag from the row's ``updated_at``; list
+pages get a weak ETag from the filtered set's max ``updated_at``, row count
+and max id (so edits, inserts and deletes all change it). Both also fold
+in the query string and negotiated media type, since ``?fields=``,
+``?cursor=`` and the renderer change the body.
+
+Only detail responses carry Last-Modified: a list's max ``updated_at``
+does not move when an article is deleted, so If-Modified-Since alone
+would answer 304 for a list that has lost rows.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+def variant(request):
+    params = sorted(request.query_params.lists())
+    return f"{params}|{getattr(request, 'accepted_media_type', '')}"
+
+
+def make_etag(*parts, weak=False):
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+    etag = quote_etag(digest)
+    return f"W/{etag}" if weak else etag
+
+
+def list_validators(request, queryset):
+    """
+    Return (etag, None) for a list page over ``queryset`` (unordered, unannotated);
+    lists have no Last-Modified (see the module docstring).
+    """
+    stats = queryset.order_by().aggregate(last=Max("updated_at"), count=Count("id"), max_id=Max("id"))
+    last = stats["last"].isoformat() if stats["last"] else ""
+    etag = make_etag(last, stats["count"], stats["max_id"], variant(request), weak=True)
+    return etag, None
+
+
+def detail_validators(request, queryset, pk):
+    """
+    Return (etag, last_modified) for one article, or (None, None) if it does not exist.
+    """
+    row = queryset.filter(pk=pk).values_list("updated_at", "rendered_hash").first()
+    if row is None:
+        return None, None
+    # a re-render (`manage.py render_articles`) changes the body but not updated_at
+    updated_at, rendered_hash = row
+    return make_etag(pk, updated_at.isoformat(), rendered_hash, variant(request)), updated_at
+
+
+def not_modified(request, etag, last_modified):
+    """
+    A 304 response when the client's If-None-Match / If-Modified-Since still
+    match, else None.
+    """
+    if etag is None:
+        return None
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified):
+    if etag is None:
+        return response
+    response["ETag"] = etag
+    if last_modified:
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+    # let clients keep the body but always revalidate it
+    response["Cache-Control"] = "no-cache"
+    patch_vary_headers(response, ["Accept"])
+    return response
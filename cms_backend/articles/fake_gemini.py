@@ -0,0 +1,228 @@
+# articles/fake_gemini.py
+"""
+Offline stand-in for ``google.genai.Client`` used by benchmarks and tests.
+
+Implements the slice of the SDK the app calls: ``models.generate_content``,
+``models.generate_content_stream`` and ``aio.models.generate_content``.
+Every call sleeps for a latency drawn from ``distribution`` (time.sleep /
+asyncio.sleep) and returns deterministic text derived from the prompt,
+padded to about ``output_tokens`` tokens when set.
+
+Faults can be injected: ``failure_rate`` of calls raise FakeGeminiError
+(HTTP 503, retryable), ``empty_rate`` return an empty answer, and a call
+whose latency exceeds the HTTP timeout in its config raises TimeoutError
+after that timeout, like the real SDK.
+
+With AI_FAKE_GEMINI["ENABLED"], articles.ai uses ``client_from_settings()``
+instead of the real client, so the whole app runs without an API key.
+"""
+import asyncio
+import hashlib
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+from django.conf import settings
+
+
+DEFAULTS = {
+    "ENABLED": False,
+    "LATENCY": 0.5,
+    "DISTRIBUTION": "constant",
+    "JITTER": 0.0,
+    "OUTPUT_TOKENS": None,
+    "FAILURE_RATE": 0.0,
+    "EMPTY_RATE": 0.0,
+    "SEED": None,
+    "CHUNKS": 4,
+}
+
+DISTRIBUTIONS = ("constant", "uniform", "normal", "lognormal", "exponential")
+
+FILLER = (
+    "Each section expands on the topic with practical detail, short examples "
+    "and a clear takeaway for the reader. "
+)
+
+
+def get_setting(name):
+    return getattr(settings, "AI_FAKE_GEMINI", {}).get(name, DEFAULTS[name])
+
+
+def fake_gemini_enabled():
+    return get_setting("ENABLED")
+
+
+class FakeGeminiError(Exception):
+    def __init__(self, code=503, message="Fake Gemini unavailable"):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+def prompt_text(contents):
+    parts = contents if isinstance(contents, (list, tuple)) else [contents]
+    return " ".join(getattr(p, "text", None) or str(p) for p in parts)
+
+
+def fake_reply(prompt, output_tokens=None):
+    digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+    body = "Positive, clear and helpful content."
+    if output_tokens:
+        # the app estimates ~4 characters per token
+        body += " " + FILLER * max(output_tokens * 4 // len(FILLER), 1)
+    return (
+        f"# Fake post {digest} ✨\n\n"
+        "An engaging intro paragraph for the benchmark.\n\n"
+        f"## Key ideas\n\n{body.strip()}\n\n"
+        "### 🏷️ Related Tags\nAI, Testing, Benchmarks, Django, Python, Speed"
+    )
+
+
+def fake_response(prompt, text):
+    return SimpleNamespace(
+        text=text,
+        usage_metadata=SimpleNamespace(
+            prompt_token_count=max(len(prompt) // 4, 1),
+            candidates_token_count=len(text) // 4,
+        ),
+    )
+
+
+def http_timeout(config):
+    """
+    The per-request timeout (seconds) set through ``config.http_options``, or None.
+    """
+    options = getattr(config, "http_options", None)
+    timeout = getattr(options, "timeout", None)
+    return timeout / 1000 if timeout else None
+
+
+class FaultPlan:
+    """
+    Decides, per call, the latency and whether the call fails or comes back empty.
+    Shared by the sync and async faces so one seed drives both.
+
+    ``latency`` is the typical latency in seconds. ``jitter`` is the spread in
+    seconds for "uniform" (latency ± jitter) and "normal" (standard
+    deviation), and the log-space sigma for "lognormal" (latency is then the
+    median); "exponential" has mean ``latency`` and ignores it.
+    """
+
+    def __init__(self, latency=0.0, failure_rate=0.0, empty_rate=0.0, seed=None, distribution="constant", jitter=0.0):
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution {distribution!r}; use one of {', '.join(DISTRIBUTIONS)}")
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.empty_rate = empty_rate
+        self.distribution = distribution
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def sample_latency(self):
+        # called with self.lock held
+        if self.distribution == "uniform":
+            value = self.rng.uniform(self.latency - self.jitter, self.latency + self.jitter)
+        elif self.distribution == "normal":
+            value = self.rng.gauss(self.latency, self.jitter)
+        elif self.distribution == "lognormal":
+            value = self.latency * self.rng.lognormvariate(0.0, self.jitter)
+        elif self.distribution == "exponential":
+            value = self.rng.expovariate(1 / self.latency) if self.latency > 0 else 0.0
+        else:
+            value = self.latency
+        return max(value, 0.0)
+
+    def next(self, config):
+        """
+        Return (seconds to wait, error to raise or None, empty).
+        """
+        with self.lock:
+            roll = self.rng.random()
+            latency = self.sample_latency()
+        timeout = http_timeout(config)
+        if timeout is not None and latency > timeout:
+            return timeout, TimeoutError(f"Fake Gemini timed out after {timeout:.2f}s"), False
+        if roll < self.failure_rate:
+            return latency, FakeGeminiError(), False
+        return latency, None, roll < self.failure_rate + self.empty_rate
+
+
+class FakeModels:
+    def __init__(self, plan, chunks=4, output_tokens=None):
+        self.plan = plan
+        self.chunks = chunks
+        self.output_tokens = output_tokens
+        self.calls = 0
+
+    def generate_content(self, model, contents, config=None):
+        self.calls += 1
+        delay, error, empty = self.plan.next(config)
+        time.sleep(delay)
+        if error:
+            raise error
+        prompt = prompt_text(contents)
+        return fake_response(prompt, "" if empty else fake_reply(prompt, self.output_tokens))
+
+    def generate_content_stream(self, model, contents, config=None):
+        self.calls += 1
+        delay, error, empty = self.plan.next(config)
+        if error:
+            time.sleep(delay)
+            raise error
+        text = "" if empty else fake_reply(prompt_text(contents), self.output_tokens)
+        step = max(len(text) // self.chunks, 1)
+        for start in range(0, len(text), step):
+            time.sleep(delay / self.chunks)
+            yield SimpleNamespace(text=text[start:start + step])
+
+
+class FakeAsyncModels:
+    def __init__(self, plan, output_tokens=None):
+        self.plan = plan
+        self.output_tokens = output_tokens
+        self.calls = 0
+
+    async def generate_content(self, model, contents, config=None):
+        self.calls += 1
+        delay, error, empty = self.plan.next(config)
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        prompt = prompt_text(contents)
+        return fake_response(prompt, "" if empty else fake_reply(prompt, self.output_tokens))
+
+
+class FakeGeminiClient:
+    def __init__(
+        self, latency=0.0, chunks=4, failure_rate=0.0, empty_rate=0.0, seed=None,
+        distribution="constant", jitter=0.0, output_tokens=None,
+    ):
+        self.plan = FaultPlan(
+            latency=latency, failure_rate=failure_rate, empty_rate=empty_rate, seed=seed,
+            distribution=distribution, jitter=jitter,
+        )
+        self.models = FakeModels(self.plan, chunks=chunks, output_tokens=output_tokens)
+        self.aio = SimpleNamespace(models=FakeAsyncModels(self.plan, output_tokens=output_tokens))
+
+    def describe(self):
+        plan = self.plan
+        return {
+            "latency": plan.latency,
+            "distribution": plan.distribution,
+            "jitter": plan.jitter,
+            "failure_rate": plan.failure_rate,
+            "empty_rate": plan.empty_rate,
+            "output_tokens": self.models.output_tokens,
+        }
+
+
+def client_from_settings(**overrides):
+    """
+    Build a FakeGeminiClient from AI_FAKE_GEMINI; keyword overrides (lower
+    case setting names, None = keep the setting) win.
+    """
+    options = {name.lower(): get_setting(name) for name in DEFAULTS if name != "ENABLED"}
+    options.update({name: value for name, value in overrides.items() if value is not None})
+    return FakeGeminiClient(**options)
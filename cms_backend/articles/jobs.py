@@ -0,0 +1,278 @@
+# articles/jobs.py
+"""
+Background AI job queue backed by the AIJob table.
+
+Requests submit a job and return immediately; `manage.py run_ai_worker`
+claims queued jobs and runs them through the same ai.run_* helpers the
+synchronous views use. Attempts that fail transiently (Gemini unreachable,
+a retryable upstream status, an empty answer) are retried with exponential
+backoff and dead-lettered after ``max_attempts``; any other failure (bad
+params, a missing article, a bug) is dead-lettered on the first attempt.
+
+A running job holds a lease (``locked_by`` / ``locked_at``) that its worker
+renews every LEASE_TIMEOUT / 3 seconds. A job whose lease expires is
+reclaimed by another worker, or dead-lettered once it has used up
+``max_attempts``; the worker that lost it can no longer record an outcome.
+"""
+import threading
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from . import ai
+from .ai import estimate_usage, record_usage
+from .resilience import AIUnavailable, is_retryable
+from .models import AIJob, Article
+from .keywords import generated_tags
+from .response_cache import article_changed
+
+
+DEFAULTS = {
+    "CONCURRENCY": 4,
+    "MAX_ATTEMPTS": 3,
+    "RETRY_BACKOFF": 5,
+    "POLL_INTERVAL": 1.0,
+    "LEASE_TIMEOUT": 300,
+}
+
+# features clients may queue; "analyze" is only queued internally (analysis.py)
+CLIENT_FEATURES = ("generate", "summarize", "sentiment")
+
+
+def get_setting(name):
+    return getattr(settings, "AI_JOBS", {}).get(name, DEFAULTS[name])
+
+
+class JobError(Exception):
+    """
+    Raised for a failed attempt. Only ``retryable`` ones are tried again.
+    """
+
+    def __init__(self, message, retryable=False):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+def is_transient(error):
+    if isinstance(error, JobError):
+        return error.retryable
+    # an open circuit or an exhausted retry budget clears up by the next attempt
+    return isinstance(error, AIUnavailable) or is_retryable(error)
+
+
+def submit_job(user, feature, article=None, params=None):
+    return AIJob.objects.create(
+        user=user,
+        article=article,
+        feature=feature,
+        params=params or {},
+        max_attempts=get_setting("MAX_ATTEMPTS"),
+    )
+
+
+def claim_next_job(worker_id):
+    """
+    Atomically move the oldest runnable job to RUNNING and return it, or None.
+    A job is runnable when queued and due, or running with an expired lease
+    (its worker died); an expired job with no attempts left is dead-lettered
+    instead. The conditional UPDATE makes the claim safe across processes
+    without relying on SELECT ... FOR UPDATE, which SQLite lacks.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=get_setting("LEASE_TIMEOUT"))
+    runnable = AIJob.objects.filter(
+        Q(status=AIJob.QUEUED, run_after__lte=now) | Q(status=AIJob.RUNNING, locked_at__lt=stale)
+    )
+    for job in runnable.order_by("run_after", "id")[:10]:
+        unchanged = AIJob.objects.filter(pk=job.pk, status=job.status, locked_at=job.locked_at)
+        if job.status == AIJob.RUNNING and job.attempts >= job.max_attempts:
+            # the job keeps taking its worker down with it
+            unchanged.update(
+                status=AIJob.DEAD, finished_at=now,
+                error=f"Lease expired on attempt {job.attempts} of {job.max_attempts} (worker {job.locked_by} lost)",
+            )
+            continue
+        claimed = unchanged.update(
+            status=AIJob.RUNNING, locked_by=worker_id, locked_at=now, attempts=job.attempts + 1,
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+    return None
+
+
+def current_claim(job):
+    """
+    The job's row, as long as it is still held by the claim ``job`` was returned for.
+    """
+    return AIJob.objects.filter(pk=job.pk, status=AIJob.RUNNING, locked_by=job.locked_by, attempts=job.attempts)
+
+
+def renew_lease(job):
+    """
+    Push the lease of a running job forward; False once another worker has reclaimed it.
+    """
+    return bool(current_claim(job).update(locked_at=timezone.now()))
+
+
+@contextmanager
+def lease_heartbeat(job):
+    """
+    Renew ``job``'s lease from a background thread while the body runs, so a
+    long call (e.g. a map-reduce summary) is not reclaimed as if its worker died.
+    """
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(get_setting("LEASE_TIMEOUT") / 3):
+                try:
+                    if not renew_lease(job):
+                        return
+                except Exception as e:
+                    print(f"❌ AI job {job.pk} lease renewal error:", e)
+                    print(traceback.format_exc())
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=beat, name=f"ai-job-{job.pk}-lease", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def finish_claim(job, **fields):
+    """
+    Store the outcome of this attempt unless the job was reclaimed meanwhile;
+    returns whether it was stored.
+    """
+    if current_claim(job).update(**fields):
+        for name, value in fields.items():
+            setattr(job, name, value)
+        return True
+    print(f"⚠️ AI job {job.pk} attempt {job.attempts} lost its lease; its outcome is discarded")
+    job.refresh_from_db()
+    return False
+
+
+def execute_job(job):
+    """
+    Run one claimed job to completion, recording success, a retry or a dead letter.
+    """
+    try:
+        with lease_heartbeat(job):
+            result = run_feature(job)
+    except Exception as e:
+        print(f"❌ AI job {job.pk} ({job.feature}) attempt {job.attempts} failed:", e)
+        print(traceback.format_exc())
+        fail_job(job, str(e), retryable=is_transient(e))
+        return job
+
+    finish_claim(job, status=AIJob.SUCCEEDED, result=result, error="", finished_at=timezone.now())
+    return job
+
+
+def fail_job(job, error, retryable=True):
+    if not retryable or job.attempts >= job.max_attempts:
+        finish_claim(job, status=AIJob.DEAD, error=error, finished_at=timezone.now())
+    else:
+        backoff = get_setting("RETRY_BACKOFF") * (2 ** (job.attempts - 1))
+        finish_claim(job, status=AIJob.QUEUED, error=error, run_after=timezone.now() + timedelta(seconds=backoff))
+
+
+def run_feature(job):
+    """
+    Execute the AI call for ``job`` and return the JSON result stored on it.
+    Summaries and sentiment are written back to the article when the
+    submitter is its author.
+    """
+    if not ai.client:
+        raise JobError("Gemini client not initialized")
+
+    if job.feature == "generate":
+        topic = str(job.params.get("topic", "")).strip()
+        if not topic:
+            raise JobError("Topic is required")
+        text, cached, coalesced = ai.run_generate(topic)
+        if not text:
+            raise JobError("Empty AI response", retryable=True)
+        tokens, estimated_cost = estimate_usage(topic, text, cached, coalesced)
+        record_usage(job.user, None, "generate", tokens, estimated_cost, cached=cached, coalesced=coalesced)
+        return {
+            "topic": topic,
+            "content": text,
+            "tags": generated_tags(text),
+            "tokens_used": tokens,
+            "estimated_cost": estimated_cost,
+            "cached": cached,
+            "coalesced": coalesced,
+        }
+
+    article = job.article
+    if article is None:
+        raise JobError("Article no longer exists")
+    content = (article.content or "").strip()
+    if not content:
+        raise JobError("Article content is empty")
+
+    if job.feature == "analyze":
+        return run_analysis(job, article, content)
+
+    text, cached, coalesced, usage = ai.ARTICLE_RUNNERS[job.feature](content)
+    if not text:
+        raise JobError(f"AI returned an empty {job.feature} result", retryable=True)
+
+    tokens, estimated_cost = usage["tokens_used"], usage["estimated_cost"]
+    local = usage["tier"] == "local"
+    record_usage(job.user, article, job.feature, tokens, estimated_cost, cached=cached, coalesced=coalesced, local=local)
+
+    field = ai.ARTICLE_RESULT_FIELDS[job.feature]
+    if article.author_id == job.user_id:
+        changes = {field: text, "updated_at": timezone.now()}
+        if field == "summary":
+            changes["summary_published"] = True
+        Article.objects.filter(pk=article.pk).update(**changes)
+        article_changed(article.pk)
+
+    return {field: text, "tokens_used": tokens, "estimated_cost": estimated_cost, "cached": cached, "coalesced": coalesced, "chunks": usage["chunks"], "tier": usage["tier"]}
+
+
+def run_analysis(job, article, content):
+    """
+    Auto-analysis (see articles/analysis.py): compute every requested feature
+    for the content the job was queued for and store the results together.
+    Skipped when the content has changed since; a newer job covers that.
+    """
+    content_hash = job.params.get("content_hash") or article.content_hash
+    if article.content_hash != content_hash:
+        return {"skipped": "Article content changed"}
+
+    result = {"content_hash": content_hash, "tokens_used": 0, "estimated_cost": 0.0}
+    fields = {}
+    for feature in job.params.get("features") or list(ai.ARTICLE_RUNNERS):
+        text, cached, coalesced, usage = ai.ARTICLE_RUNNERS[feature](content)
+        if not text:
+            raise JobError(f"AI returned an empty {feature} result", retryable=True)
+        tokens, estimated_cost = usage["tokens_used"], usage["estimated_cost"]
+        local = usage["tier"] == "local"
+        record_usage(job.user, article, feature, tokens, estimated_cost, cached=cached, coalesced=coalesced, local=local)
+        fields[ai.ARTICLE_RESULT_FIELDS[feature]] = text
+        result["tokens_used"] += tokens
+        result["estimated_cost"] += estimated_cost
+
+    if article.author_id == job.user_id:
+        # conditional on the hash, so an edit made meanwhile is never overwritten
+        Article.objects.filter(pk=article.pk, content_hash=content_hash).update(
+            **fields, analyzed_hash=content_hash, updated_at=timezone.now()
+        )
+        article_changed(article.pk)
+    result.update(fields)
+    return result
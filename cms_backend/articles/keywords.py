@@ -0,0 +1,375 @@
+# articles/keywords.py
+"""
+Local tag suggestions: keyphrase extraction scored with corpus TF-IDF.
+
+Candidates are found RAKE-style: text is cut at punctuation and stop words,
+and every run of up to MAX_PHRASE_WORDS content words between the cuts (and
+each word of it) is a candidate term. A term's weight in an article is its
+sublinear term frequency (title occurrences count TITLE_WEIGHT times) times
+its smoothed IDF, ``ln((1 + N) / (1 + df)) + 1``, the same formula as
+scikit-learn's TfidfTransformer. Phrases must occur MIN_PHRASE_COUNT times
+and then get PHRASE_WEIGHT per extra word; terms matching an existing Tag get
+KNOWN_TAG_WEIGHT so suggestions converge on the tag cloud. Suggestions never
+share a word.
+
+Document frequencies live in KeywordTerm and are maintained incrementally
+from the Article signals: ArticleKeywords remembers which terms an article
+counted, so an edit only applies the difference and a delete takes its
+terms back. Terms are scored for many articles at once as one sparse matrix.
+
+Changing the tokenizer settings needs `manage.py rebuild_keyword_index`.
+"""
+import math
+import re
+import traceback
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS, CountVectorizer
+
+from .models import ArticleKeywords, KeywordTerm, Tag, content_hash
+from .prompts import DEFAULT_TAGS, parse_tags
+
+
+DEFAULTS = {
+    "ENABLED": True,
+    "MAX_TAGS": 6,
+    # longest candidate phrase, in words
+    "MAX_PHRASE_WORDS": 2,
+    "MIN_WORD_LENGTH": 2,
+    # multiplier for occurrences in the title
+    "TITLE_WEIGHT": 3.0,
+    # extra weight per additional word of a phrase, so "machine learning"
+    # outranks "machine" when both occur equally often
+    "PHRASE_WEIGHT": 0.5,
+    # a phrase seen fewer times than this (title occurrences count
+    # TITLE_WEIGHT times) is just two words that happen to be adjacent
+    "MIN_PHRASE_COUNT": 2,
+    # multiplier for terms that are already a Tag
+    "KNOWN_TAG_WEIGHT": 1.5,
+    # terms found in more than this share of articles are never suggested,
+    # once the corpus has at least MIN_CORPUS_SIZE articles
+    "MAX_DOC_RATIO": 0.5,
+    "MIN_CORPUS_SIZE": 20,
+}
+
+MAX_TERM_LENGTH = 100
+# terms per IN (...) lookup, below SQLite's bound parameter limit
+LOOKUP_CHUNK = 900
+URL = re.compile(r"https?://\S+|www\.\S+")
+# sentence punctuation and markdown syntax end a candidate phrase
+BOUNDARY = re.compile(r"[.,;:!?()\[\]{}<>\"|*_`~=/\\\n\r\t]+|\s[-#>]+\s|^#+")
+WORD = re.compile(r"[a-z0-9][a-z0-9+#'-]*")
+STOP_WORDS = ENGLISH_STOP_WORDS | {"ll", "ve", "re", "don", "doesn", "didn", "isn", "let", "lets", "just", "like", "really"}
+
+
+def get_setting(name):
+    return getattr(settings, "TAG_SUGGESTIONS", {}).get(name, DEFAULTS[name])
+
+
+# ----------------- CANDIDATES -----------------
+def candidate_terms(text):
+    """
+    Candidate terms of ``text`` in order of occurrence (repeated as often as
+    they occur), e.g. "Machine learning in Django" ->
+    ["machine", "machine learning", "learning", "django"].
+    """
+    max_words = get_setting("MAX_PHRASE_WORDS")
+    min_length = get_setting("MIN_WORD_LENGTH")
+    terms = []
+    for fragment in BOUNDARY.split(URL.sub(" ", (text or "").lower())):
+        run = []
+        for word in WORD.findall(fragment) + [""]:
+            if word.endswith("'s"):
+                word = word[:-2]
+            word = word.strip("'-")
+            if word and word not in STOP_WORDS and len(word) >= min_length and not word.isdigit():
+                run.append(word)
+                continue
+            for start in range(len(run)):
+                terms.append(run[start][:MAX_TERM_LENGTH])
+                for size in range(2, min(max_words, len(run) - start) + 1):
+                    words = run[start:start + size]
+                    term = " ".join(words)
+                    # "data data" is a repetition, not a phrase
+                    if len(term) <= MAX_TERM_LENGTH and len(set(words)) == size:
+                        terms.append(term)
+            run = []
+    return terms
+
+
+def source_hash(title, content):
+    return content_hash(f"{title or ''}\n{content or ''}")
+
+
+def display_name(term, *texts):
+    """
+    The term as first spelled in ``texts`` ("django rest" -> "Django REST").
+    """
+    pattern = re.compile(r"(?<![\w])" + r"[\s\W]+".join(re.escape(word) for word in term.split()) + r"(?![\w])", re.I)
+    for text in texts:
+        match = pattern.search(text or "")
+        if match:
+            return re.sub(r"\s+", " ", match.group(0))
+    return term
+
+
+# ----------------- DOCUMENT FREQUENCIES -----------------
+def chunked(items, size=LOOKUP_CHUNK):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def corpus_size():
+    return ArticleKeywords.objects.count()
+
+
+def document_frequencies(terms=None):
+    """
+    {term: doc_freq} for ``terms``, or for the whole vocabulary when None.
+    """
+    if terms is None:
+        return dict(KeywordTerm.objects.filter(doc_freq__gt=0).values_list("term", "doc_freq"))
+    frequencies = {}
+    for chunk in chunked(terms):
+        frequencies.update(KeywordTerm.objects.filter(term__in=chunk).values_list("term", "doc_freq"))
+    return frequencies
+
+
+def term_ids(terms):
+    """
+    {term: KeywordTerm id}, creating the terms that are new.
+    """
+    ids = {}
+    for chunk in chunked(terms):
+        ids.update(KeywordTerm.objects.filter(term__in=chunk).values_list("term", "id"))
+    missing = [term for term in terms if term not in ids]
+    if missing:
+        KeywordTerm.objects.bulk_create([KeywordTerm(term=term) for term in missing], ignore_conflicts=True, batch_size=500)
+        for chunk in chunked(missing):
+            ids.update(KeywordTerm.objects.filter(term__in=chunk).values_list("term", "id"))
+    return ids
+
+
+def pack(ids):
+    return np.asarray(sorted(ids), dtype="<i8").tobytes()
+
+
+def unpack(data):
+    return set(np.frombuffer(bytes(data), dtype="<i8").tolist())
+
+
+def apply_deltas(deltas):
+    """
+    Add {term id: delta} to doc_freq with one UPDATE per distinct delta.
+    """
+    by_delta = {}
+    for term_id, delta in deltas.items():
+        if delta:
+            by_delta.setdefault(delta, []).append(term_id)
+    for delta, ids in by_delta.items():
+        for chunk in chunked(ids):
+            KeywordTerm.objects.filter(pk__in=chunk).update(doc_freq=F("doc_freq") + delta)
+
+
+def index_articles(articles):
+    """
+    Count the terms of each article in KeywordTerm.doc_freq, undoing what its
+    previous version counted. Articles whose title and content have not
+    changed since they were last indexed are skipped.
+    """
+    if not get_setting("ENABLED"):
+        return 0
+    articles = [article for article in articles if article.pk]
+    stored = {
+        pk: (hash_, data)
+        for pk, hash_, data in ArticleKeywords.objects.filter(
+            article_id__in=[article.pk for article in articles]
+        ).values_list("article_id", "source_hash", "term_ids")
+    }
+    changed = []
+    for article in articles:
+        hash_ = source_hash(article.title, article.content)
+        if stored.get(article.pk, (None,))[0] != hash_:
+            changed.append((article, hash_, set(candidate_terms(f"{article.title}\n{article.content}"))))
+    if not changed:
+        return 0
+
+    with transaction.atomic():
+        ids = term_ids(sorted(set().union(*(terms for _, _, terms in changed))))
+        deltas, rows = {}, []
+        for article, hash_, terms in changed:
+            new = {ids[term] for term in terms}
+            old = unpack(stored[article.pk][1]) if article.pk in stored else set()
+            for term_id in new - old:
+                deltas[term_id] = deltas.get(term_id, 0) + 1
+            for term_id in old - new:
+                deltas[term_id] = deltas.get(term_id, 0) - 1
+            rows.append(ArticleKeywords(article_id=article.pk, source_hash=hash_, term_ids=pack(new)))
+        apply_deltas(deltas)
+        ArticleKeywords.objects.bulk_create(
+            rows, update_conflicts=True, unique_fields=["article"], update_fields=["source_hash", "term_ids"],
+        )
+    return len(changed)
+
+
+def index_article(article):
+    return index_articles([article])
+
+
+def release_article(pk):
+    """
+    Take back the counts of an article about to be deleted (its
+    ArticleKeywords row then goes away with the cascade).
+    """
+    data = ArticleKeywords.objects.filter(article_id=pk).values_list("term_ids", flat=True).first()
+    if data is not None:
+        apply_deltas({term_id: -1 for term_id in unpack(data)})
+
+
+def rebuild_index(queryset, batch_size=1000):
+    """
+    Recount the vocabulary from scratch over ``queryset`` (normally every
+    article); returns the number of articles indexed.
+    """
+    vectorizer = CountVectorizer(analyzer=candidate_terms, binary=True)
+    total, frequencies, batches = 0, {}, []
+    articles = queryset.only("id", "title", "content").order_by("id").iterator(chunk_size=batch_size)
+    with transaction.atomic():
+        ArticleKeywords.objects.all().delete()
+        KeywordTerm.objects.all().delete()
+        while True:
+            batch = [article for _, article in zip(range(batch_size), articles)]
+            if not batch:
+                break
+            counts = vectorizer.fit_transform(f"{a.title}\n{a.content}" for a in batch).tocsr()
+            vocabulary = vectorizer.get_feature_names_out()
+            for term, df in zip(vocabulary, np.asarray(counts.sum(axis=0)).ravel()):
+                frequencies[term] = frequencies.get(term, 0) + int(df)
+            batches.append([
+                (article.pk, source_hash(article.title, article.content), vocabulary[counts.indices[counts.indptr[row]:counts.indptr[row + 1]]])
+                for row, article in enumerate(batch)
+            ])
+            total += len(batch)
+
+        KeywordTerm.objects.bulk_create(
+            [KeywordTerm(term=term, doc_freq=df) for term, df in frequencies.items()], batch_size=2000,
+        )
+        ids = dict(KeywordTerm.objects.values_list("term", "id"))
+        for batch in batches:
+            ArticleKeywords.objects.bulk_create([
+                ArticleKeywords(article_id=pk, source_hash=hash_, term_ids=pack(ids[term] for term in terms))
+                for pk, hash_, terms in batch
+            ])
+    return total
+
+
+# ----------------- SUGGESTIONS -----------------
+def suggest_batch(documents, limit=None, frequencies=None, corpus=None, tags=None):
+    """
+    Suggested tags for each (title, content) in ``documents``, as lists of
+    (name, score) with scores in (0, 1], best first.
+
+    All documents are scored together as one sparse TF-IDF matrix.
+    ``frequencies`` ({term: doc_freq}), ``corpus`` (article count) and
+    ``tags`` ({slug: name}) are looked up when not given; batch callers load
+    them once with document_frequencies(), corpus_size() and all_tags().
+    """
+    limit = limit or get_setting("MAX_TAGS")
+    documents = list(documents)
+    if not documents:
+        return []
+    vectorizer = CountVectorizer(analyzer=candidate_terms, dtype=np.float32)
+    try:
+        counts = vectorizer.fit_transform([title or "" for title, _ in documents] + [content or "" for _, content in documents])
+    except ValueError:
+        # no document has a single candidate term
+        return [[] for _ in documents]
+    vocabulary = vectorizer.get_feature_names_out()
+    counts = counts.tocsr()
+    tf = (counts[len(documents):] + get_setting("TITLE_WEIGHT") * counts[:len(documents)]).tocsr()
+    words = np.fromiter((term.count(" ") + 1 for term in vocabulary), dtype=np.float32, count=len(vocabulary))
+    tf.data[(words[tf.indices] > 1) & (tf.data < get_setting("MIN_PHRASE_COUNT"))] = 0
+    tf.data = np.where(tf.data > 0, 1 + np.log(np.maximum(tf.data, 1)), 0)
+
+    if frequencies is None:
+        frequencies = document_frequencies(vocabulary.tolist())
+    corpus = corpus_size() if corpus is None else corpus
+    df = np.fromiter((frequencies.get(term, 0) for term in vocabulary), dtype=np.float32, count=len(vocabulary))
+    weights = np.log((1 + corpus) / (1 + df)) + 1
+    weights *= 1 + get_setting("PHRASE_WEIGHT") * (words - 1)
+    if corpus >= get_setting("MIN_CORPUS_SIZE"):
+        weights[df > get_setting("MAX_DOC_RATIO") * corpus] = 0
+    known = known_tags(vectorizer.vocabulary_, tags)
+    if known:
+        weights[[vectorizer.vocabulary_[term] for term in known]] *= get_setting("KNOWN_TAG_WEIGHT")
+    scores = tf.multiply(weights).tocsr()
+
+    results = []
+    for row, (title, content) in enumerate(documents):
+        start, end = scores.indptr[row], scores.indptr[row + 1]
+        values, columns = scores.data[start:end], scores.indices[start:end]
+        norm = math.sqrt(float(np.dot(values, values))) or 1.0
+        # a few spare candidates cover the ones dropped as overlapping
+        top = np.argsort(-values, kind="stable")[:limit * 4]
+        chosen, words = [], set()
+        for position in top:
+            term = vocabulary[columns[position]]
+            term_words = set(term.split())
+            if values[position] <= 0 or term_words & words:
+                continue
+            words |= term_words
+            name = known.get(term) or display_name(term, title, content)
+            chosen.append((name, round(float(values[position]) / norm, 4)))
+            if len(chosen) == limit:
+                break
+        results.append(chosen)
+    return results
+
+
+def all_tags():
+    return dict(Tag.objects.filter(article_count__gt=0).values_list("slug", "name"))
+
+
+def known_tags(vocabulary, tags=None):
+    """
+    {term: Tag.name} for the terms of ``vocabulary`` that are existing tags.
+    The slug of a plain lowercase term is the term with its spaces
+    hyphenated (terms with "+" or "#", like "c++", never match).
+    """
+    if tags is None:
+        tags = {}
+        for chunk in chunked({term.replace(" ", "-") for term in vocabulary}):
+            tags.update(Tag.objects.filter(slug__in=chunk, article_count__gt=0).values_list("slug", "name"))
+    known = {}
+    for slug, name in tags.items():
+        for term in (slug, slug.replace("-", " ")):
+            if term in vocabulary:
+                known[term] = name
+    return known
+
+
+def suggest_tags(article, limit=None):
+    return suggest_batch([(article.title, article.content)], limit=limit)[0]
+
+
+def suggest_text_tags(text, limit=None):
+    return suggest_batch([("", text)], limit=limit)[0]
+
+
+def generated_tags(text):
+    """
+    Tags for a generated post: its 'Related Tags' section when the model
+    wrote one, else local suggestions, else DEFAULT_TAGS.
+    """
+    tags = parse_tags(text, default=None)
+    if not tags and get_setting("ENABLED"):
+        try:
+            tags = [name for name, _ in suggest_text_tags(text)]
+        except Exception as e:
+            print("❌ Tag suggestion error:", e)
+            print(traceback.format_exc())
+    return tags or list(DEFAULT_TAGS)
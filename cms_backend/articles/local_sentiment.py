@@ -0,0 +1,224 @@
+# articles/local_sentiment.py
+"""
+Local first tier for sentiment classification.
+
+Content is classified in-process, and Gemini is only asked when the local
+confidence is below THRESHOLD (see ai.run_sentiment). Two classifiers:
+
+- model: TF-IDF, chi2 feature selection and logistic regression trained by
+  `manage.py train_sentiment_model` from the Gemini labels already stored
+  in Article.sentiment; confidence is the top class probability.
+- lexicon: counts positive and negative words ("not good" counts against);
+  confidence grows with the share of the dominant polarity and with the
+  amount of evidence. It never answers Neutral/Mixed with confidence.
+
+CLASSIFIER "auto" uses the trained model when MODEL_PATH exists, else the
+lexicon. Both classify many texts at once as one sparse matrix.
+
+Local answers are written like Gemini's ("<label>. <justification>") with
+LOCAL_MARKER in the justification, so training never learns from them.
+"""
+import os
+import re
+from functools import lru_cache
+from pathlib import Path
+
+import joblib
+import numpy as np
+from django.conf import settings
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+from sklearn.feature_selection import SelectPercentile, chi2
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import make_pipeline
+
+
+DEFAULTS = {
+    "ENABLED": True,
+    # "auto" (model when trained, else lexicon), "model" or "lexicon"
+    "CLASSIFIER": "auto",
+    # local confidence at or above which Gemini is not asked
+    "THRESHOLD": 0.8,
+    "MODEL_PATH": None,
+    # stored Gemini labels needed before a model is trained
+    "MIN_TRAINING_LABELS": 50,
+}
+
+POSITIVE = "Positive"
+NEGATIVE = "Negative"
+NEUTRAL = "Neutral/Mixed"
+LABELS = (POSITIVE, NEGATIVE, NEUTRAL)
+LOCAL_MARKER = "classified locally"
+
+LABEL_PATTERNS = [
+    (NEUTRAL, re.compile(r"\b(neutral|mixed)\b", re.I)),
+    (POSITIVE, re.compile(r"\bpositive\b", re.I)),
+    (NEGATIVE, re.compile(r"\bnegative\b", re.I)),
+]
+
+POSITIVE_WORDS = """
+    amazing awesome beautiful best better brilliant celebrate clean delight delighted delightful easy effective
+    efficient elegant enjoy enjoyable excellent exceptional excited exciting fantastic fast favorite fun glad good
+    gorgeous great happy helpful impressive improve improved incredible innovative inspiring love loved lovely
+    outstanding perfect pleasant pleased powerful recommend reliable remarkable robust satisfied seamless simple
+    smooth solid stunning success successful superb thrilled thriving top valuable win wonderful worth
+""".split()
+NEGATIVE_WORDS = """
+    angry annoying awful bad broken bug buggy complain confusing crash crashes damage danger dangerous difficult
+    disappointed disappointing disaster fail failed failing failure fault flawed frustrating hard hate horrible
+    hurt issue lose loss mess painful poor problem problems regret sad scary slow struggle stupid terrible
+    threat ugly unfortunately unreliable unstable useless waste weak worse worst wrong
+""".split()
+NEGATION = re.compile(r"\b(?:not|no|never|hardly|without|\w+n't)\s+(\w+)")
+# evidence (matched polarity words) at which lexicon confidence reaches ~63%
+# of the dominant share
+LEXICON_EVIDENCE = 2.0
+
+
+def get_setting(name):
+    value = getattr(settings, "LOCAL_SENTIMENT", {}).get(name, DEFAULTS[name])
+    if name == "MODEL_PATH" and value is None:
+        value = Path(settings.BASE_DIR) / "sentiment_model.joblib"
+    return value
+
+
+def parse_label(text):
+    """
+    The label at the start of a Gemini sentiment answer, or None.
+    """
+    head = (text or "").strip()[:60]
+    matches = [(match.start(), label) for label, pattern in LABEL_PATTERNS for match in [pattern.search(head)] if match]
+    return min(matches)[1] if matches else None
+
+
+def answer_text(label, confidence):
+    return f"{label}. {LOCAL_MARKER.capitalize()} (confidence {confidence:.2f})."
+
+
+# ----------------- LEXICON -----------------
+def negate(text):
+    return NEGATION.sub(r"not_\1", text.lower())
+
+
+@lru_cache(maxsize=1)
+def lexicon_vectorizer():
+    weights = {word: 1.0 for word in POSITIVE_WORDS}
+    weights.update({word: -1.0 for word in NEGATIVE_WORDS})
+    weights.update({f"not_{word}": -weight for word, weight in list(weights.items())})
+    vocabulary = sorted(weights)
+    vectorizer = CountVectorizer(vocabulary=vocabulary, preprocessor=negate, token_pattern=r"[a-z_']+")
+    return vectorizer, np.array([weights[word] for word in vocabulary])
+
+
+def lexicon_classify(texts):
+    vectorizer, weights = lexicon_vectorizer()
+    counts = vectorizer.transform(texts)
+    positive = np.asarray(counts @ np.maximum(weights, 0)).ravel()
+    negative = np.asarray(counts @ np.maximum(-weights, 0)).ravel()
+    evidence = positive + negative
+    share = np.divide(np.abs(positive - negative), evidence, out=np.zeros_like(evidence), where=evidence > 0)
+    confidence = share * (1 - np.exp(-evidence / LEXICON_EVIDENCE))
+    labels = np.where(positive > negative, POSITIVE, np.where(negative > positive, NEGATIVE, NEUTRAL))
+    # a text with no polarity words, or as many of each, is never confidently neutral
+    confidence[labels == NEUTRAL] = 0.0
+    return [(str(label), float(score)) for label, score in zip(labels, confidence)]
+
+
+# ----------------- MODEL -----------------
+def training_set(queryset):
+    """
+    (texts, labels) from articles whose stored sentiment came from Gemini.
+    """
+    texts, labels = [], []
+    for content, sentiment in queryset.exclude(sentiment__isnull=True).exclude(sentiment="").exclude(
+        sentiment__icontains=LOCAL_MARKER
+    ).values_list("content", "sentiment").iterator(chunk_size=2000):
+        label = parse_label(sentiment)
+        if label and (content or "").strip():
+            texts.append(content)
+            labels.append(label)
+    return texts, labels
+
+
+def build_model():
+    return make_pipeline(
+        TfidfVectorizer(preprocessor=negate, ngram_range=(1, 2), min_df=2, max_features=200_000, sublinear_tf=True),
+        # most n-grams say nothing about sentiment; keeping the 5% most
+        # label-dependent ones stops the classifier fitting topic noise
+        SelectPercentile(chi2, percentile=5),
+        LogisticRegression(max_iter=1000, class_weight="balanced", C=5),
+    )
+
+
+def save_model(model, path=None):
+    path = Path(path or get_setting("MODEL_PATH"))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    joblib.dump(model, tmp)
+    os.replace(tmp, path)
+    load_model.cache_clear()
+
+
+@lru_cache(maxsize=4)
+def load_model(path, mtime):
+    return joblib.load(path)
+
+
+def current_model():
+    """
+    The trained model, reloaded when MODEL_PATH is replaced; None when untrained.
+    """
+    path = str(get_setting("MODEL_PATH"))
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    return load_model(path, mtime)
+
+
+def model_classify(model, texts):
+    probabilities = model.predict_proba(texts)
+    best = probabilities.argmax(axis=1)
+    return [(str(model.classes_[index]), float(row[index])) for index, row in zip(best, probabilities)]
+
+
+# ----------------- CLASSIFY -----------------
+def classify_batch(texts, classifier=None):
+    """
+    [(label, confidence)] for each text, in one vectorized pass.
+    """
+    texts = [text or "" for text in texts]
+    if not texts:
+        return []
+    classifier = classifier or get_setting("CLASSIFIER")
+    model = current_model() if classifier in ("auto", "model") else None
+    if model is not None:
+        return model_classify(model, texts)
+    if classifier == "model":
+        raise RuntimeError("No sentiment model trained; run `manage.py train_sentiment_model`")
+    return lexicon_classify(texts)
+
+
+def classify(text, classifier=None):
+    return classify_batch([text], classifier=classifier)[0]
+
+
+def local_answers(texts, tier=None):
+    """
+    [(answer text or None, confidence)] for each text. The answer is None when
+    Gemini should be asked: confidence below THRESHOLD, the tier disabled, or
+    ``tier="llm"``. ``tier="local"`` always answers locally.
+    """
+    texts = list(texts)
+    if tier == "llm" or (tier != "local" and not get_setting("ENABLED")):
+        return [(None, None)] * len(texts)
+    results = []
+    for label, confidence in classify_batch(texts):
+        if tier == "local" or confidence >= get_setting("THRESHOLD"):
+            results.append((answer_text(label, confidence), round(confidence, 4)))
+        else:
+            results.append((None, round(confidence, 4)))
+    return results
+
+
+def local_answer(text, tier=None):
+    return local_answers([text], tier=tier)[0]
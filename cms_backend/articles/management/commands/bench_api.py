@@ -0,0 +1,263 @@
+import json
+import platform
+import random
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from articles import ai
+from articles.ai_cache import get_ai_cache
+from articles.fake_gemini import DISTRIBUTIONS, client_from_settings
+from articles.models import AIUsage, AIUsageDaily, Article
+from articles.usage_buffer import get_usage_buffer
+
+from .bench_async_ai import percentile
+
+BENCH_USERNAME = "bench-api"
+ENDPOINTS = ("list", "detail", "create", "generate", "summarize", "sentiment", "usage")
+WORDS = (
+    "django cache query index latency throughput article editor summary model "
+    "python request worker queue token stream search tag content review draft"
+).split()
+
+
+def int_list(value):
+    try:
+        return [int(v) for v in value.split(",") if v.strip()]
+    except ValueError:
+        raise CommandError(f"Expected comma-separated integers, got {value!r}")
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=settings.BASE_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def synthetic_content(rng, words=300):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive the real DRF endpoints (list, detail, create, generate, summarize, "
+        "sentiment, usage) against the offline fake Gemini and report throughput and "
+        "p50/p95/p99 latency per concurrency level and corpus size. Results are saved "
+        "as JSON; pass --compare with an earlier file to see the change."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help="Comma-separated subset of: " + ", ".join(ENDPOINTS))
+        parser.add_argument("--concurrency", type=int_list, default=[1, 8], help="Comma-separated levels, e.g. 1,8,32")
+        parser.add_argument("--corpus", type=int_list, default=[200], help="Comma-separated article counts, e.g. 100,2000")
+        parser.add_argument("--requests", type=int, default=100, help="Timed requests per endpoint and level")
+        parser.add_argument("--warmup", type=int, default=3, help="Untimed requests per endpoint first")
+        parser.add_argument("--latency", type=float, help="Fake Gemini latency (default AI_FAKE_GEMINI)")
+        parser.add_argument("--distribution", choices=DISTRIBUTIONS)
+        parser.add_argument("--jitter", type=float)
+        parser.add_argument("--output-tokens", type=int)
+        parser.add_argument("--failure-rate", type=float)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--ai-cache", action="store_true",
+            help="Keep the AI result cache and single-flight on (default: every AI call goes upstream)",
+        )
+        parser.add_argument("--output", help="JSON results path (default bench_results/api-<commit>-<time>.json)")
+        parser.add_argument("--compare", help="Earlier JSON results to compare against")
+
+    def handle(self, *args, **options):
+        endpoints = [e.strip() for e in options["endpoints"].split(",") if e.strip()]
+        unknown = set(endpoints) - set(ENDPOINTS)
+        if unknown:
+            raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+
+        fake = client_from_settings(
+            latency=options["latency"], distribution=options["distribution"], jitter=options["jitter"],
+            output_tokens=options["output_tokens"], failure_rate=options["failure_rate"], seed=options["seed"],
+        )
+        real_client = ai.client
+        ai.client = fake
+
+        overrides = {
+            # quotas would turn most AI requests into 429s
+            "AI_QUOTA": {**getattr(settings, "AI_QUOTA", {}), "ENABLED": False},
+            # authenticated requests skip it anyway; keep it out of create's write path too
+            "ARTICLE_RESPONSE_CACHE": {**getattr(settings, "ARTICLE_RESPONSE_CACHE", {}), "ENABLED": False},
+            "AI_AUTO_ANALYSIS": {**getattr(settings, "AI_AUTO_ANALYSIS", {}), "ENABLED": False},
+        }
+        if not options["ai_cache"]:
+            overrides["AI_CACHE"] = {**getattr(settings, "AI_CACHE", {}), "ENABLED": False}
+            overrides["AI_SINGLE_FLIGHT"] = {**getattr(settings, "AI_SINGLE_FLIGHT", {}), "ENABLED": False}
+        bench_settings = override_settings(**overrides)
+        bench_settings.enable()
+        get_ai_cache.cache_clear()
+
+        user, created = User.objects.get_or_create(username=BENCH_USERNAME)
+        self.auth = f"Bearer {AccessToken.for_user(user)}"
+        rng = random.Random(options["seed"])
+        results = []
+        try:
+            for corpus in options["corpus"]:
+                pks = self.seed_corpus(user, corpus, rng)
+                for concurrency in options["concurrency"]:
+                    for endpoint in endpoints:
+                        result = self.run_endpoint(endpoint, pks, concurrency, options["requests"], options["warmup"], rng)
+                        result.update(corpus=corpus, concurrency=concurrency)
+                        results.append(result)
+                        self.report(result)
+                # buffered usage rows still point at these articles
+                get_usage_buffer().flush()
+                Article.objects.filter(author=user).delete()
+        finally:
+            bench_settings.disable()
+            get_ai_cache.cache_clear()
+            ai.client = real_client
+            # write buffered rows now, before their user is deleted
+            get_usage_buffer().flush()
+            AIUsage.objects.filter(user=user).delete()
+            AIUsageDaily.objects.filter(user=user).delete()
+            Article.objects.filter(author=user).delete()
+            if created:
+                user.delete()
+
+        payload = {
+            "meta": {
+                "commit": git_commit(),
+                "timestamp": timezone.now().isoformat(),
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "database": connection.vendor,
+                "requests": options["requests"],
+                "ai_cache": options["ai_cache"],
+                "fake_gemini": fake.describe(),
+            },
+            "results": results,
+        }
+        path = Path(options["output"] or settings.BASE_DIR / "bench_results" / (
+            f"api-{payload['meta']['commit']}-{timezone.now():%Y%m%d-%H%M%S}.json"
+        ))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(payload, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"results saved to {path}"))
+
+        if options["compare"]:
+            self.compare(json.loads(Path(options["compare"]).read_text()), payload)
+
+    # ---------------- corpus ----------------
+    def seed_corpus(self, user, size, rng):
+        Article.objects.bulk_create(
+            [
+                Article(
+                    title=f"Bench article {i}",
+                    content=synthetic_content(rng),
+                    tags=", ".join(rng.sample(WORDS, 3)),
+                    author=user,
+                )
+                for i in range(size)
+            ],
+            batch_size=500,
+        )
+        return list(Article.objects.filter(author=user).values_list("id", flat=True))
+
+    # ---------------- requests ----------------
+    def build_request(self, endpoint, pks, i, rng):
+        """
+        Return (method, path, body, expected status) for request ``i`` of ``endpoint``.
+        """
+        if endpoint == "list":
+            return "get", f"/api/articles/?page_size={rng.choice([20, 50, 100])}", None, 200
+        if endpoint == "detail":
+            return "get", f"/api/articles/{rng.choice(pks)}/", None, 200
+        if endpoint == "create":
+            body = {"title": f"Bench created {i}", "content": synthetic_content(rng, 150), "tags": "bench"}
+            return "post", "/api/articles/", body, 201
+        if endpoint == "generate":
+            return "post", "/api/articles/generate/", {"topic": f"bench topic {i} {rng.random()}"}, 200
+        if endpoint in ("summarize", "sentiment"):
+            # refresh skips stored auto-analysis results so Gemini is always asked
+            return "post", f"/api/articles/{rng.choice(pks)}/{endpoint}/?refresh=1", {}, 200
+        path = "/api/usage/summary/?group_by=feature" if i % 2 else "/api/usage/"
+        return "get", path, None, 200
+
+    def run_endpoint(self, endpoint, pks, concurrency, total, warmup, rng):
+        local = threading.local()
+        # built up front so the shared rng is never used from worker threads
+        requests = [self.build_request(endpoint, pks, i, rng) for i in range(warmup + total)]
+
+        def one(request):
+            if not hasattr(local, "client"):
+                # server errors (e.g. SQLite lock timeouts) count as errors, not crashes
+                local.client = Client(raise_request_exception=False)
+            method, path, body, expected = request
+            start = time.perf_counter()
+            if method == "get":
+                resp = local.client.get(path, HTTP_AUTHORIZATION=self.auth)
+            else:
+                resp = local.client.post(path, body, content_type="application/json", HTTP_AUTHORIZATION=self.auth)
+            return time.perf_counter() - start, resp.status_code == expected
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(one, requests[:warmup]))
+            start = time.perf_counter()
+            timed = list(pool.map(one, requests[warmup:]))
+            wall = time.perf_counter() - start
+
+        latencies = [elapsed for elapsed, _ in timed]
+        return {
+            "endpoint": endpoint,
+            "requests": total,
+            "errors": sum(1 for _, ok in timed if not ok),
+            "wall_s": round(wall, 4),
+            "rps": round(total / wall, 2),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "max_ms": round(max(latencies) * 1000, 2),
+        }
+
+    # ---------------- output ----------------
+    def report(self, result):
+        if not getattr(self, "header_written", False):
+            self.stdout.write(
+                f"{'endpoint':<11}{'corpus':>8}{'conc':>6}{'req/s':>10}{'p50 ms':>10}"
+                f"{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}"
+            )
+            self.header_written = True
+        self.stdout.write(
+            f"{result['endpoint']:<11}{result['corpus']:>8}{result['concurrency']:>6}{result['rps']:>10.1f}"
+            f"{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}{result['errors']:>8}"
+        )
+
+    def compare(self, baseline, current):
+        def index(payload):
+            return {(r["endpoint"], r["corpus"], r["concurrency"]): r for r in payload["results"]}
+
+        before = index(baseline)
+        self.stdout.write(f"compared with {baseline['meta'].get('commit', '?')} ({baseline['meta'].get('timestamp', '?')})")
+        self.stdout.write(f"{'endpoint':<11}{'corpus':>8}{'conc':>6}{'req/s Δ%':>11}{'p95 Δ%':>10}{'p99 Δ%':>10}")
+        for key, now in index(current).items():
+            old = before.get(key)
+            if old is None:
+                continue
+
+            def change(field):
+                return (now[field] - old[field]) / old[field] * 100 if old[field] else 0.0
+
+            self.stdout.write(
+                f"{key[0]:<11}{key[1]:>8}{key[2]:>6}{change('rps'):>+11.1f}{change('p95_ms'):>+10.1f}{change('p99_ms'):>+10.1f}"
+            )
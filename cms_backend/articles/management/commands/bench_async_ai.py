@@ -0,0 +1,112 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from articles import ai
+from articles.ai_cache import get_ai_cache
+from articles.fake_gemini import FakeGeminiClient
+from articles.models import AIUsage, AIUsageDaily
+from articles.usage_buffer import get_usage_buffer
+
+BENCH_USERNAME = "bench-async-ai"
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare sync (thread-per-request) and async (client.aio) generate endpoints "
+        "against a local fake Gemini with fixed latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200, help="Concurrent requests per run")
+        parser.add_argument("--latency", type=float, default=0.5, help="Fake Gemini latency in seconds")
+        parser.add_argument(
+            "--sync-workers", type=int, default=8,
+            help="Sync concurrency (gunicorn workers x threads) to emulate",
+        )
+
+    def handle(self, *args, **options):
+        total = options["requests"]
+        latency = options["latency"]
+        workers = options["sync_workers"]
+
+        user, created = User.objects.get_or_create(username=BENCH_USERNAME)
+        auth = f"Bearer {AccessToken.for_user(user)}"
+        real_client = ai.client
+        ai.client = FakeGeminiClient(latency=latency)
+
+        # every request must reach the fake upstream, so bypass the result cache,
+        # single-flight coalescing and the per-user quota
+        no_cache = override_settings(
+            AI_CACHE={**getattr(settings, "AI_CACHE", {}), "ENABLED": False},
+            AI_SINGLE_FLIGHT={**getattr(settings, "AI_SINGLE_FLIGHT", {}), "ENABLED": False},
+            AI_QUOTA={**getattr(settings, "AI_QUOTA", {}), "ENABLED": False},
+        )
+        no_cache.enable()
+        get_ai_cache.cache_clear()
+        try:
+            sync_result = self.run_sync(total, workers, auth)
+            async_result = asyncio.run(self.run_async(total, auth))
+        finally:
+            no_cache.disable()
+            get_ai_cache.cache_clear()
+            ai.client = real_client
+            # write buffered rows now, before their user is deleted
+            get_usage_buffer().flush()
+            AIUsage.objects.filter(user=user).delete()
+            AIUsageDaily.objects.filter(user=user).delete()
+            if created:
+                user.delete()
+
+        self.stdout.write(f"fake latency={latency:.3f}s requests={total} sync concurrency={workers}")
+        self.stdout.write(f"{'mode':<8}{'wall s':>10}{'req/s':>10}{'p50 s':>10}{'p95 s':>10}{'errors':>8}")
+        for name, (wall, latencies, errors) in (("sync", sync_result), ("async", async_result)):
+            self.stdout.write(
+                f"{name:<8}{wall:>10.3f}{total / wall:>10.1f}"
+                f"{percentile(latencies, 50):>10.3f}{percentile(latencies, 95):>10.3f}{errors:>8}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"async speedup: {sync_result[0] / async_result[0]:.1f}x"))
+
+    def run_sync(self, total, workers, auth):
+        def one(i):
+            client = Client()
+            start = time.perf_counter()
+            resp = client.post(
+                "/api/articles/generate/", {"topic": f"sync topic {i}"},
+                content_type="application/json", HTTP_AUTHORIZATION=auth,
+            )
+            return time.perf_counter() - start, resp.status_code
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(one, range(total)))
+        wall = time.perf_counter() - start
+        return wall, [r[0] for r in results], sum(1 for r in results if r[1] != 200)
+
+    async def run_async(self, total, auth):
+        client = AsyncClient()
+
+        async def one(i):
+            start = time.perf_counter()
+            resp = await client.post(
+                "/api/async/articles/generate/", {"topic": f"async topic {i}"},
+                content_type="application/json", headers={"Authorization": auth},
+            )
+            return time.perf_counter() - start, resp.status_code
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(one(i) for i in range(total)))
+        wall = time.perf_counter() - start
+        return wall, [r[0] for r in results], sum(1 for r in results if r[1] != 200)
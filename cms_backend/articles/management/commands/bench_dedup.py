@@ -0,0 +1,130 @@
+import itertools
+import random
+import resource
+import time
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from articles import dedup
+from articles.models import Article, ArticleFingerprint
+
+from .bench_api import int_list
+from .bench_search import make_vocabulary, percentile
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark MinHash LSH near-duplicate detection on synthetic corpora of several sizes: "
+        "index build time, memory and storage, query latency and recall on planted near-duplicates, "
+        "against a brute-force comparison with every signature. Each corpus is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int_list, default=[1_000, 10_000, 100_000])
+        parser.add_argument("--words", type=int, default=200, help="Words per synthetic article")
+        parser.add_argument("--dup-rate", type=float, default=0.05, help="Share of articles that are edited copies")
+        parser.add_argument("--mutation", type=float, default=0.02, help="Share of words replaced in a copy")
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--skip-naive", action="store_true", help="Skip the brute-force baseline")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        vocabulary = make_vocabulary(rng, 20_000)
+        cum_weights = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(len(vocabulary))))
+        self.stdout.write(
+            f"num_perm={dedup.get_setting('NUM_PERM')} bands={dedup.get_setting('BANDS')} "
+            f"shingle={dedup.get_setting('SHINGLE_SIZE')} threshold={dedup.get_setting('THRESHOLD')}"
+        )
+        for size in options["sizes"]:
+            with transaction.atomic():
+                self.run_size(size, options, rng, vocabulary, cum_weights)
+                transaction.set_rollback(True)
+
+    def run_size(self, size, options, rng, vocabulary, cum_weights):
+        user = User.objects.create(username="bench-dedup")
+        contents, originals = [], {}
+        for i in range(size):
+            if contents and rng.random() < options["dup_rate"]:
+                source = rng.randrange(len(contents))
+                words = contents[source].split()
+                for position in rng.sample(range(len(words)), max(1, int(len(words) * options["mutation"]))):
+                    words[position] = rng.choice(vocabulary)
+                originals[i] = source
+                contents.append(" ".join(words))
+            else:
+                contents.append(" ".join(rng.choices(vocabulary, cum_weights=cum_weights, k=options["words"])))
+        for start in range(0, size, 2000):
+            Article.objects.bulk_create([
+                Article(title=f"Bench {i}", content=contents[i], author=user)
+                for i in range(start, min(start + 2000, size))
+            ])
+        pks = list(Article.objects.filter(author=user).order_by("id").values_list("id", flat=True))
+
+        start = time.perf_counter()
+        dedup.rebuild_index(Article.objects.filter(author=user))
+        build = time.perf_counter() - start
+        # peak resident size of the whole process so far (KiB on Linux)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        signature_bytes = size * dedup.get_setting("NUM_PERM") * 4
+        self.stdout.write(
+            f"articles={size:<8} build={build:7.2f}s ({size / build:8.0f}/s) peak_rss={peak / 2**20:7.1f}MB "
+            f"signatures={signature_bytes / 2**20:6.1f}MB band_rows={size * dedup.get_setting('BANDS')}"
+            f"{self.table_sizes()}"
+        )
+
+        planted = list(originals.items())
+        sample = rng.sample(planted, min(len(planted), options["queries"] // 2))
+        sample += [(i, None) for i in rng.sample(range(size), min(size, options["queries"] - len(sample)))]
+        articles = Article.objects.in_bulk([pks[i] for i, _ in sample])
+
+        latencies, found = [], 0
+        for i, source in sample:
+            start = time.perf_counter()
+            matches = dedup.find_duplicates(articles[pks[i]])
+            latencies.append(time.perf_counter() - start)
+            if source is not None and pks[source] in {pk for pk, _ in matches}:
+                found += 1
+        recall = found / len([1 for _, source in sample if source is not None] or [1])
+        self.report("lsh", size, latencies, f" recall={recall:.1%}")
+
+        if not options["skip_naive"]:
+            naive = []
+            for i, _ in sample[:20]:
+                start = time.perf_counter()
+                self.brute_force(articles[pks[i]])
+                naive.append(time.perf_counter() - start)
+            self.report("brute", size, naive)
+
+    def brute_force(self, article):
+        """
+        The pairwise baseline: compare with every stored signature.
+        """
+        sig = dedup.signature(article.content)
+        rows = list(ArticleFingerprint.objects.exclude(article_id=article.pk).values_list("article_id", "signature"))
+        scores = dedup.similarity(sig, np.stack([dedup.unpack(data) for _, data in rows]))
+        return [(pk, score) for (pk, _), score in zip(rows, scores) if score >= dedup.get_setting("THRESHOLD")]
+
+    def table_sizes(self):
+        if connection.vendor != "sqlite":
+            return ""
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT sum(pgsize) FROM dbstat WHERE name IN "
+                    "('articles_articlefingerprint', 'articles_articlelshband', 'lsh_band_key_idx')"
+                )
+                total = cursor.fetchone()[0] or 0
+        except Exception:
+            # dbstat is an optional SQLite module
+            return ""
+        return f" db_tables={total / 2**20:.1f}MB"
+
+    def report(self, name, size, latencies, extra=""):
+        self.stdout.write(
+            f"  {name:<6} articles={size:<8} n={len(latencies):<5} p50={percentile(latencies, 50) * 1000:8.2f}ms "
+            f"p95={percentile(latencies, 95) * 1000:8.2f}ms p99={percentile(latencies, 99) * 1000:8.2f}ms{extra}"
+        )
@@ -0,0 +1,113 @@
+import itertools
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import import_string
+
+from articles.related import VectorIndex, get_setting
+
+from .bench_api import int_list
+from .bench_search import make_vocabulary, percentile
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark related-articles top-k queries on synthetic vector indexes of several "
+        "sizes (default 10k, 100k and 1M rows). Indexes are built in a temporary directory "
+        "without touching the database or the real index."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", type=int_list, default=[10_000, 100_000, 1_000_000])
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--k", type=int, default=10)
+        parser.add_argument("--words", type=int, default=80, help="Words per synthetic article")
+        parser.add_argument("--dim", type=int, default=get_setting("DIM"))
+        parser.add_argument("--batch-rows", type=int, default=get_setting("BATCH_ROWS"))
+        parser.add_argument(
+            "--random-vectors", action="store_true",
+            help="Fill the index with random unit vectors instead of encoding synthetic text (much faster to build)",
+        )
+        parser.add_argument("--updates", type=int, default=200, help="Single-article upserts to time")
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        encoder = import_string(get_setting("ENCODER"))(options["dim"])
+        vocabulary = make_vocabulary(rng, 20_000)
+        # zipf-like, as in bench_search; cumulative so choices() doesn't redo the sums
+        cum_weights = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(len(vocabulary))))
+
+        def document():
+            return " ".join(rng.choices(vocabulary, cum_weights=cum_weights, k=options["words"]))
+
+        np_rng = np.random.default_rng(options["seed"])
+
+        def batches(size, batch_size=10_000):
+            for start in range(0, size, batch_size):
+                pks = np.arange(start + 1, min(start + batch_size, size) + 1, dtype=np.int64)
+                if options["random_vectors"]:
+                    vectors = np_rng.standard_normal((len(pks), options["dim"]), dtype=np.float32)
+                    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+                else:
+                    vectors = encoder.encode([document() for _ in pks])
+                yield pks, vectors
+
+        root = Path(tempfile.mkdtemp(prefix="bench-related-"))
+        try:
+            for size in options["sizes"]:
+                index = VectorIndex(root / f"index-{size}", encoder, batch_rows=options["batch_rows"])
+                start = time.perf_counter()
+                index.rebuild(batches(size))
+                megabytes = sum(f.stat().st_size for f in index.path.iterdir()) / 2**20
+                self.stdout.write(
+                    f"rows={size:<9} build={time.perf_counter() - start:7.2f}s files={megabytes:8.1f}MB"
+                )
+
+                index.open()
+                sample = [rng.randint(1, size) for _ in range(options["queries"])]
+                queries = [np.array(index.vectors[pk - 1]) for pk in sample]
+                self.check_exact(index, queries[0], sample[0], options["k"])
+
+                latencies = [
+                    self.timed(lambda q=q, pk=pk: index.query(q, options["k"], exclude=[pk]))
+                    for q, pk in zip(queries, sample)
+                ]
+                self.report("query", size, latencies)
+
+                updates = [
+                    self.timed(lambda pk=rng.randint(1, size): index.upsert([pk], encoder.encode([document()])))
+                    for _ in range(options["updates"])
+                ]
+                self.report("upsert", size, updates)
+                shutil.rmtree(index.path)
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+    def check_exact(self, index, vector, pk, k):
+        """
+        Batched top-k must match a full sort of every score.
+        """
+        count = index.meta["count"]
+        scores = np.asarray(index.vectors[:count]) @ vector
+        scores[pk - 1] = -np.inf
+        expected = np.sort(scores)[::-1][:k]
+        got = np.array([score for _, score in index.query(vector, k, exclude=[pk])])
+        if len(got) != len(expected) or not np.allclose(got, expected, atol=1e-5):
+            self.stderr.write(f"top-k mismatch for row {pk}: {got} vs {expected}")
+
+    def timed(self, fn):
+        start = time.perf_counter()
+        fn()
+        return time.perf_counter() - start
+
+    def report(self, name, size, latencies):
+        self.stdout.write(
+            f"  {name:<7} rows={size:<9} n={len(latencies):<5} p50={percentile(latencies, 50) * 1000:8.2f}ms "
+            f"p95={percentile(latencies, 95) * 1000:8.2f}ms p99={percentile(latencies, 99) * 1000:8.2f}ms"
+        )
@@ -0,0 +1,77 @@
+import random
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+
+from articles import response_cache
+from articles.models import Article
+
+from .bench_async_ai import percentile
+
+BENCH_USERNAME = "bench-response-cache"
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure anonymous article list/detail throughput with the response cache "
+        "disabled vs enabled, on synthetic articles that are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--articles", type=int, default=500)
+        parser.add_argument("--requests", type=int, default=2000, help="Requests per run")
+        parser.add_argument("--hot", type=int, default=50, help="Distinct detail pages requested")
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        user, created = User.objects.get_or_create(username=BENCH_USERNAME)
+        Article.objects.bulk_create([
+            Article(title=f"Bench article {i}", content="Lorem ipsum dolor sit amet. " * 200, tags="bench, cache", author=user)
+            for i in range(options["articles"])
+        ])
+        pks = list(Article.objects.filter(author=user).values_list("id", flat=True))
+        hot = rng.sample(pks, min(options["hot"], len(pks)))
+        # mostly detail reads of popular articles plus the first list pages
+        paths = [
+            "/api/articles/" if rng.random() < 0.2 else f"/api/articles/{rng.choice(hot)}/"
+            for _ in range(options["requests"])
+        ]
+
+        results = {}
+        try:
+            for name, enabled in (("uncached", False), ("cached", True)):
+                cache_settings = {**getattr(settings, "ARTICLE_RESPONSE_CACHE", {}), "ENABLED": enabled}
+                with override_settings(ARTICLE_RESPONSE_CACHE=cache_settings):
+                    response_cache.reset_stats()
+                    results[name] = (*self.run(paths), response_cache.stats())
+        finally:
+            Article.objects.filter(author=user).delete()
+            if created:
+                user.delete()
+
+        self.stdout.write(f"requests={len(paths)} articles={len(pks)} cache={settings.CACHES['default']['BACKEND']}")
+        self.stdout.write(f"{'mode':<10}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'hits':>8}{'misses':>8}")
+        for name, (wall, latencies, errors, counts) in results.items():
+            self.stdout.write(
+                f"{name:<10}{len(paths) / wall:>10.1f}{percentile(latencies, 50) * 1000:>10.2f}"
+                f"{percentile(latencies, 99) * 1000:>10.2f}{counts['hits']:>8}{counts['misses']:>8}"
+                + (f"  errors={errors}" if errors else "")
+            )
+        speedup = results["uncached"][0] / results["cached"][0]
+        self.stdout.write(self.style.SUCCESS(f"throughput gain: {speedup:.1f}x"))
+
+    def run(self, paths):
+        client = Client()
+        latencies = []
+        errors = 0
+        start = time.perf_counter()
+        for path in paths:
+            t0 = time.perf_counter()
+            resp = client.get(path)
+            latencies.append(time.perf_counter() - t0)
+            errors += resp.status_code != 200
+        return time.perf_counter() - start, latencies, errors
@@ -0,0 +1,89 @@
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from articles.models import Article
+from articles.search import rebuild_index, search
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def make_vocabulary(rng, size):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(4, 9))) for _ in range(size)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark full-text search against a naive icontains scan on a synthetic corpus. "
+        "Runs inside a transaction that is rolled back, so nothing is persisted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--articles", type=int, default=100_000)
+        parser.add_argument("--queries", type=int, default=200)
+        parser.add_argument("--words", type=int, default=300, help="Words per synthetic article")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--skip-naive", action="store_true", help="Skip the icontains baseline")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        vocabulary = make_vocabulary(rng, 20_000)
+        # zipf-like weights so a few words are common and most are rare
+        weights = [1.0 / (rank + 1) for rank in range(len(vocabulary))]
+
+        with transaction.atomic():
+            user = User.objects.create(username="bench-search")
+            start = time.perf_counter()
+            batch = []
+            for i in range(options["articles"]):
+                words = rng.choices(vocabulary, weights=weights, k=options["words"])
+                batch.append(Article(
+                    title=" ".join(words[:6]).title(),
+                    content=" ".join(words),
+                    tags=", ".join(words[6:9]),
+                    author=user,
+                ))
+                if len(batch) == 2000:
+                    Article.objects.bulk_create(batch)
+                    batch = []
+            Article.objects.bulk_create(batch)
+            self.stdout.write(f"corpus: {options['articles']} articles in {time.perf_counter() - start:.1f}s")
+
+            start = time.perf_counter()
+            rebuild_index()
+            self.stdout.write(f"index build: {time.perf_counter() - start:.2f}s")
+
+            queries = [
+                " ".join(rng.choices(vocabulary[:2000], k=rng.randint(1, 2)))
+                for _ in range(options["queries"])
+            ]
+            self.report("fts", [self.timed(lambda q=q: search(q, limit=20)) for q in queries])
+            if not options["skip_naive"]:
+                naive = [
+                    self.timed(lambda q=q: list(
+                        Article.objects.filter(content__icontains=q.split()[0]).values_list("id", flat=True)[:20]
+                    ))
+                    for q in queries[:20]
+                ]
+                self.report("icontains", naive)
+
+            transaction.set_rollback(True)
+
+    def timed(self, fn):
+        start = time.perf_counter()
+        fn()
+        return time.perf_counter() - start
+
+    def report(self, name, latencies):
+        self.stdout.write(
+            f"{name:<10} n={len(latencies):<5} p50={percentile(latencies, 50) * 1000:8.2f}ms "
+            f"p95={percentile(latencies, 95) * 1000:8.2f}ms p99={percentile(latencies, 99) * 1000:8.2f}ms"
+        )
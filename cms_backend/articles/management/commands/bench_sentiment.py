@@ -0,0 +1,115 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from sklearn.model_selection import train_test_split
+
+from articles import local_sentiment
+from articles.ai import estimate_usage
+from articles.models import Article
+
+from .bench_search import make_vocabulary, percentile
+
+THRESHOLDS = (0.5, 0.6, 0.7, 0.8, 0.9, 0.95)
+# domain words that lean one way without being in the lexicon
+POSITIVE_DOMAIN = "launch upgrade award growth milestone shipped faster savings praise adoption".split()
+NEGATIVE_DOMAIN = "outage refund delay recall lawsuit downtime layoffs breach rollback complaint".split()
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the local sentiment tier against Gemini labels: accuracy, the share answered locally "
+        "and the Gemini spend avoided at several confidence thresholds, and single / batch latency, for "
+        "the lexicon and for a model trained on a split of the labels. Labels come from Article.sentiment, "
+        "or from a synthetic corpus with --synthetic."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--synthetic", type=int, default=0, help="Generate this many labeled texts instead")
+        parser.add_argument("--test-size", type=float, default=0.3)
+        parser.add_argument("--queries", type=int, default=200, help="Single-text classifications to time")
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        if options["synthetic"]:
+            texts, labels = self.synthetic(rng, options["synthetic"])
+        else:
+            texts, labels = local_sentiment.training_set(Article.objects.all())
+        if len(set(labels)) < 2 or len(labels) < 10:
+            raise CommandError(f"Need labels of at least two classes, found {len(labels)} labels; try --synthetic")
+
+        train_texts, test_texts, train_labels, test_labels = train_test_split(
+            texts, labels, test_size=options["test_size"], random_state=options["seed"],
+        )
+        start = time.perf_counter()
+        model = local_sentiment.build_model().fit(train_texts, train_labels)
+        self.stdout.write(
+            f"labels={len(labels)} train={len(train_labels)} test={len(test_labels)} "
+            f"model_fit={time.perf_counter() - start:.2f}s"
+        )
+        classifiers = {
+            "lexicon": local_sentiment.lexicon_classify,
+            "model": lambda batch: local_sentiment.model_classify(model, batch),
+        }
+        # what each test text would cost through Gemini (one-word label + justification)
+        costs = [estimate_usage(text[:12_000], "Positive. " + "x" * 80)[1] for text in test_texts]
+
+        for name, classify in classifiers.items():
+            start = time.perf_counter()
+            predictions = classify(test_texts)
+            batch = time.perf_counter() - start
+            sample = [rng.choice(test_texts) for _ in range(options["queries"])]
+            latencies = []
+            for text in sample:
+                start = time.perf_counter()
+                classify([text])
+                latencies.append(time.perf_counter() - start)
+            correct = [label == expected for (label, _), expected in zip(predictions, test_labels)]
+            self.stdout.write(
+                f"{name:<8} accuracy={sum(correct) / len(correct):6.1%} batch={len(test_texts) / batch:9.0f} texts/s "
+                f"single p50={percentile(latencies, 50) * 1000:6.2f}ms p95={percentile(latencies, 95) * 1000:6.2f}ms "
+                f"p99={percentile(latencies, 99) * 1000:6.2f}ms"
+            )
+            for threshold in THRESHOLDS:
+                local = [i for i, (_, confidence) in enumerate(predictions) if confidence >= threshold]
+                local_correct = sum(correct[i] for i in local)
+                # escalated texts take Gemini's label, which is the reference here
+                overall = (local_correct + len(correct) - len(local)) / len(correct)
+                saved = sum(costs[i] for i in local)
+                self.stdout.write(
+                    f"  threshold={threshold:<5} local={len(local) / len(correct):6.1%} "
+                    f"local_accuracy={local_correct / (len(local) or 1):6.1%} overall={overall:6.1%} "
+                    f"saved=${saved:.4f} of ${sum(costs):.4f}"
+                )
+
+    def synthetic(self, rng, size):
+        """
+        Texts of filler words with a label-dependent mix of lexicon and domain
+        words, some negated, plus label noise, so neither classifier is perfect.
+        """
+        filler = make_vocabulary(rng, 5_000)
+        pools = {
+            local_sentiment.POSITIVE: local_sentiment.POSITIVE_WORDS + POSITIVE_DOMAIN,
+            local_sentiment.NEGATIVE: local_sentiment.NEGATIVE_WORDS + NEGATIVE_DOMAIN,
+        }
+        texts, labels = [], []
+        for _ in range(size):
+            label = rng.choice(local_sentiment.LABELS)
+            words = rng.choices(filler, k=rng.randint(40, 300))
+            signal = max(1, int(len(words) * rng.uniform(0.01, 0.06)))
+            for _ in range(signal):
+                if label == local_sentiment.NEUTRAL:
+                    pool = pools[rng.choice([local_sentiment.POSITIVE, local_sentiment.NEGATIVE])]
+                else:
+                    pool = pools[label] if rng.random() < 0.8 else pools[rng.choice(list(pools))]
+                word = rng.choice(pool)
+                if rng.random() < 0.1:
+                    opposite = pools[local_sentiment.NEGATIVE if pool is pools[local_sentiment.POSITIVE] else local_sentiment.POSITIVE]
+                    word = "not " + rng.choice(opposite)
+                words.insert(rng.randrange(len(words) + 1), word)
+            if rng.random() < 0.05:
+                label = rng.choice(local_sentiment.LABELS)
+            texts.append(" ".join(words))
+            labels.append(label)
+        return texts, labels
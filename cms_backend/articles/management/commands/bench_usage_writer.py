@@ -0,0 +1,92 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from articles import ai
+from articles.ai_cache import get_ai_cache
+from articles.fake_gemini import FakeGeminiClient
+from articles.models import AIUsage, AIUsageDaily, Article
+from articles.usage_buffer import get_usage_buffer
+
+from .bench_async_ai import percentile
+
+BENCH_USERNAME = "bench-usage-writer"
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the summarize endpoint with direct AIUsage inserts vs the "
+        "buffered usage writer and report request latency percentiles."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=400, help="Requests per run")
+        parser.add_argument("--concurrency", type=int, default=16, help="Concurrent client threads")
+        parser.add_argument("--latency", type=float, default=0.01, help="Fake Gemini latency in seconds")
+
+    def handle(self, *args, **options):
+        total = options["requests"]
+        concurrency = options["concurrency"]
+
+        user, created = User.objects.get_or_create(username=BENCH_USERNAME)
+        auth = f"Bearer {AccessToken.for_user(user)}"
+        article = Article.objects.create(title="Usage bench", content="Benchmark article body. " * 50, author=user)
+        real_client = ai.client
+        ai.client = FakeGeminiClient(latency=options["latency"])
+
+        # every request must reach the view's usage path, so bypass the result cache,
+        # single-flight coalescing and the per-user quota
+        no_cache = override_settings(
+            AI_CACHE={**getattr(settings, "AI_CACHE", {}), "ENABLED": False},
+            AI_SINGLE_FLIGHT={**getattr(settings, "AI_SINGLE_FLIGHT", {}), "ENABLED": False},
+            AI_QUOTA={**getattr(settings, "AI_QUOTA", {}), "ENABLED": False},
+        )
+        no_cache.enable()
+        get_ai_cache.cache_clear()
+        results = {}
+        try:
+            for name, enabled in (("direct", False), ("buffered", True)):
+                buffer_settings = override_settings(
+                    AI_USAGE_BUFFER={**getattr(settings, "AI_USAGE_BUFFER", {}), "ENABLED": enabled}
+                )
+                with buffer_settings:
+                    results[name] = self.run(total, concurrency, auth, article.pk)
+                    if enabled:
+                        get_usage_buffer().flush()
+            recorded = AIUsage.objects.filter(user=user).count()
+        finally:
+            no_cache.disable()
+            get_ai_cache.cache_clear()
+            ai.client = real_client
+            AIUsage.objects.filter(user=user).delete()
+            AIUsageDaily.objects.filter(user=user).delete()
+            article.delete()
+            if created:
+                user.delete()
+
+        self.stdout.write(f"requests={total} concurrency={concurrency} db={settings.DATABASES['default']['ENGINE']}")
+        self.stdout.write(f"{'writer':<10}{'wall s':>10}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+        for name, (wall, latencies, errors) in results.items():
+            self.stdout.write(
+                f"{name:<10}{wall:>10.3f}{total / wall:>10.1f}"
+                f"{percentile(latencies, 50) * 1000:>10.1f}{percentile(latencies, 99) * 1000:>10.1f}{errors:>8}"
+            )
+        self.stdout.write(f"usage rows recorded: {recorded} (expected {2 * total - sum(r[2] for r in results.values())})")
+
+    def run(self, total, concurrency, auth, pk):
+        def one(i):
+            client = Client()
+            start = time.perf_counter()
+            resp = client.post(f"/api/articles/{pk}/summarize/", HTTP_AUTHORIZATION=auth)
+            return time.perf_counter() - start, resp.status_code
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(one, range(total)))
+        wall = time.perf_counter() - start
+        return wall, [r[0] for r in results], sum(1 for r in results if r[1] != 200)
@@ -0,0 +1,60 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from articles import ai
+from articles.bulk import BULK_FEATURES, iter_bulk_analysis, ndjson_lines, resolve_articles
+
+
+class Command(BaseCommand):
+    help = (
+        "Summarize and/or classify sentiment for many articles with bounded parallel "
+        "fan-out, printing one NDJSON line per result. Usage is billed to --user."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", required=True, help="Username AIUsage rows are recorded for")
+        parser.add_argument("--ids", type=int, nargs="*", help="Article ids (default: use filters)")
+        parser.add_argument("--author", help="Only articles by this username")
+        parser.add_argument("--missing-summary", action="store_true", help="Only articles without a summary")
+        parser.add_argument("--missing-sentiment", action="store_true", help="Only articles without a sentiment")
+        parser.add_argument("--features", nargs="+", choices=BULK_FEATURES, default=list(BULK_FEATURES))
+        parser.add_argument("--concurrency", type=int, default=None, help="Default: AI_BULK['CONCURRENCY']")
+        parser.add_argument("--rate", type=int, default=None, help="Calls per minute (default: AI_BULK['RATE_PER_MINUTE'])")
+        parser.add_argument("--limit", type=int, default=None, help="Process at most this many articles")
+        parser.add_argument("--save", action="store_true", help="Write results back to the articles")
+        parser.add_argument("--refresh", action="store_true", help="Ignore cached AI results")
+
+    def handle(self, *args, **options):
+        if not ai.client:
+            raise CommandError("Gemini client not initialized (set GEMINI_API_KEY)")
+        try:
+            user = User.objects.get(username=options["user"])
+        except User.DoesNotExist:
+            raise CommandError(f"Unknown user {options['user']!r}")
+
+        articles = resolve_articles(
+            ids=options["ids"],
+            filters={
+                "author": options["author"],
+                "missing_summary": options["missing_summary"],
+                "missing_sentiment": options["missing_sentiment"],
+            },
+        )
+        if options["limit"]:
+            articles = articles.filter(pk__in=list(articles.values_list("pk", flat=True)[:options["limit"]]))
+
+        start = time.perf_counter()
+        results = iter_bulk_analysis(
+            user, articles, options["features"],
+            concurrency=options["concurrency"],
+            rate_per_minute=options["rate"],
+            save=options["save"],
+            refresh=options["refresh"],
+            # operator runs are paced by --rate, not the per-user API quota
+            enforce_quota=False,
+        )
+        for line in ndjson_lines(results):
+            self.stdout.write(line, ending="")
+        self.stderr.write(f"finished in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,64 @@
+import io
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from articles.transfer import FORMATS, KINDS, Importer
+
+
+class Command(BaseCommand):
+    help = (
+        "Import articles or AI usage from NDJSON or CSV as a stream, upserting by natural key "
+        "in batched transactions; reports throughput as it goes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("kind", choices=KINDS)
+        parser.add_argument("path", help="File to read, or - for stdin")
+        parser.add_argument("--format", dest="fmt", choices=FORMATS, help="Default: from the file extension, else ndjson")
+        parser.add_argument("--batch-size", type=int, help="Records per transaction (default DATA_TRANSFER)")
+        parser.add_argument("--create-users", action="store_true", help="Create unknown authors / users (no usable password)")
+        parser.add_argument(
+            "--skip-indexes", action="store_true",
+            help="Don't update the search, duplicate, keyword and related indexes per batch (rebuild them afterwards)",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Parse and write every batch, then roll it back")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["fmt"] or ("csv" if path.endswith(".csv") else "ndjson")
+        try:
+            stream = (
+                io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8", newline="")
+                if path == "-" else open(path, encoding="utf-8", newline="")
+            )
+        except OSError as e:
+            raise CommandError(f"Could not open {path}: {e}")
+
+        importer = Importer(
+            options["kind"], batch_size=options["batch_size"], create_users=options["create_users"],
+            reindex=not options["skip_indexes"], dry_run=options["dry_run"],
+        )
+        with stream:
+            stats = importer.run(stream, fmt, progress=self.report)
+
+        for error in importer.errors:
+            self.stderr.write(self.style.WARNING(error))
+        if stats["failed"] > len(importer.errors):
+            self.stderr.write(self.style.WARNING(f"... {stats['failed'] - len(importer.errors)} more failed rows"))
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Dry run: ' if options['dry_run'] else ''}{stats['rows']} rows in {stats['seconds']:.2f}s "
+            f"({stats['rows_per_second'] or 0:.0f} rows/s): {stats['created']} created, "
+            f"{stats['updated']} updated, {stats['failed']} failed"
+        ))
+        if options["skip_indexes"] and options["kind"] == "articles" and not options["dry_run"]:
+            self.stdout.write(
+                "Indexes were skipped: run rebuild_search_index, rebuild_duplicate_index "
+                "and rebuild_related_index."
+            )
+
+    def report(self, stats):
+        self.stdout.write(
+            f"  {stats['rows']} rows, {stats['created']} created, {stats['updated']} updated, "
+            f"{stats['failed']} failed ({stats['rows_per_second'] or 0:.0f} rows/s)"
+        )
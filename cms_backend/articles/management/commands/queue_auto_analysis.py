@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from articles.analysis import queue_analysis
+from articles.models import Article
+
+
+class Command(BaseCommand):
+    help = (
+        "Queue auto-analysis jobs for articles whose stored summary/sentiment do not "
+        "match their current content (e.g. articles saved before auto-analysis was enabled)."
+    )
+
+    def handle(self, *args, **options):
+        stale = Article.objects.exclude(analyzed_hash=F("content_hash")).select_related("author").order_by("id")
+        queued = sum(1 for article in stale.iterator() if queue_analysis(article, force=True))
+        self.stdout.write(self.style.SUCCESS(f"Queued {queued} analysis jobs"))
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from articles.dedup import rebuild_index
+from articles.models import Article
+
+
+class Command(BaseCommand):
+    help = "Recompute MinHash signatures and LSH band keys of every article (ARTICLE_DEDUP)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = rebuild_index(Article.objects.all(), batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Fingerprinted {count} articles in {time.perf_counter() - start:.2f}s"
+        ))
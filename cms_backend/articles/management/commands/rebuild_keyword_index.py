@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from articles.keywords import rebuild_index
+from articles.models import Article, KeywordTerm
+
+
+class Command(BaseCommand):
+    help = "Recount the document frequencies of the tag suggestion vocabulary over every article (TAG_SUGGESTIONS)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = rebuild_index(Article.objects.all(), batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {count} articles ({KeywordTerm.objects.count()} terms) in {time.perf_counter() - start:.2f}s"
+        ))
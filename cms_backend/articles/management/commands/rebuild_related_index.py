@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from articles.models import Article
+from articles.related import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Re-encode every article into the related-articles vector index (RELATED_ARTICLES)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = rebuild_index(Article.objects.all(), batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {count} articles in {time.perf_counter() - start:.2f}s"
+        ))
@@ -0,0 +1,16 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from articles.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the article full-text search index (SQLite FTS5 table / Postgres GIN index)."
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {count} articles in {time.perf_counter() - start:.2f}s"
+        ))
@@ -0,0 +1,21 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from articles.usage import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild the AIUsageDaily rollups from the raw AIUsage table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Only rebuild rollups for this username")
+
+    def handle(self, *args, **options):
+        user = None
+        if options["user"]:
+            try:
+                user = User.objects.get(username=options["user"])
+            except User.DoesNotExist:
+                raise CommandError(f"Unknown user {options['user']!r}")
+        count = rebuild_rollups(user=user)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {count} daily rollup rows"))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from articles.tagging import recount_tags
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized Tag.article_count counters from ArticleTag rows."
+
+    def handle(self, *args, **options):
+        updated = recount_tags()
+        self.stdout.write(self.style.SUCCESS(f"Recounted {updated} tags"))
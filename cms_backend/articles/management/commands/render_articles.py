@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from articles import rendering
+from articles.models import Article
+
+
+class Command(BaseCommand):
+    help = (
+        "Render article markdown to the stored sanitized HTML, table of contents and reading time "
+        "(ARTICLE_RENDERING), in batches. Rows whose content and rendering settings are unchanged "
+        "since their last render are skipped unless --force is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--force", action="store_true", help="Re-render every article")
+        parser.add_argument("--ids", type=int, nargs="*", help="Only these article ids")
+
+    def handle(self, *args, **options):
+        if not rendering.get_setting("ENABLED"):
+            raise CommandError("Article rendering is disabled (ARTICLE_RENDERING['ENABLED'])")
+        queryset = Article.objects.all()
+        if options["ids"]:
+            queryset = queryset.filter(id__in=options["ids"])
+        start = time.perf_counter()
+        checked, rendered = rendering.rerender(queryset, batch_size=options["batch_size"], force=options["force"])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Rendered {rendered} of {checked} articles ({checked - rendered} unchanged) in {elapsed:.2f}s "
+            f"({checked / elapsed if elapsed else 0:.0f} articles/s)"
+        ))
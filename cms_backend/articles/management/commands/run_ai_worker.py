@@ -0,0 +1,68 @@
+import os
+import signal
+import socket
+import threading
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from articles.jobs import claim_next_job, execute_job, get_setting
+
+
+class Command(BaseCommand):
+    help = "Run a local worker pool that executes queued AI jobs (generate / summarize / sentiment)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency", type=int, default=None,
+            help="Maximum jobs running at once (default: AI_JOBS['CONCURRENCY'])",
+        )
+        parser.add_argument("--burst", action="store_true", help="Exit once the queue is drained")
+
+    def handle(self, *args, **options):
+        concurrency = options["concurrency"] or get_setting("CONCURRENCY")
+        poll_interval = get_setting("POLL_INTERVAL")
+        worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        stopping = threading.Event()
+
+        def stop(signum, frame):
+            self.stdout.write("Stopping after in-flight jobs finish...")
+            stopping.set()
+
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGTERM, stop)
+
+        def run(job):
+            try:
+                execute_job(job)
+                self.stdout.write(f"job {job.pk} {job.feature}: {job.status}")
+            finally:
+                close_old_connections()
+
+        self.stdout.write(f"AI worker {worker_id} started (concurrency={concurrency})")
+        in_flight = set()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            while not stopping.is_set():
+                in_flight = {f for f in in_flight if not f.done()}
+                if len(in_flight) >= concurrency:
+                    wait(in_flight, timeout=poll_interval, return_when=FIRST_COMPLETED)
+                    continue
+
+                try:
+                    job = claim_next_job(worker_id)
+                except Exception as e:
+                    # e.g. "database is locked" on SQLite; try again next poll
+                    print("❌ AI job claim error:", e)
+                    print(traceback.format_exc())
+                    close_old_connections()
+                    stopping.wait(poll_interval)
+                    continue
+                if job is None:
+                    if options["burst"] and not in_flight:
+                        break
+                    stopping.wait(poll_interval)
+                    continue
+                in_flight.add(pool.submit(run, job))
+        self.stdout.write("AI worker stopped")
@@ -0,0 +1,70 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from articles import keywords
+from articles.models import Article
+
+
+class Command(BaseCommand):
+    help = (
+        "Suggest tags for many articles at once with the local keyword extractor, "
+        "scoring each batch as one TF-IDF matrix. With --apply the suggestions are saved "
+        "as the articles' tags."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ids", type=int, nargs="+", help="Only these article ids")
+        parser.add_argument("--untagged", action="store_true", help="Only articles without tags")
+        parser.add_argument("--limit", type=int, default=keywords.get_setting("MAX_TAGS"), help="Tags per article")
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--apply", action="store_true", help="Save the suggestions as Article.tags")
+        parser.add_argument("--quiet", action="store_true", help="Only print the summary")
+
+    def handle(self, *args, **options):
+        queryset = Article.objects.only("id", "title", "content", "tags").order_by("id")
+        if options["ids"]:
+            queryset = queryset.filter(pk__in=options["ids"])
+        if options["untagged"]:
+            queryset = queryset.filter(Q(tags__isnull=True) | Q(tags=""))
+
+        start = time.perf_counter()
+        # loaded once for every batch instead of per article
+        frequencies = keywords.document_frequencies()
+        corpus = keywords.corpus_size()
+        tags = keywords.all_tags()
+        scoring, total, applied = 0.0, 0, 0
+        batch = []
+        for article in queryset.iterator(chunk_size=options["batch_size"]):
+            batch.append(article)
+            if len(batch) == options["batch_size"]:
+                elapsed, saved = self.run_batch(batch, frequencies, corpus, tags, options)
+                scoring, total, applied = scoring + elapsed, total + len(batch), applied + saved
+                batch = []
+        if batch:
+            elapsed, saved = self.run_batch(batch, frequencies, corpus, tags, options)
+            scoring, total, applied = scoring + elapsed, total + len(batch), applied + saved
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Suggested tags for {total} articles in {elapsed:.2f}s ({total / (elapsed or 1e-9):.0f} articles/s, "
+            f"scoring {scoring:.2f}s){f', applied to {applied}' if options['apply'] else ''}"
+        ))
+
+    def run_batch(self, batch, frequencies, corpus, tags, options):
+        start = time.perf_counter()
+        suggestions = keywords.suggest_batch(
+            [(article.title, article.content) for article in batch],
+            limit=options["limit"], frequencies=frequencies, corpus=corpus, tags=tags,
+        )
+        elapsed, saved = time.perf_counter() - start, 0
+        for article, suggested in zip(batch, suggestions):
+            names = [name for name, _ in suggested]
+            if not options["quiet"]:
+                self.stdout.write(f"{article.pk}\t{article.title[:60]}\t{', '.join(names)}")
+            if options["apply"] and names:
+                article.tags = ", ".join(names)
+                article.save(update_fields=["tags"])
+                saved += 1
+        return elapsed, saved
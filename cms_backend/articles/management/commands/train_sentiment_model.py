@@ -0,0 +1,55 @@
+import time
+from collections import Counter
+
+from django.core.management.base import BaseCommand, CommandError
+from sklearn.model_selection import train_test_split
+
+from articles import local_sentiment
+from articles.models import Article
+
+
+class Command(BaseCommand):
+    help = (
+        "Train the local sentiment classifier (LOCAL_SENTIMENT) from the Gemini labels stored in "
+        "Article.sentiment, report its held-out accuracy, then save a model fitted on every label."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--min-labels", type=int, default=local_sentiment.get_setting("MIN_TRAINING_LABELS"))
+        parser.add_argument("--test-size", type=float, default=0.2, help="Share of labels held out for the report")
+        parser.add_argument("--output", help="Where to save the model (default: LOCAL_SENTIMENT MODEL_PATH)")
+        parser.add_argument("--dry-run", action="store_true", help="Evaluate without saving")
+
+    def handle(self, *args, **options):
+        texts, labels = local_sentiment.training_set(Article.objects.all())
+        counts = Counter(labels)
+        self.stdout.write(f"{len(labels)} labeled articles: " + ", ".join(f"{k}={v}" for k, v in sorted(counts.items())))
+        if len(labels) < options["min_labels"]:
+            raise CommandError(f"Need at least {options['min_labels']} labeled articles, found {len(labels)}")
+        if len(counts) < 2:
+            raise CommandError("Need labels of at least two classes")
+
+        threshold = local_sentiment.get_setting("THRESHOLD")
+        stratify = labels if min(counts.values()) >= 2 else None
+        train_texts, test_texts, train_labels, test_labels = train_test_split(
+            texts, labels, test_size=options["test_size"], random_state=0, stratify=stratify,
+        )
+        model = local_sentiment.build_model().fit(train_texts, train_labels)
+        predictions = local_sentiment.model_classify(model, test_texts)
+        correct = [label == expected for (label, _), expected in zip(predictions, test_labels)]
+        confident = [ok for ok, (_, confidence) in zip(correct, predictions) if confidence >= threshold]
+        self.stdout.write(
+            f"held out {len(test_labels)}: accuracy={sum(correct) / len(correct):.1%}, "
+            f"answered locally at {threshold}={len(confident) / len(correct):.1%} "
+            f"with accuracy={sum(confident) / (len(confident) or 1):.1%}"
+        )
+        if options["dry_run"]:
+            return
+
+        start = time.perf_counter()
+        model = local_sentiment.build_model().fit(texts, labels)
+        path = options["output"] or local_sentiment.get_setting("MODEL_PATH")
+        local_sentiment.save_model(model, path)
+        self.stdout.write(self.style.SUCCESS(
+            f"Trained on {len(labels)} labels in {time.perf_counter() - start:.2f}s, saved to {path}"
+        ))
@@ -0,0 +1,249 @@
+# articles/metrics.py
+"""
+Prometheus metrics for the API and its Gemini calls, served at /metrics.
+
+- MetricsMiddleware times every request per view (histogram + in-flight
+  gauge + status counter) and counts the DB queries it runs, including
+  queries from sync_to_async threads, which inherit the request context.
+- ``time_gemini`` wraps each upstream Gemini attempt (latency by feature,
+  model and outcome).
+- ``observe_usage`` mirrors every AIUsage row (calls, tokens, estimated
+  cost by feature and source: upstream / cached / coalesced / local).
+- ``record_cache_lookup`` counts hits and misses of the AI result cache and
+  the anonymous article response cache; hit ratios are
+  rate(hits) / rate(lookups) in PromQL.
+
+Multiprocess gunicorn (the Procfile's web process): gunicorn.conf.py points
+PROMETHEUS_MULTIPROC_DIR at an empty directory before the workers start.
+prometheus_client then keeps values in per-process files and /metrics
+aggregates all of them. A single process (runserver, plain daphne or
+uvicorn) needs no directory.
+"""
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+
+DEFAULTS = {
+    "ENABLED": True,
+    # when set, /metrics requires "Authorization: Bearer <AUTH_TOKEN>"
+    "AUTH_TOKEN": None,
+}
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+def get_setting(name):
+    return getattr(settings, "METRICS", {}).get(name, DEFAULTS[name])
+
+
+HTTP_REQUESTS = Counter(
+    "cms_http_requests_total", "HTTP requests by view, method and status.", ["view", "method", "status"]
+)
+HTTP_LATENCY = Histogram(
+    "cms_http_request_duration_seconds", "HTTP request latency by view.", ["view", "method"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_IN_FLIGHT = Gauge(
+    "cms_http_requests_in_flight", "HTTP requests being served, by view.", ["view"],
+    multiprocess_mode="livesum",
+)
+DB_QUERIES = Histogram(
+    "cms_db_queries_per_request", "DB queries run while serving one request.", ["view"],
+    buckets=QUERY_COUNT_BUCKETS,
+)
+DB_DURATION = Histogram(
+    "cms_db_query_duration_seconds", "Total DB time spent serving one request.", ["view"],
+    buckets=LATENCY_BUCKETS,
+)
+GEMINI_LATENCY = Histogram(
+    "cms_gemini_call_duration_seconds", "Latency of one upstream Gemini attempt.", ["feature", "model", "outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+AI_CALLS = Counter(
+    "cms_ai_calls_total", "AI calls recorded in AIUsage.", ["feature", "source"]
+)
+AI_TOKENS = Counter(
+    "cms_ai_tokens_total", "Tokens recorded in AIUsage.", ["feature"]
+)
+AI_COST = Counter(
+    "cms_ai_estimated_cost_dollars_total", "Estimated cost recorded in AIUsage.", ["feature"]
+)
+CACHE_LOOKUPS = Counter(
+    "cms_cache_lookups_total", "Cache lookups by cache and result (hit / miss).", ["cache", "result"]
+)
+
+
+# ----------------- DB QUERIES PER REQUEST -----------------
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.lock = threading.Lock()
+
+    def add(self, elapsed):
+        with self.lock:
+            self.count += 1
+            self.duration += elapsed
+
+
+_query_stats = contextvars.ContextVar("cms_query_stats", default=None)
+
+
+def time_query(execute, sql, params, many, context):
+    stats = _query_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add(time.perf_counter() - start)
+
+
+@receiver(connection_created)
+def install_query_timer(sender, connection, **kwargs):
+    # every thread opens its own connection, so hook each one as it is made
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+# ----------------- HTTP -----------------
+def view_label(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return "<unresolved>"
+    return match.view_name or match.route
+
+
+class MetricsMiddleware:
+    """
+    Works for both sync and async requests, so async views are not forced
+    through a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        view, start, stats, token = self.begin(request)
+        response = None
+        try:
+            response = self.get_response(request)
+            return response
+        finally:
+            self.end(request, view, start, stats, token, response)
+
+    async def __acall__(self, request):
+        view, start, stats, token = self.begin(request)
+        response = None
+        try:
+            response = await self.get_response(request)
+            return response
+        finally:
+            self.end(request, view, start, stats, token, response)
+
+    def begin(self, request):
+        view = view_label(request)
+        stats = QueryStats()
+        token = _query_stats.set(stats)
+        HTTP_IN_FLIGHT.labels(view).inc()
+        return view, time.perf_counter(), stats, token
+
+    def end(self, request, view, start, stats, token, response):
+        _query_stats.reset(token)
+        if response is not None and response.streaming:
+            # the body is still to be generated; the server closes the
+            # response once the last chunk has been sent
+            response._resource_closers.append(lambda: self.observe(request, view, start, stats, response))
+        else:
+            self.observe(request, view, start, stats, response)
+
+    def observe(self, request, view, start, stats, response):
+        elapsed = time.perf_counter() - start
+        HTTP_IN_FLIGHT.labels(view).dec()
+        status = response.status_code if response is not None else 500
+        HTTP_REQUESTS.labels(view, request.method, str(status)).inc()
+        HTTP_LATENCY.labels(view, request.method).observe(elapsed)
+        DB_QUERIES.labels(view).observe(stats.count)
+        DB_DURATION.labels(view).observe(stats.duration)
+
+
+# ----------------- AI -----------------
+@contextmanager
+def time_gemini(feature, model):
+    """
+    Observe the latency of one Gemini attempt; works around sync and async calls.
+    """
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except TimeoutError:
+        outcome = "timeout"
+        raise
+    except Exception:
+        outcome = "error"
+        raise
+    except BaseException:
+        # asyncio.wait_for cancelling a slow attempt, or the client going away
+        outcome = "cancelled"
+        raise
+    finally:
+        GEMINI_LATENCY.labels(feature, model, outcome).observe(time.perf_counter() - start)
+
+
+def observe_usage(feature, tokens, estimated_cost, cached=False, coalesced=False, local=False):
+    source = "local" if local else "cached" if cached else "coalesced" if coalesced else "upstream"
+    AI_CALLS.labels(feature, source).inc()
+    AI_TOKENS.labels(feature).inc(tokens or 0)
+    AI_COST.labels(feature).inc(float(estimated_cost or 0))
+
+
+def record_cache_lookup(cache, hit):
+    CACHE_LOOKUPS.labels(cache, "hit" if hit else "miss").inc()
+
+
+# ----------------- ENDPOINT -----------------
+def metrics_view(request):
+    if not get_setting("ENABLED"):
+        return HttpResponse(status=404)
+    token = get_setting("AUTH_TOKEN")
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return HttpResponse(status=401)
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        # a fresh registry per scrape, aggregating every worker's files
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-18 03:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("articles", "0005_alter_aiusage_article_alter_aiusage_estimated_cost"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AIResultCache",
+            fields=[
+                (
+                    "key",
+                    models.CharField(max_length=64, primary_key=True, serialize=False),
+                ),
+                ("feature", models.CharField(blank=True, max_length=50)),
+                ("model", models.CharField(blank=True, max_length=100)),
+                ("payload", models.TextField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "expires_at",
+                    models.DateTimeField(blank=True, db_index=True, null=True),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="aiusage",
+            name="cached",
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    from articles import search
+
+    search.create_index(schema_editor)
+    if schema_editor.connection.vendor == "sqlite":
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {search.FTS_TABLE}(rowid, title, content, tags) "
+                "SELECT id, coalesce(title, ''), coalesce(content, ''), coalesce(tags, '') FROM articles_article"
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    from articles import search
+
+    search.drop_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("articles", "0008_article_created_id_idx"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 5.2.6 on 2026-10-18 03:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("articles", "0009_article_search_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Tag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=64)),
+                ("slug", models.SlugField(max_length=64, unique=True)),
+                (
+                    "article_count",
+                    models.PositiveIntegerField(db_index=True, default=0),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ArticleTag",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "article",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="article_tags",
+                        to="articles.article",
+                    ),
+                ),
+                (
+                    "tag",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="article_tags",
+                        to="articles.tag",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="article",
+            name="tag_set",
+            field=models.ManyToManyField(
+                blank=True,
+                related_name="articles",
+                through="articles.ArticleTag",
+                to="articles.tag",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="articletag",
+            index=models.Index(
+                fields=["tag", "article"], name="articletag_tag_article_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="articletag",
+            constraint=models.UniqueConstraint(
+                fields=("article", "tag"), name="unique_article_tag"
+            ),
+        ),
+    ]
@@ -0,0 +1,56 @@
+from django.db import migrations
+from django.utils.text import slugify
+
+
+def parse_tag_string(value):
+    # frozen copy of articles.tagging.parse_tag_string
+    tags = {}
+    for raw in (value or "").split(","):
+        name = raw.strip().lstrip("#").strip()[:64]
+        slug = slugify(name)[:64]
+        if slug and slug not in tags:
+            tags[slug] = name
+    return tags
+
+
+def populate_tags(apps, schema_editor):
+    Article = apps.get_model("articles", "Article")
+    Tag = apps.get_model("articles", "Tag")
+    ArticleTag = apps.get_model("articles", "ArticleTag")
+
+    parsed = {}
+    names = {}
+    for pk, tags in Article.objects.exclude(tags__isnull=True).exclude(tags="").values_list("id", "tags").iterator():
+        parsed[pk] = parse_tag_string(tags)
+        for slug, name in parsed[pk].items():
+            names.setdefault(slug, name)
+
+    counts = {}
+    for slugs in parsed.values():
+        for slug in slugs:
+            counts[slug] = counts.get(slug, 0) + 1
+    Tag.objects.bulk_create(
+        [Tag(slug=slug, name=name, article_count=counts[slug]) for slug, name in names.items()],
+        batch_size=500,
+    )
+    tag_ids = dict(Tag.objects.values_list("slug", "id"))
+    ArticleTag.objects.bulk_create(
+        [ArticleTag(article_id=pk, tag_id=tag_ids[slug]) for pk, slugs in parsed.items() for slug in slugs],
+        batch_size=1000,
+    )
+
+
+def clear_tags(apps, schema_editor):
+    apps.get_model("articles", "ArticleTag").objects.all().delete()
+    apps.get_model("articles", "Tag").objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("articles", "0010_tag_articletag"),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_tags, clear_tags),
+    ]
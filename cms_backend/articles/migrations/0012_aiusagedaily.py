@@ -0,0 +1,100 @@
+# Generated by Django 5.2.6 on 2026-10-18 03:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+
+
+def populate_rollups(apps, schema_editor):
+    AIUsage = apps.get_model("articles", "AIUsage")
+    AIUsageDaily = apps.get_model("articles", "AIUsageDaily")
+    grouped = (
+        AIUsage.objects.annotate(day=TruncDate("created_at"))
+        .values("user_id", "feature", "day")
+        .annotate(
+            calls=Count("id"),
+            cached_calls=Count("id", filter=Q(cached=True)),
+            tokens=Sum("tokens_used"),
+            cost=Sum("estimated_cost"),
+        )
+        .order_by()
+    )
+    AIUsageDaily.objects.bulk_create(
+        [
+            AIUsageDaily(
+                user_id=row["user_id"],
+                feature=row["feature"],
+                day=row["day"],
+                calls=row["calls"],
+                cached_calls=row["cached_calls"],
+                tokens_used=row["tokens"] or 0,
+                estimated_cost=row["cost"] or 0,
+            )
+            for row in grouped
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("articles", "0011_populate_tags"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AIUsageDaily",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "feature",
+                    models.CharField(
+                        choices=[
+                            ("generate", "Content Generation"),
+                            ("summarize", "Summarization"),
+                            ("seo", "SEO Optimization"),
+                            ("tags", "Tag Generation"),
+                            ("sentiment", "Sentiment Analysis"),
+                        ],
+                        max_length=50,
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("calls", models.PositiveIntegerField(default=0)),
+                ("cached_calls", models.PositiveIntegerField(default=0)),
+                ("tokens_used", models.BigIntegerField(default=0)),
+                (
+                    "estimated_cost",
+                    models.DecimalField(decimal_places=6, default=0, max_digits=14),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ai_usage_daily",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("user", "day", "feature"), name="unique_usage_daily"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-18 03:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("articles", "0012_aiusagedaily"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="aiusage",
+            name="event_id",
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name="aiusage",
+            name="created_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
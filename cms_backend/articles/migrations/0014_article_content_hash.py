@@ -0,0 +1,62 @@
+# Generated by Django 5.2.6 on 2026-10-18 03:45
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def populate_content_hash(apps, schema_editor):
+    Article = apps.get_model("articles", "Article")
+    articles = list(Article.objects.only("id", "content", "summary"))
+    for article in articles:
+        article.content_hash = hashlib.sha256(
+            (article.content or "").encode("utf-8")
+        ).hexdigest()
+        # summaries saved before this migration were already shown on the home page
+        article.summary_published = bool(article.summary)
+    Article.objects.bulk_update(
+        articles, ["content_hash", "summary_published"], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("articles", "0013_aiusage_event_id"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="article",
+            name="analyzed_hash",
+            field=models.CharField(
+                blank=True, default="", editable=False, max_length=64
+            ),
+        ),
+        migrations.AddField(
+            model_name="article",
+            name="content_hash",
+            field=models.CharField(
+                blank=True, default="", editable=False, max_length=64
+            ),
+        ),
+        migrations.AddField(
+            model_name="article",
+            name="summary_published",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name="aijob",
+            name="feature",
+            field=models.CharField(
+                choices=[
+                    ("generate", "Content Generation"),
+                    ("summarize", "Summarization"),
+                    ("sentiment", "Sentiment Analysis"),
+                    ("analyze", "Auto Analysis"),
+                ],
+                max_length=50,
+            ),
+        ),
+        migrations.RunPython(populate_content_hash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 03:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("articles", "0014_article_content_hash"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="aiusage",
+            name="coalesced",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="aiusagedaily",
+            name="coalesced_calls",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("articles", "0016_articlefingerprint_articlelshband"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArticleKeywords",
+            fields=[
+                (
+                    "article",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="keywords",
+                        serialize=False,
+                        to="articles.article",
+                    ),
+                ),
+                ("source_hash", models.CharField(max_length=64)),
+                ("term_ids", models.BinaryField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name="KeywordTerm",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("term", models.CharField(max_length=100, unique=True)),
+                ("doc_freq", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 04:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("articles", "0017_keywordterm_articlekeywords"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="aiusage",
+            name="local",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="aiusagedaily",
+            name="local_calls",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
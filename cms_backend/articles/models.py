@@ -1,18 +1,146 @@
+import hashlib
+
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth.models import User  
 
+from . import rendering
+
+
+def content_hash(content):
+    return hashlib.sha256((content or '').encode('utf-8')).hexdigest()
+
+
 class Article(models.Model):
     title = models.CharField(max_length=255)
     content = models.TextField()
     tags = models.TextField(blank=True, null=True)   
     summary = models.TextField(blank=True, null=True)  
+    sentiment = models.TextField(blank=True, null=True)
+    # only published summaries are shown in article lists; auto-analysis stores
+    # its summary unpublished (see articles/analysis.py)
+    summary_published = models.BooleanField(default=False)
+    # sha256 of content, and of the content summary/sentiment were computed from
+    content_hash = models.CharField(max_length=64, blank=True, default='', editable=False)
+    analyzed_hash = models.CharField(max_length=64, blank=True, default='', editable=False)
+    # sanitized HTML, table of contents and reading time (minutes) rendered
+    # from content at save time (see articles/rendering.py)
+    content_html = models.TextField(blank=True, default='', editable=False)
+    content_toc = models.JSONField(blank=True, default=list, editable=False)
+    reading_time = models.PositiveIntegerField(default=0, editable=False)
+    rendered_hash = models.CharField(max_length=64, blank=True, default='', editable=False)
+    tag_set = models.ManyToManyField('Tag', through='ArticleTag', related_name='articles', blank=True)
     author = models.ForeignKey(User, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # backs the (created_at, id) cursor used by ArticleCursorPagination
+            models.Index(fields=['-created_at', '-id'], name='article_created_id_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        self.content_hash = content_hash(self.content)
+        rendered = rendering.render_article(self)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'content' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'content_hash'}
+            if rendered:
+                kwargs['update_fields'].update(rendering.RENDERED_FIELDS)
+        super().save(*args, **kwargs)
+
+class Tag(models.Model):
+    """
+    Normalized tag. ``article_count`` is a denormalized counter maintained by
+    articles/tagging.py on every write, so tag clouds never GROUP BY.
+    """
+    name = models.CharField(max_length=64)
+    slug = models.SlugField(max_length=64, unique=True)
+    article_count = models.PositiveIntegerField(default=0, db_index=True)
+
+    def __str__(self):
+        return self.name
+
+
+class ArticleTag(models.Model):
+    article = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='article_tags')
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='article_tags')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['article', 'tag'], name='unique_article_tag'),
+        ]
+        indexes = [
+            # ?tag= filtering walks tag -> articles
+            models.Index(fields=['tag', 'article'], name='articletag_tag_article_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.article_id} - {self.tag_id}"
+
+
+class ArticleFingerprint(models.Model):
+    """
+    MinHash signature of an article's content (see articles/dedup.py),
+    packed as little-endian uint32 values.
+    """
+    article = models.OneToOneField(Article, on_delete=models.CASCADE, primary_key=True, related_name='fingerprint')
+    # Article.content_hash the signature was computed from
+    content_hash = models.CharField(max_length=64)
+    signature = models.BinaryField()
+
+    def __str__(self):
+        return f"{self.article_id} - {self.content_hash[:12]}"
+
+
+class ArticleLSHBand(models.Model):
+    """
+    One LSH band key of an article's signature; articles sharing any
+    (band, key) pair are near-duplicate candidates.
+    """
+    article = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='lsh_bands')
+    band = models.PositiveSmallIntegerField()
+    key = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['band', 'key'], name='lsh_band_key_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.article_id} - {self.band}:{self.key}"
+
+
+class KeywordTerm(models.Model):
+    """
+    Corpus vocabulary of the local tag extractor (see articles/keywords.py):
+    a candidate keyphrase and the number of articles containing it.
+    """
+    term = models.CharField(max_length=100, unique=True)
+    doc_freq = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.term} ({self.doc_freq})"
+
+
+class ArticleKeywords(models.Model):
+    """
+    The KeywordTerm ids an article contributed to ``doc_freq``, packed as
+    little-endian int64 values, so edits and deletes can undo them.
+    """
+    article = models.OneToOneField(Article, on_delete=models.CASCADE, primary_key=True, related_name='keywords')
+    # hash of the title and content the terms were extracted from
+    source_hash = models.CharField(max_length=64)
+    term_ids = models.BinaryField()
+
+    def __str__(self):
+        return f"{self.article_id} - {len(self.term_ids) // 8} terms"
+
+
 class AIUsage(models.Model):
     FEATURE_CHOICES = [
         ('generate', 'Content Generation'),
@@ -27,7 +155,96 @@ class AIUsage(models.Model):
     feature = models.CharField(max_length=50, choices=FEATURE_CHOICES)
     tokens_used = models.IntegerField(default=0)
     estimated_cost = models.DecimalField(max_digits=10, decimal_places=6, default=0)
-    created_at = models.DateTimeField(auto_now_add=True)
+    cached = models.BooleanField(default=False)
+    # served by sharing an identical call already in flight (no upstream spend)
+    coalesced = models.BooleanField(default=False)
+    # answered by the local classifier tier (no Gemini call, no cost)
+    local = models.BooleanField(default=False)
+    # set by the buffered writer so spool replays can skip rows already inserted
+    event_id = models.UUIDField(null=True, blank=True, unique=True, editable=False)
+    # default (not auto_now_add) so buffered rows keep the time the call happened
+    created_at = models.DateTimeField(default=timezone.now)
 
     def __str__(self):
         return f"{self.user.username} - {self.feature} - ${self.estimated_cost}"
+
+
+class AIResultCache(models.Model):
+    """Persistent tier of the AI result cache (see articles/ai_cache.py)."""
+    key = models.CharField(max_length=64, primary_key=True)
+    feature = models.CharField(max_length=50, blank=True)
+    model = models.CharField(max_length=100, blank=True)
+    payload = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.feature} - {self.key[:12]}"
+
+
+class AIJob(models.Model):
+    """
+    A queued AI call executed by the `run_ai_worker` pool instead of inside the request.
+    """
+    FEATURE_CHOICES = [
+        ('generate', 'Content Generation'),
+        ('summarize', 'Summarization'),
+        ('sentiment', 'Sentiment Analysis'),
+        ('analyze', 'Auto Analysis'),
+    ]
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    DEAD = 'dead'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (DEAD, 'Dead-lettered'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='ai_jobs')
+    article = models.ForeignKey(Article, on_delete=models.SET_NULL, related_name='ai_jobs', null=True, blank=True)
+    feature = models.CharField(max_length=50, choices=FEATURE_CHOICES)
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True, default='')
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'run_after'])]
+
+    def __str__(self):
+        return f"{self.feature} #{self.pk} ({self.status})"
+
+
+class AIUsageDaily(models.Model):
+    """
+    Per (user, feature, day) totals of AIUsage, updated incrementally by
+    articles/usage.py whenever usage is recorded.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='ai_usage_daily')
+    feature = models.CharField(max_length=50, choices=AIUsage.FEATURE_CHOICES)
+    day = models.DateField()
+    calls = models.PositiveIntegerField(default=0)
+    cached_calls = models.PositiveIntegerField(default=0)
+    coalesced_calls = models.PositiveIntegerField(default=0)
+    local_calls = models.PositiveIntegerField(default=0)
+    tokens_used = models.BigIntegerField(default=0)
+    estimated_cost = models.DecimalField(max_digits=14, decimal_places=6, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day', 'feature'], name='unique_usage_daily'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.feature} - {self.day}"
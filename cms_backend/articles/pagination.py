@@ -0,0 +1,12 @@
+from rest_framework.pagination import CursorPagination
+
+
+class ArticleCursorPagination(CursorPagination):
+    """
+    Keyset pagination over (created_at, id), served by the matching composite
+    index on Article, so page N costs the same as page 1.
+    """
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    ordering = ("-created_at", "-id")
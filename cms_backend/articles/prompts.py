@@ -0,0 +1,160 @@
+# articles/prompts.py
+"""
+Prompt templates and generation configs for the Gemini-backed article features.
+
+Bump a template's ``version`` whenever its wording or config changes, so
+cached results produced by the old template are never served for the new one.
+"""
+from dataclasses import dataclass
+
+GEMINI_MODEL = "gemini-2.5-flash"
+
+# Articles are trimmed to this many characters before being sent to the model
+# (when chunked analysis is off; see articles/chunking.py)
+CONTENT_LIMIT = 3000
+
+
+@dataclass(frozen=True)
+class PromptSpec:
+    feature: str
+    version: int
+    template: str
+    temperature: float
+    max_output_tokens: int
+    model: str = GEMINI_MODEL
+    # map-reduce step ("chunk" / "reduce"); keeps its cached results apart from the feature's own
+    stage: str = ""
+
+    def render(self, **kwargs):
+        return self.template.format(**kwargs)
+
+    def config(self):
+        return {"temperature": self.temperature, "max_output_tokens": self.max_output_tokens}
+
+
+GENERATE_PROMPT = PromptSpec(
+    feature="generate",
+    version=1,
+    template=(
+        "You are a professional blog writer. Write a polished, SEO-friendly blog post about '{topic}'.\n\n"
+        "Requirements:\n"
+        " - Use a catchy title (with one emoji).\n"
+        " - Add an engaging intro paragraph.\n"
+        " - Use markdown headings (##, ###), short paragraphs, spacing, and occasional emojis.\n"
+        " - Highlight key ideas using bold or italic where helpful.\n"
+        " - End with an inspiring conclusion.\n"
+        " - Then include a section titled '### 🏷️ Related Tags' and list 6 short tags separated by commas.\n\n"
+        "Return ONLY the final markdown blog post (no extra commentary)."
+    ),
+    temperature=0.9,
+    max_output_tokens=3500,
+)
+
+SUMMARIZE_PROMPT = PromptSpec(
+    feature="summarize",
+    version=1,
+    template=(
+        "Summarize the following blog post in 4-6 clear, professional sentences. "
+        "Avoid bullet points. Include emojis only when relevant.\n\n"
+        "{content}"
+    ),
+    temperature=0.6,
+    max_output_tokens=600,
+)
+
+# Simpler prompt retried when the main summary prompt comes back empty
+SUMMARIZE_FALLBACK_PROMPT = PromptSpec(
+    feature="summarize",
+    version=1,
+    template="Briefly summarize this text in 2-3 sentences:\n\n{content}",
+    temperature=0.4,
+    max_output_tokens=300,
+)
+SUMMARIZE_FALLBACK_LIMIT = 1200
+
+SENTIMENT_PROMPT = PromptSpec(
+    feature="sentiment",
+    version=1,
+    template=(
+        "Read the article below and classify its overall sentiment as either: "
+        "'Positive', 'Negative', or 'Neutral/Mixed'. Return the classification followed by one short sentence justification.\n\n"
+        "{content}"
+    ),
+    temperature=0.3,
+    max_output_tokens=300,
+)
+
+# Map-reduce prompts for articles longer than one chunk
+SUMMARIZE_CHUNK_PROMPT = PromptSpec(
+    feature="summarize",
+    stage="chunk",
+    version=1,
+    template=(
+        "Summarize this section of a longer blog post in 2-3 sentences. "
+        "Keep the concrete facts, names and numbers.\n\n"
+        "{content}"
+    ),
+    temperature=0.4,
+    max_output_tokens=250,
+)
+
+SUMMARIZE_REDUCE_PROMPT = PromptSpec(
+    feature="summarize",
+    stage="reduce",
+    version=1,
+    template=(
+        "Below are summaries of the consecutive sections of one blog post. Combine them into a single "
+        "summary of the whole post in 4-6 clear, professional sentences. "
+        "Avoid bullet points. Include emojis only when relevant.\n\n"
+        "{content}"
+    ),
+    temperature=0.6,
+    max_output_tokens=600,
+)
+
+SENTIMENT_CHUNK_PROMPT = PromptSpec(
+    feature="sentiment",
+    stage="chunk",
+    version=1,
+    template=(
+        "Read this section of a longer article and classify its sentiment as either: "
+        "'Positive', 'Negative', or 'Neutral/Mixed'. Return the classification followed by one short sentence justification.\n\n"
+        "{content}"
+    ),
+    temperature=0.3,
+    max_output_tokens=150,
+)
+
+SENTIMENT_REDUCE_PROMPT = PromptSpec(
+    feature="sentiment",
+    stage="reduce",
+    version=1,
+    template=(
+        "Below are sentiment classifications of the consecutive sections of one article, each with a short "
+        "justification. Classify the overall sentiment of the article as either: "
+        "'Positive', 'Negative', or 'Neutral/Mixed'. Return the classification followed by one short sentence justification.\n\n"
+        "{content}"
+    ),
+    temperature=0.3,
+    max_output_tokens=300,
+)
+
+DEFAULT_TAGS = ["AI", "Blogging", "Innovation", "Technology", "Learning", "Creativity"]
+
+
+def parse_tags(text, default=DEFAULT_TAGS):
+    """
+    Extract the tag list from the bottom 'Related Tags' section of a generated post.
+    Falls back to ``default`` (DEFAULT_TAGS) when the section is missing or empty.
+    """
+    tags_list = []
+    if "Related Tags" in text:
+        try:
+            section = text.split("Related Tags", 1)[-1]
+            section = section.replace("🏷️", "").replace("#", "")
+            tags_list = [t.strip() for t in section.split(",") if t.strip()]
+            # trim to 6 tags max
+            tags_list = tags_list[:6]
+        except Exception:
+            tags_list = []
+    return tags_list or list(default or [])
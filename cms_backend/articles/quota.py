@@ -0,0 +1,279 @@
+# articles/quota.py
+"""
+Per-user and global quotas for AI actions, enforced before any Gemini call.
+
+Each scope (every user, and all users together) has two limits:
+- requests per minute, a token bucket that refills continuously;
+- tokens per day, a counter charged with each call's estimated tokens.
+
+Buckets and counters live in process memory ("memory" backend) or in Redis
+("redis" backend) so several nodes share one budget. A process only sees
+the tokens it charged itself, so daily counters are periodically raised to
+the AIUsage totals (read from the AIUsageDaily rollups). All time comes from
+an injectable clock; tests pass a FakeClock.
+"""
+import math
+import threading
+import time
+from datetime import datetime, timedelta
+from datetime import time as dt_time
+from functools import lru_cache
+
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import AIUsageDaily
+
+
+DEFAULTS = {
+    "ENABLED": True,
+    "BACKEND": "memory",
+    "REDIS_URL": "redis://localhost:6379/0",
+    "KEY_PREFIX": "ai-quota",
+    "USER_REQUESTS_PER_MINUTE": 20,
+    "GLOBAL_REQUESTS_PER_MINUTE": 300,
+    "USER_TOKENS_PER_DAY": 200000,
+    "GLOBAL_TOKENS_PER_DAY": 5000000,
+    "RECONCILE_INTERVAL": 60,
+}
+
+def get_setting(name):
+    return getattr(settings, "AI_QUOTA", {}).get(name, DEFAULTS[name])
+
+
+class QuotaExceeded(Exception):
+    """Raised when a request would exceed a limit; ``retry_after`` is in seconds."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class FakeClock:
+    """
+    Manually advanced clock for tests: ``clock = FakeClock(); clock.advance(30)``.
+    """
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+# ----------------- BACKENDS -----------------
+class MemoryBackend:
+    """
+    Buckets and counters in a dict; per process, guarded by a lock.
+    """
+
+    def __init__(self):
+        self.buckets = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def take(self, key, capacity, per_second, now, amount=1):
+        """
+        Take ``amount`` tokens from the bucket and return 0, or return the
+        seconds until they would be available without taking anything.
+        A negative amount gives tokens back.
+        """
+        with self.lock:
+            tokens, updated = self.buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + max(0.0, now - updated) * per_second)
+            if tokens < amount:
+                self.buckets[key] = (tokens, now)
+                return (amount - tokens) / per_second
+            self.buckets[key] = (min(capacity, tokens - amount), now)
+            return 0
+
+    def get(self, key, now):
+        with self.lock:
+            return self.get_unlocked(key, now)
+
+    def incr(self, key, amount, now, expire_at):
+        with self.lock:
+            value = self.get_unlocked(key, now) + amount
+            self.counters[key] = (value, expire_at)
+            return value
+
+    def raise_to(self, key, value, now, expire_at):
+        with self.lock:
+            if value > self.get_unlocked(key, now):
+                self.counters[key] = (value, expire_at)
+            # drop counters from previous days
+            for stale in [k for k, (_, exp) in self.counters.items() if exp <= now]:
+                del self.counters[stale]
+
+    def get_unlocked(self, key, now):
+        value, expire_at = self.counters.get(key, (0, None))
+        return value if expire_at is None or expire_at > now else 0
+
+
+TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local amount = tonumber(ARGV[4])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens < amount then
+  wait = (amount - tokens) / rate
+else
+  tokens = math.min(capacity, tokens - amount)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 60)
+return tostring(wait)
+"""
+
+RAISE_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+if tonumber(ARGV[1]) > current then
+  redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+end
+return current
+"""
+
+
+class RedisBackend:
+    """
+    Buckets and counters shared by every process using the same Redis.
+    Bucket updates run as Lua scripts so take-or-refuse is atomic.
+    """
+
+    def __init__(self, url):
+        import redis
+
+        self.redis = redis.Redis.from_url(url)
+        self.take_script = self.redis.register_script(TAKE_SCRIPT)
+        self.raise_script = self.redis.register_script(RAISE_SCRIPT)
+
+    def take(self, key, capacity, per_second, now, amount=1):
+        return float(self.take_script(keys=[key], args=[capacity, per_second, now, amount]))
+
+    def get(self, key, now):
+        return int(self.redis.get(key) or 0)
+
+    def incr(self, key, amount, now, expire_at):
+        pipe = self.redis.pipeline()
+        pipe.incrby(key, amount)
+        pipe.expire(key, max(1, math.ceil(expire_at - now)))
+        return pipe.execute()[0]
+
+    def raise_to(self, key, value, now, expire_at):
+        self.raise_script(keys=[key], args=[value, max(1, math.ceil(expire_at - now))])
+
+
+# ----------------- LIMITER -----------------
+def recorded_tokens(user_id, day):
+    """
+    Tokens already recorded in AIUsage for ``day`` (one user, or everyone).
+    """
+    qs = AIUsageDaily.objects.filter(day=day)
+    if user_id is not None:
+        qs = qs.filter(user_id=user_id)
+    return qs.aggregate(total=Sum("tokens_used"))["total"] or 0
+
+
+class QuotaLimiter:
+    def __init__(self, backend=None, clock=time.time, limits=None):
+        self.backend = backend or MemoryBackend()
+        self.clock = clock
+        self.limits = limits or {}
+        self.reconciled = {}
+        self.reconcile_lock = threading.Lock()
+
+    def limit(self, scope, name):
+        setting = f"{scope.upper()}_{name}"
+        return self.limits.get(setting, get_setting(setting))
+
+    def key(self, *parts):
+        return ":".join([get_setting("KEY_PREFIX"), *map(str, parts)])
+
+    def day_bounds(self, now):
+        """
+        Return (day, timestamp of the next local midnight) for clock time ``now``.
+        """
+        tz = timezone.get_current_timezone()
+        day = datetime.fromtimestamp(now, tz=tz).date()
+        midnight = datetime.combine(day + timedelta(days=1), dt_time.min).replace(tzinfo=tz)
+        return day, midnight.timestamp()
+
+    def scopes(self, user_id):
+        return (("user", f"user:{user_id}", user_id), ("global", "global", None))
+
+    def check(self, user, requests=1):
+        """
+        Take ``requests`` from the per-minute buckets, or raise QuotaExceeded
+        without consuming anything.
+        """
+        now = self.clock()
+        day, midnight = self.day_bounds(now)
+        for scope, name, user_id in self.scopes(user.pk):
+            limit = self.limit(scope, "TOKENS_PER_DAY")
+            if limit and self.tokens_today(name, user_id, day, now, midnight) >= limit:
+                raise QuotaExceeded(f"Daily AI token limit reached ({scope}).", midnight - now)
+
+        taken = []
+        for scope, name, _ in self.scopes(user.pk):
+            per_minute = self.limit(scope, "REQUESTS_PER_MINUTE")
+            if not per_minute:
+                continue
+            key = self.key("rpm", name)
+            wait = self.backend.take(key, per_minute, per_minute / 60.0, now, requests)
+            if wait:
+                for taken_key, capacity in taken:
+                    self.backend.take(taken_key, capacity, capacity / 60.0, now, -requests)
+                raise QuotaExceeded(f"AI request rate limit reached ({scope}).", wait)
+            taken.append((key, per_minute))
+
+    def charge(self, user_id, tokens):
+        """
+        Add a finished call's tokens to today's user and global counters.
+        """
+        if not tokens:
+            return
+        now = self.clock()
+        day, midnight = self.day_bounds(now)
+        for _, name, _ in self.scopes(user_id):
+            self.backend.incr(self.key("tokens", name, day), tokens, now, midnight + 3600)
+
+    def tokens_today(self, name, user_id, day, now, midnight):
+        key = self.key("tokens", name, day)
+        with self.reconcile_lock:
+            due = now - self.reconciled.get(key, -math.inf) >= get_setting("RECONCILE_INTERVAL")
+            if due:
+                self.reconciled = {k: t for k, t in self.reconciled.items() if str(day) in k}
+                self.reconciled[key] = now
+        if due:
+            self.backend.raise_to(key, recorded_tokens(user_id, day), now, midnight + 3600)
+        return self.backend.get(key, now)
+
+
+@lru_cache(maxsize=None)
+def get_quota():
+    if get_setting("BACKEND") == "redis":
+        return QuotaLimiter(backend=RedisBackend(get_setting("REDIS_URL")))
+    return QuotaLimiter()
+
+
+def quota_enabled():
+    return get_setting("ENABLED")
+
+
+def check_quota(user, requests=1):
+    if quota_enabled():
+        get_quota().check(user, requests=requests)
+
+
+def charge_quota(user_id, tokens):
+    if quota_enabled():
+        get_quota().charge(user_id, tokens)
@@ -0,0 +1,397 @@
+# articles/related.py
+"""
+Related articles from a local vector index (no network).
+
+Each article is encoded into a DIM-dimensional float32 vector (by default
+signed feature hashing of word unigrams and bigrams, L2-normalised; swap
+ENCODER for an embedding model later) and stored in a memory-mapped matrix
+under INDEX_DIR:
+
+    vectors.f32   capacity x DIM float32 rows
+    ids.i64       the article id of each row (0 = free slot)
+    meta.json     encoder, dim, count, capacity, build id and write version
+
+Saves and deletes update single rows (see signals.py); a deleted row is
+zeroed and reused by the next insert, and the files double in size when
+full. Writers take an exclusive file lock (flock, or msvcrt on Windows),
+so several worker processes can share one index. Top-k is exact: cosine
+similarity (a dot product, as rows are normalised) is computed BATCH_ROWS
+rows at a time with a partial sort per batch, so memory stays flat however
+large the index grows.
+"""
+import json
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+DEFAULTS = {
+    "ENABLED": True,
+    "INDEX_DIR": None,
+    "ENCODER": "articles.related.HashedNgramEncoder",
+    "DIM": 256,
+    "BATCH_ROWS": 65536,
+    "MAX_K": 50,
+}
+
+INITIAL_CAPACITY = 1024
+
+
+def get_setting(name):
+    value = getattr(settings, "RELATED_ARTICLES", {}).get(name, DEFAULTS[name])
+    if name == "INDEX_DIR" and value is None:
+        value = Path(settings.BASE_DIR) / "related_index"
+    return value
+
+
+def article_text(article):
+    # the title counts twice so it outweighs a long body
+    title = article.title or ""
+    return f"{title}\n{title}\n{article.tags or ''}\n{article.content or ''}"
+
+
+# ----------------- ENCODERS -----------------
+class HashedNgramEncoder:
+    """
+    Signed hashing of word 1-2 grams into ``dim`` buckets. Stateless, so one
+    article can be (re)encoded without refitting anything on the corpus.
+    """
+    name = "hashed-ngrams-v1"
+
+    def __init__(self, dim):
+        # scikit-learn is only imported once the index is actually used
+        from sklearn.feature_extraction.text import HashingVectorizer
+
+        self.dim = dim
+        self.vectorizer = HashingVectorizer(
+            n_features=dim, ngram_range=(1, 2), stop_words="english",
+            alternate_sign=True, norm="l2", dtype=np.float32,
+        )
+
+    def encode(self, texts):
+        """
+        Return a (len(texts), dim) float32 array of L2-normalised rows.
+        """
+        return self.vectorizer.transform(texts).toarray()
+
+
+@contextmanager
+def file_lock(path):
+    """
+    Hold an exclusive lock on ``path`` across processes.
+    """
+    with open(path, "a+b") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+        else:
+            fh.seek(0)
+            while True:
+                try:
+                    # LK_LOCK retries for about 10 seconds before giving up
+                    msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+            else:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+# ----------------- INDEX -----------------
+class VectorIndex:
+    def __init__(self, path, encoder, batch_rows=DEFAULTS["BATCH_ROWS"]):
+        self.path = Path(path)
+        self.encoder = encoder
+        self.dim = encoder.dim
+        self.batch_rows = batch_rows
+        self.lock = threading.Lock()
+        self.meta = None
+        self.ids = None
+        self.vectors = None
+
+    # ---------------- files ----------------
+    def file(self, name):
+        return self.path / name
+
+    def read_meta(self):
+        try:
+            return json.loads(self.file("meta.json").read_text())
+        except (OSError, ValueError):
+            return None
+
+    def write_meta(self, meta):
+        tmp = self.file("meta.json.tmp")
+        tmp.write_text(json.dumps(meta))
+        os.replace(tmp, self.file("meta.json"))
+
+    def compatible(self, meta):
+        return meta and meta.get("encoder") == self.encoder.name and meta.get("dim") == self.dim
+
+    def create(self, capacity=INITIAL_CAPACITY):
+        """
+        Start an empty index, replacing any files already in INDEX_DIR.
+        """
+        self.path.mkdir(parents=True, exist_ok=True)
+        for name, dtype, shape in (("vectors.f32", np.float32, (capacity, self.dim)), ("ids.i64", np.int64, (capacity,))):
+            with open(self.file(name), "wb") as f:
+                f.truncate(int(np.prod(shape)) * np.dtype(dtype).itemsize)
+        meta = {
+            "encoder": self.encoder.name, "dim": self.dim, "count": 0, "capacity": capacity,
+            "version": 0, "build": uuid.uuid4().hex,
+        }
+        self.write_meta(meta)
+        return meta
+
+    def open(self):
+        """
+        Re-read meta.json (another process may have written rows) and remap
+        the files if they were grown or replaced by a rebuild. Returns False
+        when there is no usable index yet.
+        """
+        meta = self.read_meta()
+        if not self.compatible(meta):
+            self.meta = None
+            return False
+        current = self.meta or {}
+        if (meta["build"], meta["capacity"]) != (current.get("build"), current.get("capacity")):
+            self.map(meta["capacity"])
+        self.meta = meta
+        return True
+
+    def map(self, capacity):
+        self.ids = np.memmap(self.file("ids.i64"), dtype=np.int64, mode="r+", shape=(capacity,))
+        self.vectors = np.memmap(self.file("vectors.f32"), dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+
+    @contextmanager
+    def writing(self):
+        """
+        Exclusive across threads and processes; yields the current meta, and
+        publishes the new count/version on exit.
+        """
+        self.path.mkdir(parents=True, exist_ok=True)
+        with self.lock, file_lock(self.file("lock")):
+            if not self.open():
+                if self.read_meta() is not None:
+                    print("⚠️ Related-articles index was built with another encoder; starting over "
+                          "(run `manage.py rebuild_related_index` to re-add existing articles)")
+                self.create()
+                self.open()
+            yield self.meta
+            self.vectors.flush()
+            self.ids.flush()
+            self.meta["version"] += 1
+            self.write_meta(self.meta)
+
+    def grow(self, capacity):
+        for name, itemsize in (("vectors.f32", 4 * self.dim), ("ids.i64", 8)):
+            with open(self.file(name), "r+b") as f:
+                f.truncate(capacity * itemsize)
+        self.meta["capacity"] = capacity
+        self.map(capacity)
+
+    # ---------------- rows ----------------
+    def row_of(self, pk):
+        rows = np.flatnonzero(self.ids[:self.meta["count"]] == pk)
+        return int(rows[0]) if len(rows) else None
+
+    def upsert(self, pks, vectors):
+        """
+        Insert or overwrite the rows of ``pks``; reuses free slots first.
+        """
+        with self.writing() as meta:
+            free = list(np.flatnonzero(self.ids[:meta["count"]] == 0))
+            for pk, vector in zip(pks, vectors):
+                row = self.row_of(pk)
+                if row is None and free:
+                    row = int(free.pop(0))
+                if row is None:
+                    if meta["count"] == meta["capacity"]:
+                        self.grow(meta["capacity"] * 2)
+                    row = meta["count"]
+                    meta["count"] += 1
+                self.vectors[row] = vector
+                self.ids[row] = pk
+
+    def remove(self, pk):
+        with self.writing():
+            row = self.row_of(pk)
+            if row is not None:
+                self.ids[row] = 0
+                self.vectors[row] = 0
+
+    def vector_of(self, pk):
+        with self.lock:
+            if not self.open():
+                return None
+            row = self.row_of(pk)
+            return None if row is None else np.array(self.vectors[row])
+
+    def __len__(self):
+        with self.lock:
+            if not self.open():
+                return 0
+            return int(np.count_nonzero(self.ids[:self.meta["count"]]))
+
+    # ---------------- query ----------------
+    def query(self, vector, k, exclude=()):
+        """
+        Return [(pk, score)] for the ``k`` rows most similar to ``vector``,
+        best first, skipping free rows and ``exclude``.
+        """
+        with self.lock:
+            if not self.open():
+                return []
+            count, ids, vectors = self.meta["count"], self.ids, self.vectors
+        vector = np.asarray(vector, dtype=np.float32)
+        exclude = np.asarray(list(exclude), dtype=np.int64)
+        best_scores = np.empty(0, dtype=np.float32)
+        best_ids = np.empty(0, dtype=np.int64)
+        for start in range(0, count, self.batch_rows):
+            block_ids = np.asarray(ids[start:start + self.batch_rows])
+            scores = vectors[start:start + self.batch_rows] @ vector
+            scores[block_ids == 0] = -np.inf
+            if len(exclude):
+                scores[np.isin(block_ids, exclude)] = -np.inf
+            if len(scores) > k:
+                top = np.argpartition(-scores, k)[:k]
+                scores, block_ids = scores[top], block_ids[top]
+            best_scores = np.concatenate([best_scores, scores])
+            best_ids = np.concatenate([best_ids, block_ids])
+            if len(best_scores) > k:
+                top = np.argpartition(-best_scores, k)[:k]
+                best_scores, best_ids = best_scores[top], best_ids[top]
+        order = np.lexsort((best_ids, -best_scores))
+        return [
+            (int(best_ids[i]), float(best_scores[i]))
+            for i in order if np.isfinite(best_scores[i])
+        ]
+
+    # ---------------- bulk ----------------
+    def rebuild(self, batches):
+        """
+        Build a fresh index from ``batches`` of (pks, vectors) in a temporary
+        directory and swap it in, so readers never see a half-built index.
+        """
+        staging = VectorIndex(self.path.with_name(self.path.name + ".building"), self.encoder, self.batch_rows)
+        staging.create()
+        staging.open()
+        total = 0
+        for pks, vectors in batches:
+            count = staging.meta["count"]
+            needed = count + len(pks)
+            if needed > staging.meta["capacity"]:
+                staging.grow(max(staging.meta["capacity"] * 2, needed))
+            staging.vectors[count:needed] = vectors
+            staging.ids[count:needed] = pks
+            staging.meta["count"] = needed
+            total += len(pks)
+        staging.vectors.flush()
+        staging.ids.flush()
+        staging.write_meta(staging.meta)
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        with self.lock, file_lock(self.file("lock")):
+            # meta.json goes last: until then readers keep the old files mapped
+            for name in ("vectors.f32", "ids.i64", "meta.json"):
+                os.replace(staging.file(name), self.file(name))
+            self.meta = None
+        for leftover in staging.path.iterdir():
+            leftover.unlink()
+        staging.path.rmdir()
+        return total
+
+
+@lru_cache(maxsize=None)
+def get_index():
+    """
+    Process-wide index built from settings.RELATED_ARTICLES. Call
+    ``get_index.cache_clear()`` after changing the settings.
+    """
+    encoder = import_string(get_setting("ENCODER"))(get_setting("DIM"))
+    return VectorIndex(get_setting("INDEX_DIR"), encoder, batch_rows=get_setting("BATCH_ROWS"))
+
+
+# ----------------- INCREMENTAL UPDATES -----------------
+def index_article(article):
+    if not get_setting("ENABLED"):
+        return
+    try:
+        index = get_index()
+        index.upsert([article.pk], index.encoder.encode([article_text(article)]))
+    except Exception as e:
+        print("❌ Related-articles index update failed:", repr(e))
+
+
+def index_articles(articles):
+    """
+    Batch form of index_article (used by imports, which bypass the signals).
+    """
+    if not get_setting("ENABLED") or not articles:
+        return
+    try:
+        index = get_index()
+        index.upsert([article.pk for article in articles], index.encoder.encode([article_text(a) for a in articles]))
+    except Exception as e:
+        print("❌ Related-articles index update failed:", repr(e))
+
+
+def remove_article(pk):
+    if not get_setting("ENABLED"):
+        return
+    try:
+        get_index().remove(pk)
+    except Exception as e:
+        print("❌ Related-articles index delete failed:", repr(e))
+
+
+def rebuild_index(queryset, batch_size=1000):
+    """
+    Re-encode every article in ``queryset`` and return the row count.
+    """
+    index = get_index()
+
+    def batches():
+        pks, texts = [], []
+        for article in queryset.only("id", "title", "tags", "content").order_by("id").iterator(chunk_size=batch_size):
+            pks.append(article.pk)
+            texts.append(article_text(article))
+            if len(pks) == batch_size:
+                yield pks, index.encoder.encode(texts)
+                pks, texts = [], []
+        if pks:
+            yield pks, index.encoder.encode(texts)
+
+    return index.rebuild(batches())
+
+
+# ----------------- QUERY -----------------
+def related_to(article, k):
+    """
+    Return [(pk, score)] of up to ``k`` articles similar to ``article``
+    (positive cosine only). An article missing from the index (e.g. saved
+    before it existed) is encoded on the fly and added.
+    """
+    index = get_index()
+    vector = index.vector_of(article.pk)
+    if vector is None:
+        vector = index.encoder.encode([article_text(article)])[0]
+        index.upsert([article.pk], [vector])
+    return [(pk, score) for pk, score in index.query(vector, k, exclude=[article.pk]) if score > 0]
@@ -0,0 +1,59 @@
+import csv
+import io
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets clients send ``Accept: text/event-stream`` to streaming actions.
+    The streamed body is produced by the view itself; this renderer only
+    handles error responses raised before the stream starts.
+    """
+    media_type = "text/event-stream"
+    format = "sse"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return f"event: error\ndata: {json.dumps(data)}\n\n".encode(self.charset)
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Lets clients send ``Accept: application/x-ndjson`` to streaming bulk actions.
+    """
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return (json.dumps(data) + "\n").encode(self.charset)
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    Lets clients ask for CSV exports (``?format=csv`` or ``Accept: text/csv``).
+    The rows are streamed by the view; this renders error responses as a
+    one-row CSV of their fields.
+    """
+    media_type = "text/csv"
+    format = "csv"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        data = data if isinstance(data, dict) else {"detail": data}
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(list(data))
+        writer.writerow([str(value) for value in data.values()])
+        return buffer.getvalue().encode(self.charset)
+
+
+class ArticleHTMLRenderer(JSONRenderer):
+    """
+    ``?format=html`` on article endpoints: still JSON, but ArticleSerializer
+    puts the stored, sanitized ``content_html`` in ``content`` instead of the
+    markdown (see articles/rendering.py).
+    """
+    format = "html"
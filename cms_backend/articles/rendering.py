@@ -0,0 +1,175 @@
+# articles/rendering.py
+"""
+Server-side rendering of article markdown, done once at write time.
+
+Article.save() renders ``content`` with mistune, sanitizes the HTML with
+bleach (allow-listed tags and attributes, http/https/mailto links only,
+rel="nofollow noopener" on links) and stores it in ``content_html`` along
+with the table of contents (``content_toc``) and a reading-time estimate.
+``rendered_hash`` covers the content and the rendering settings, so a save
+that does not change either skips the render, and `manage.py
+render_articles` only re-renders rows that are stale.
+
+Serializers only read the stored columns (``?format=html`` swaps them in
+for the markdown) and never render. Rows written before rendering existed
+keep empty fields until `manage.py render_articles` has backfilled them.
+"""
+import hashlib
+import html
+import json
+import math
+import re
+import threading
+from functools import partial
+
+import bleach
+import mistune
+from bleach.linkifier import LinkifyFilter
+from django.conf import settings
+from django.utils.text import slugify
+from mistune.toc import add_toc_hook
+
+from . import response_cache
+
+
+DEFAULTS = {
+    "ENABLED": True,
+    "WORDS_PER_MINUTE": 200,
+    # deepest heading level listed in the table of contents
+    "TOC_MAX_LEVEL": 3,
+}
+
+# bump when the markdown plugins or the sanitizer allow-lists change
+RENDER_VERSION = 1
+RENDERED_FIELDS = ["content_html", "content_toc", "reading_time", "rendered_hash"]
+PLUGINS = ["strikethrough", "table", "url", "task_lists"]
+ALLOWED_TAGS = {
+    "a", "abbr", "b", "blockquote", "br", "code", "del", "em", "h1", "h2", "h3", "h4", "h5", "h6", "hr", "i",
+    "img", "input", "li", "ol", "p", "pre", "s", "strong", "sub", "sup", "table", "tbody", "td", "th", "thead",
+    "tr", "ul",
+}
+ALLOWED_ATTRIBUTES = {
+    "a": ["href", "title", "rel"],
+    "abbr": ["title"],
+    "code": ["class"],
+    "img": ["src", "alt", "title"],
+    # task list checkboxes
+    "input": ["type", "checked", "disabled"],
+    "li": ["class"],
+    "h1": ["id"], "h2": ["id"], "h3": ["id"], "h4": ["id"], "h5": ["id"], "h6": ["id"],
+}
+ALLOWED_PROTOCOLS = {"http", "https", "mailto"}
+TAG = re.compile(r"<[^>]+>")
+WORD = re.compile(r"\w+")
+
+_local = threading.local()
+
+
+def get_setting(name):
+    return getattr(settings, "ARTICLE_RENDERING", {}).get(name, DEFAULTS[name])
+
+
+def render_key(content):
+    """
+    Hash of ``content`` and everything else that changes the rendered output.
+    """
+    options = json.dumps([RENDER_VERSION, get_setting("WORDS_PER_MINUTE"), get_setting("TOC_MAX_LEVEL")])
+    return hashlib.sha256(f"{options}\n{content or ''}".encode("utf-8")).hexdigest()
+
+
+def cleaner():
+    # bleach Cleaners are not thread-safe; keep one per thread
+    if getattr(_local, "cleaner", None) is None:
+        _local.cleaner = bleach.Cleaner(
+            tags=ALLOWED_TAGS,
+            attributes=ALLOWED_ATTRIBUTES,
+            protocols=ALLOWED_PROTOCOLS,
+            strip=True,
+            filters=[partial(LinkifyFilter, callbacks=[nofollow], skip_tags={"pre", "code"})],
+        )
+    return _local.cleaner
+
+
+def nofollow(attrs, new=False):
+    href = attrs.get((None, "href"), "")
+    if not href.startswith("mailto:"):
+        attrs[(None, "rel")] = "nofollow noopener"
+    return attrs
+
+
+def make_markdown():
+    """
+    A mistune parser whose heading ids are slugs, unique within one document.
+    """
+    seen = {}
+
+    def heading_id(token, index):
+        slug = slugify(html.unescape(TAG.sub("", token.get("text", "")))) or f"section-{index}"
+        seen[slug] = seen.get(slug, 0) + 1
+        return slug if seen[slug] == 1 else f"{slug}-{seen[slug]}"
+
+    markdown = mistune.create_markdown(escape=False, plugins=PLUGINS)
+    add_toc_hook(markdown, max_level=get_setting("TOC_MAX_LEVEL"), heading_id=heading_id)
+    return markdown
+
+
+def render(content):
+    """
+    Return {"content_html", "content_toc", "reading_time"} for markdown ``content``.
+    """
+    raw, state = make_markdown().parse(content or "")
+    toc = [
+        {"level": level, "id": anchor, "text": html.unescape(TAG.sub("", text))}
+        for level, anchor, text in state.env.get("toc_items", [])
+    ]
+    clean = cleaner().clean(raw)
+    words = len(WORD.findall(html.unescape(TAG.sub(" ", clean))))
+    return {
+        "content_html": clean,
+        "content_toc": toc,
+        "reading_time": math.ceil(words / get_setting("WORDS_PER_MINUTE")) if words else 0,
+    }
+
+
+def render_article(article):
+    """
+    Fill the rendered fields of ``article`` (not saved) unless they are
+    current. Returns True when they were (re)rendered.
+    """
+    if not get_setting("ENABLED"):
+        return False
+    key = render_key(article.content)
+    if article.rendered_hash == key:
+        return False
+    for field, value in render(article.content).items():
+        setattr(article, field, value)
+    article.rendered_hash = key
+    return True
+
+
+def rerender(queryset, batch_size=500, force=False):
+    """
+    Re-render the stale articles of ``queryset`` (every one with ``force``),
+    bulk-updating batch_size rows at a time; returns (checked, rendered).
+    Rows whose rendered_hash is current are only hashed, not rendered.
+    """
+    checked, rendered, batch = 0, 0, []
+    articles = queryset.only("id", "content", "rendered_hash").order_by("id").iterator(chunk_size=batch_size)
+    for article in articles:
+        checked += 1
+        if force:
+            article.rendered_hash = ""
+        if render_article(article):
+            batch.append(article)
+        if len(batch) == batch_size:
+            rendered += store_batch(queryset.model, batch)
+            batch = []
+    if batch:
+        rendered += store_batch(queryset.model, batch)
+    return checked, rendered
+
+
+def store_batch(model, articles):
+    model.objects.bulk_update(articles, RENDERED_FIELDS)
+    response_cache.article_changed(*[article.pk for article in articles])
+    return len(articles)
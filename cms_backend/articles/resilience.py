@@ -0,0 +1,347 @@
+# articles/resilience.py
+"""
+Resilience layer around every Gemini call.
+
+``ResilientCaller.call`` / ``acall`` run one call with:
+- a per-attempt timeout (passed to the SDK as its HTTP timeout) and an
+  overall deadline covering every retry;
+- exponential backoff with full jitter on retryable errors (timeouts,
+  connection errors, HTTP 408/429/5xx);
+- a circuit breaker that opens after FAILURE_THRESHOLD consecutive
+  retryable failures and fails fast with CircuitOpen for RESET_TIMEOUT
+  seconds, then lets a single trial call through (half-open). Errors
+  Gemini answered with (e.g. 400) count as proof it is up; errors raised
+  before any answer (bugs, bad arguments) count as neither.
+
+``hedge`` / ``ahedge`` run a primary call and a fallback. With HEDGE_ENABLED
+the fallback starts as soon as the primary has been running for
+HEDGE_DELAY seconds and the first non-empty answer wins; otherwise the
+fallback only runs after the primary returned nothing. Every branch that
+ran but whose answer was not used is reported to ``on_lost``, so its spend
+can be billed.
+
+The clock, sleep functions and jitter source are injectable, so the layer
+can be exercised offline with articles.fake_gemini and a fake clock.
+"""
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import lru_cache
+
+import httpx
+from django.conf import settings
+
+
+DEFAULTS = {
+    "TIMEOUT": 30.0,
+    "DEADLINE": 60.0,
+    "MAX_RETRIES": 2,
+    "BACKOFF_BASE": 0.5,
+    "BACKOFF_MAX": 8.0,
+    "FAILURE_THRESHOLD": 5,
+    "RESET_TIMEOUT": 30.0,
+    "HEDGE_ENABLED": False,
+    "HEDGE_DELAY": 2.0,
+    "MAX_WORKERS": 32,
+}
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+def get_setting(name):
+    return getattr(settings, "AI_RESILIENCE", {}).get(name, DEFAULTS[name])
+
+
+class AIUnavailable(Exception):
+    """Gemini could not be reached in time; ``retry_after`` (seconds) may be set."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AITimeout(AIUnavailable):
+    pass
+
+
+class CircuitOpen(AIUnavailable):
+    pass
+
+
+def answered(error):
+    """
+    True when ``error`` carries an HTTP status, i.e. Gemini itself replied.
+    """
+    return getattr(error, "code", None) is not None
+
+
+def is_retryable(error):
+    if isinstance(error, CircuitOpen):
+        return False
+    # timeouts and connection failures, including httpx's below the SDK
+    if isinstance(error, (AITimeout, TimeoutError, ConnectionError, httpx.TransportError)):
+        return True
+    # google.genai.errors.APIError (and the fake client's errors) carry the HTTP status
+    return getattr(error, "code", None) in RETRYABLE_STATUS
+
+
+# ----------------- CIRCUIT BREAKER -----------------
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold, reset_timeout, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    def before_call(self):
+        """
+        Raise CircuitOpen unless a call may go out now.
+        """
+        with self.lock:
+            if self.state == self.CLOSED:
+                return
+            remaining = self.opened_at + self.reset_timeout - self.clock()
+            if self.state == self.OPEN and remaining > 0:
+                raise CircuitOpen("Gemini is unavailable (circuit open)", retry_after=remaining)
+            if self.trial_in_flight:
+                raise CircuitOpen("Gemini is unavailable (circuit half-open)", retry_after=1.0)
+            self.state = self.HALF_OPEN
+            self.trial_in_flight = True
+
+    def record_success(self):
+        with self.lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self.trial_in_flight = False
+
+    def release(self):
+        """
+        End a call without a verdict (it never reached Gemini), freeing the
+        half-open trial slot for the next call.
+        """
+        with self.lock:
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = self.clock()
+
+
+# ----------------- CALLER -----------------
+class ResilientCaller:
+    def __init__(self, clock=time.monotonic, sleep=time.sleep, asleep=asyncio.sleep, rng=random.random, options=None):
+        self.options = options or {}
+        self.clock = clock
+        self.sleep = sleep
+        self.asleep = asleep
+        self.rng = rng
+        self.breaker = CircuitBreaker(self.option("FAILURE_THRESHOLD"), self.option("RESET_TIMEOUT"), clock=clock)
+        # only used to run the two branches of a hedged call side by side
+        self.pool = ThreadPoolExecutor(max_workers=self.option("MAX_WORKERS"), thread_name_prefix="gemini-hedge")
+
+    def option(self, name):
+        return self.options.get(name, get_setting(name))
+
+    def backoff(self, attempt):
+        ceiling = min(self.option("BACKOFF_MAX"), self.option("BACKOFF_BASE") * (2 ** (attempt - 1)))
+        return self.rng() * ceiling
+
+    def attempt_timeout(self, deadline):
+        """
+        Seconds the next attempt may take. Raises AITimeout once the deadline
+        has passed; no request goes out then, so the breaker is not involved.
+        """
+        timeout = min(self.option("TIMEOUT"), deadline - self.clock())
+        if timeout <= 0:
+            raise AITimeout("Gemini call deadline exceeded")
+        return timeout
+
+    def next_attempt(self, error, attempt, deadline):
+        """
+        Record a failed attempt; return the delay before the next one or re-raise.
+        """
+        if not is_retryable(error):
+            if answered(error):
+                # Gemini answered (e.g. 400): it is up, so this is not a breaker failure
+                self.breaker.record_success()
+            else:
+                # raised locally, before or instead of a call: says nothing about Gemini
+                self.breaker.release()
+            raise error
+        self.breaker.record_failure()
+        delay = self.backoff(attempt)
+        if attempt > self.option("MAX_RETRIES") or self.clock() + delay >= deadline:
+            if isinstance(error, AIUnavailable):
+                raise error
+            raise AIUnavailable(f"Gemini unavailable after {attempt} attempt(s): {error}") from error
+        return delay
+
+    def call(self, fn):
+        """
+        Run ``fn(timeout)``, a blocking Gemini call returning text, with the
+        retry and breaker policy. ``fn`` must hand ``timeout`` (seconds) to the
+        SDK as its HTTP timeout, which raises once it passes.
+        """
+        deadline = self.clock() + self.option("DEADLINE")
+        attempt = 0
+        while True:
+            attempt += 1
+            timeout = self.attempt_timeout(deadline)
+            self.breaker.before_call()
+            try:
+                result = fn(timeout)
+            except Exception as e:
+                self.sleep(self.next_attempt(e, attempt, deadline))
+                continue
+            self.breaker.record_success()
+            return result
+
+    async def acall(self, fn):
+        """
+        Async twin of ``call``; ``fn(timeout)`` returns a coroutine, which is
+        also cancelled with asyncio.wait_for once ``timeout`` passes.
+        """
+        deadline = self.clock() + self.option("DEADLINE")
+        attempt = 0
+        while True:
+            attempt += 1
+            timeout = self.attempt_timeout(deadline)
+            self.breaker.before_call()
+            try:
+                result = await asyncio.wait_for(fn(timeout), timeout)
+            except asyncio.TimeoutError:
+                error = AITimeout(f"Gemini call timed out after {timeout:.1f}s")
+                await self.asleep(self.next_attempt(error, attempt, deadline))
+                continue
+            except Exception as e:
+                await self.asleep(self.next_attempt(e, attempt, deadline))
+                continue
+            self.breaker.record_success()
+            return result
+
+    def guard_stream(self, chunks):
+        """
+        Pass a streaming response through the breaker. Streams are not retried:
+        part of the answer may already have been sent to the client.
+        """
+        self.breaker.before_call()
+        outcome = self.breaker.record_success
+        try:
+            yield from chunks
+        except Exception as e:
+            if is_retryable(e):
+                outcome = self.breaker.record_failure
+            elif not answered(e):
+                outcome = self.breaker.release
+            raise
+        finally:
+            # also runs when the client disconnects mid-stream (GeneratorExit)
+            outcome()
+
+    # ---------------- hedging ----------------
+    def hedge(self, primary, fallback, on_lost=None):
+        """
+        Return the first non-empty result of ``primary()`` / ``fallback()``.
+        ``on_lost(name)`` is called with "primary" / "fallback" for each branch
+        that went upstream but whose answer was empty or not used (one still
+        running when the other wins is reported too); failed branches are not.
+        """
+        on_lost = on_lost or (lambda name: None)
+        if not self.option("HEDGE_ENABLED"):
+            result = primary()
+            if result:
+                return result
+            on_lost("primary")
+            return fallback()
+
+        first = self.pool.submit(primary)
+        done, _ = wait([first], timeout=self.option("HEDGE_DELAY"))
+        if done:
+            if first.exception() is None and first.result():
+                return first.result()
+            if first.exception() is None:
+                on_lost("primary")
+            return fallback()
+
+        second = self.pool.submit(fallback)
+        names = {first: "primary", second: "fallback"}
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                elif future.result():
+                    for loser in pending:
+                        on_lost(names[loser])
+                    return future.result()
+                else:
+                    on_lost(names[future])
+        if error is not None:
+            raise error
+        return ""
+
+    async def ahedge(self, primary, fallback, on_lost=None):
+        """
+        Async twin of ``hedge``; both arguments are coroutine functions. A
+        losing branch still running is cancelled (and reported to ``on_lost``).
+        """
+        on_lost = on_lost or (lambda name: None)
+        if not self.option("HEDGE_ENABLED"):
+            result = await primary()
+            if result:
+                return result
+            on_lost("primary")
+            return await fallback()
+
+        first = asyncio.ensure_future(primary())
+        done, _ = await asyncio.wait([first], timeout=self.option("HEDGE_DELAY"))
+        if done:
+            if first.exception() is None and first.result():
+                return first.result()
+            if first.exception() is None:
+                on_lost("primary")
+            return await fallback()
+
+        second = asyncio.ensure_future(fallback())
+        names = {first: "primary", second: "fallback"}
+        pending = {first, second}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                    elif task.result():
+                        for loser in pending:
+                            on_lost(names[loser])
+                        return task.result()
+                    else:
+                        on_lost(names[task])
+        finally:
+            for task in pending:
+                task.cancel()
+        if error is not None:
+            raise error
+        return ""
+
+
+@lru_cache(maxsize=None)
+def get_caller():
+    return ResilientCaller()
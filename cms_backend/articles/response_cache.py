@@ -0,0 +1,194 @@
+# articles/response_cache.py
+"""
+Server-side cache of anonymous article list / detail responses.
+
+Entries live in a Django cache (locmem, file or Redis) and record the
+generation counters they were built from:
+- one version per article, bumped whenever that article is written;
+- one list generation, bumped when an article is created or deleted, or
+  its tags change (``?tag=`` is the only list filter, and the ordering
+  fields never change).
+A hit re-reads those counters with a single get_many and is served only if
+none moved, so invalidation is a counter bump and nothing is ever scanned.
+Detail entries depend on their article; list entries on the list
+generation and every article on the page.
+
+Counters start at a nanosecond timestamp rather than 0, so an evicted
+counter can never come back at a value an old entry still matches.
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from .conditional import variant
+from .metrics import record_cache_lookup
+
+
+DEFAULTS = {
+    "ENABLED": True,
+    "CACHE_ALIAS": "default",
+    "TIMEOUT": 300,
+    "KEY_PREFIX": "article-response",
+}
+
+STORED_HEADERS = ("ETag", "Last-Modified", "Cache-Control", "Vary")
+
+_stats = {"hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+
+
+def get_setting(name):
+    return getattr(settings, "ARTICLE_RESPONSE_CACHE", {}).get(name, DEFAULTS[name])
+
+
+def get_cache():
+    return caches[get_setting("CACHE_ALIAS")]
+
+
+def make_key(*parts):
+    return ":".join([get_setting("KEY_PREFIX"), *map(str, parts)])
+
+
+def list_generation_key():
+    return make_key("gen", "list")
+
+
+def article_version_key(pk):
+    return make_key("gen", "article", pk)
+
+
+# ----------------- GENERATIONS -----------------
+def current_versions(keys):
+    """
+    Read the counters for ``keys``, creating any that are missing.
+    """
+    cache = get_cache()
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    for key in missing:
+        cache.add(key, time.time_ns(), timeout=None)
+    if missing:
+        found.update(cache.get_many(missing))
+    return found
+
+
+def bump(*keys):
+    cache = get_cache()
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+
+
+def article_changed(*pks, created=False, deleted=False, relisted=False):
+    """
+    Invalidate cached responses showing these articles once the write commits.
+    ``relisted`` means the write changed which lists the articles belong to.
+    """
+    if not get_setting("ENABLED"):
+        return
+    keys = [article_version_key(pk) for pk in pks]
+    if created or deleted or relisted:
+        keys.append(list_generation_key())
+    transaction.on_commit(lambda: bump(*keys))
+
+
+# ----------------- STATS -----------------
+def record(hit):
+    with _stats_lock:
+        _stats["hits" if hit else "misses"] += 1
+    record_cache_lookup("article_response", hit)
+
+
+def stats():
+    """
+    Hit / miss counts for this process since start (or the last reset).
+    """
+    with _stats_lock:
+        hits, misses = _stats["hits"], _stats["misses"]
+    total = hits + misses
+    return {"hits": hits, "misses": misses, "hit_rate": round(hits / total, 4) if total else 0.0}
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats["hits"] = _stats["misses"] = 0
+
+
+# ----------------- LOOKUP / STORE -----------------
+def is_cacheable(request):
+    return (
+        get_setting("ENABLED")
+        and request.method in ("GET", "HEAD")
+        and "HTTP_AUTHORIZATION" not in request.META
+        and not request.user.is_authenticated
+    )
+
+
+def lookup(request, pk=None):
+    """
+    Return (response, pending). ``response`` is the cached response (or a 304)
+    on a hit. On a miss it is None and ``pending`` carries what ``store`` needs;
+    the counters in it are read now, before the database is queried.
+    """
+    if not is_cacheable(request):
+        return None, None
+    if pk is not None:
+        try:
+            pk = int(pk)
+        except ValueError:
+            return None, None
+    digest = hashlib.sha1(variant(request).encode("utf-8")).hexdigest()
+    if pk is None:
+        cache_key, deps = make_key("list", digest), [list_generation_key()]
+    else:
+        cache_key, deps = make_key("detail", pk, digest), [article_version_key(pk)]
+
+    entry = get_cache().get(cache_key)
+    if entry is not None and get_cache().get_many(list(entry["deps"])) == entry["deps"]:
+        record(True)
+        return build_response(request, entry), None
+    record(False)
+    return None, (cache_key, current_versions(deps))
+
+
+def build_response(request, entry):
+    headers = entry["headers"]
+    response = get_conditional_response(
+        request,
+        etag=headers.get("ETag"),
+        last_modified=parse_http_date_safe(headers.get("Last-Modified", "")),
+    )
+    if response is None:
+        response = HttpResponse(entry["content"], content_type=entry["content_type"])
+    for name, value in headers.items():
+        response[name] = value
+    response["X-Cache"] = "HIT"
+    return response
+
+
+def store(response, pending, page_pks=()):
+    """
+    Cache a rendered 200 response under the counters read at lookup time plus
+    the versions of the articles on a list page.
+    """
+    cache_key, deps = pending
+    if page_pks:
+        deps = {**deps, **current_versions([article_version_key(pk) for pk in page_pks])}
+    response.render()
+    entry = {
+        "content": response.content,
+        "content_type": response["Content-Type"],
+        "headers": {name: response[name] for name in STORED_HEADERS if response.has_header(name)},
+        "deps": deps,
+    }
+    get_cache().set(cache_key, entry, get_setting("TIMEOUT"))
+    response["X-Cache"] = "MISS"
@@ -0,0 +1,244 @@
+# articles/search.py
+"""
+Full-text search over articles.
+
+SQLite: an FTS5 virtual table (porter stemming) kept in sync from the
+Article save/delete signals, ranked with bm25().
+Postgres: a GIN index on to_tsvector('english', ...) of the same columns;
+the database maintains it, ranked with ts_rank_cd().
+
+Both backends return results ordered by (score DESC, id ASC) and page with
+a keyset cursor on that pair, so deep pages never use OFFSET. Other database
+vendors get an unranked icontains scan (every word must appear in the title,
+content or tags; score 0, id order) through the same cursor.
+"""
+import base64
+import json
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.utils.html import escape
+
+from .models import Article
+
+FTS_TABLE = "articles_article_fts"
+PG_INDEX = "article_search_idx"
+PG_DOCUMENT = (
+    "to_tsvector('english', coalesce(a.title, '') || ' ' || coalesce(a.tags, '') || ' ' || a.content)"
+)
+
+# bm25 column weights: title, content, tags
+BM25_WEIGHTS = (10.0, 1.0, 5.0)
+
+# characters of content around the first match in fallback snippets
+FALLBACK_SNIPPET_CHARS = 200
+
+# Matches are delimited with control characters inside the database and only
+# turned into <mark> tags after the surrounding text has been HTML-escaped.
+HIGHLIGHT_START = "\x02"
+HIGHLIGHT_END = "\x03"
+
+
+def is_sqlite():
+    return connection.vendor == "sqlite"
+
+
+def is_postgres():
+    return connection.vendor == "postgresql"
+
+
+# ----------------- SCHEMA -----------------
+def create_index(schema_editor=None):
+    conn = schema_editor.connection if schema_editor else connection
+    with conn.cursor() as cursor:
+        if conn.vendor == "sqlite":
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                "title, content, tags, tokenize='porter unicode61 remove_diacritics 2')"
+            )
+        elif conn.vendor == "postgresql":
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {PG_INDEX} ON articles_article "
+                f"USING GIN ({PG_DOCUMENT.replace('a.', '')})"
+            )
+
+
+def drop_index(schema_editor=None):
+    conn = schema_editor.connection if schema_editor else connection
+    with conn.cursor() as cursor:
+        if conn.vendor == "sqlite":
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        elif conn.vendor == "postgresql":
+            cursor.execute(f"DROP INDEX IF EXISTS {PG_INDEX}")
+
+
+# ----------------- INCREMENTAL UPDATES -----------------
+def index_article(article):
+    """
+    Upsert one article into the FTS table. No-op on Postgres, where the GIN
+    expression index is updated by the database itself.
+    """
+    if not is_sqlite():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [article.pk])
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}(rowid, title, content, tags) VALUES (%s, %s, %s, %s)",
+            [article.pk, article.title or "", article.content or "", article.tags or ""],
+        )
+
+
+def remove_article(pk):
+    if not is_sqlite():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [pk])
+
+
+def rebuild_index():
+    """
+    Re-populate the index from the articles table and return the row count.
+    """
+    with connection.cursor() as cursor:
+        if is_sqlite():
+            create_index()
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}(rowid, title, content, tags) "
+                "SELECT id, coalesce(title, ''), coalesce(content, ''), coalesce(tags, '') FROM articles_article"
+            )
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+        elif is_postgres():
+            create_index()
+            cursor.execute(f"REINDEX INDEX {PG_INDEX}")
+        cursor.execute("SELECT count(*) FROM articles_article")
+        return cursor.fetchone()[0]
+
+
+# ----------------- QUERY -----------------
+def fts5_query(q):
+    """
+    Turn free text into a safe FTS5 MATCH expression: every word is quoted
+    (so user input can't inject FTS syntax) and the last one is a prefix match.
+    """
+    words = re.findall(r"\w+", q)
+    if not words:
+        return ""
+    terms = [f'"{w}"' for w in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def encode_cursor(score, pk):
+    raw = json.dumps({"s": score, "i": pk}).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor):
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return float(data["s"]), int(data["i"])
+    except (ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def render_highlight(text):
+    return escape(text or "").replace(HIGHLIGHT_START, "<mark>").replace(HIGHLIGHT_END, "</mark>")
+
+
+def search(q, limit=20, cursor=None):
+    """
+    Return (hits, next_cursor). Each hit is a dict with id, score and
+    HTML-escaped title_highlight / snippet with matches wrapped in <mark>;
+    hits are ordered by score desc then id.
+    """
+    after = decode_cursor(cursor) if cursor else None
+    if is_sqlite():
+        rows = _search_sqlite(q, limit + 1, after)
+    elif is_postgres():
+        rows = _search_postgres(q, limit + 1, after)
+    else:
+        rows = _search_fallback(q, limit + 1, after)
+
+    hits = [
+        {"id": pk, "score": score, "title_highlight": render_highlight(title_hl), "snippet": render_highlight(snippet)}
+        for pk, score, title_hl, snippet in rows[:limit]
+    ]
+    next_cursor = None
+    if len(rows) > limit:
+        last = hits[-1]
+        next_cursor = encode_cursor(last["score"], last["id"])
+    return hits, next_cursor
+
+
+def _search_sqlite(q, limit, after):
+    match = fts5_query(q)
+    if not match:
+        return []
+    weights = ", ".join(str(w) for w in BM25_WEIGHTS)
+    # bm25() is lower-is-better; negate it so both backends sort score DESC
+    score = f"-bm25({FTS_TABLE}, {weights})"
+    sql = (
+        f"SELECT rowid, {score} AS score, "
+        f"highlight({FTS_TABLE}, 0, %s, %s), "
+        f"snippet({FTS_TABLE}, 1, %s, %s, '...', 24) "
+        f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s"
+    )
+    params = [HIGHLIGHT_START, HIGHLIGHT_END, HIGHLIGHT_START, HIGHLIGHT_END, match]
+    if after:
+        sql += f" AND ({score} < %s OR ({score} = %s AND rowid > %s))"
+        params += [after[0], after[0], after[1]]
+    sql += " ORDER BY score DESC, rowid ASC LIMIT %s"
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _search_postgres(q, limit, after):
+    if not q.strip():
+        return []
+    options = f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, MaxFragments=1, MaxWords=35, MinWords=15"
+    sql = (
+        "SELECT id, score, "
+        "ts_headline('english', title, query, %s), "
+        "ts_headline('english', content, query, %s) "
+        "FROM ("
+        f"  SELECT a.id, a.title, a.content, query, ts_rank_cd({PG_DOCUMENT}, query)::float8 AS score"
+        "  FROM articles_article a, websearch_to_tsquery('english', %s) query"
+        f"  WHERE {PG_DOCUMENT} @@ query"
+        ") hits"
+    )
+    params = ["HighlightAll=true, " + options, options, q]
+    if after:
+        sql += " WHERE (score < %s OR (score = %s AND id > %s))"
+        params += [after[0], after[0], after[1]]
+    sql += " ORDER BY score DESC, id ASC LIMIT %s"
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def _search_fallback(q, limit, after):
+    words = re.findall(r"\w+", q)
+    if not words:
+        return []
+    queryset = Article.objects.all()
+    for word in words:
+        queryset = queryset.filter(Q(title__icontains=word) | Q(content__icontains=word) | Q(tags__icontains=word))
+    if after:
+        queryset = queryset.filter(id__gt=after[1])
+    pattern = re.compile("|".join(re.escape(word) for word in words), re.I)
+
+    def mark(text):
+        return pattern.sub(lambda m: f"{HIGHLIGHT_START}{m.group(0)}{HIGHLIGHT_END}", text)
+
+    rows = []
+    for pk, title, content in queryset.order_by("id").values_list("id", "title", "content")[:limit]:
+        match = pattern.search(content or "")
+        start = max(match.start() - FALLBACK_SNIPPET_CHARS // 2, 0) if match else 0
+        snippet = (content or "")[start:start + FALLBACK_SNIPPET_CHARS]
+        rows.append((pk, 0.0, mark(title or ""), ("..." if start else "") + mark(snippet)))
+    return rows
@@ -1,6 +1,10 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Article, AIUsage
+from .models import Article, AIUsage, AIJob, Tag
+from .jobs import CLIENT_FEATURES, submit_job
+
+# Characters of content shown in list responses
+EXCERPT_LENGTH = 300
 
 
 class UserRegisterSerializer(serializers.ModelSerializer):
@@ -18,16 +22,91 @@ class UserRegisterSerializer(serializers.ModelSerializer):
         )
 
 
-class ArticleSerializer(serializers.ModelSerializer):
+def wants_html(request):
+    renderer = getattr(request, 'accepted_renderer', None)
+    return getattr(renderer, 'format', None) == 'html'
+
+
+class SparseFieldsMixin:
+    """
+    Drop every field not listed in ``?fields=a,b,c`` (unknown names are ignored).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method != 'GET':
+            return
+        requested = request.query_params.get('fields')
+        if not requested:
+            return
+        allowed = {name.strip() for name in requested.split(',') if name.strip()}
+        for name in set(self.fields) - allowed:
+            self.fields.pop(name)
+
+
+class ArticleSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    ``content`` is the markdown, or with ``?format=html`` the HTML rendered
+    and sanitized when the article was saved; ``toc`` and ``reading_time``
+    are stored alongside it. Nothing is rendered here: rows not yet
+    backfilled by `manage.py render_articles` serve empty rendered fields.
+    """
+    author = serializers.StringRelatedField(read_only=True)
+    toc = serializers.JSONField(source='content_toc', read_only=True)
+
+    class Meta:
+        model = Article
+        fields = [
+            'id', 'title', 'content', 'tags', 'summary', 'summary_published', 'sentiment',
+            'toc', 'reading_time', 'author', 'created_at', 'updated_at'
+        ]
+        read_only_fields = ['reading_time']
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if 'content' in data and wants_html(self.context.get('request')):
+            data['content'] = instance.content_html
+        return data
+
+    def validate(self, attrs):
+        # a summary written through the API is the author's own, so show it
+        if attrs.get('summary') and 'summary_published' not in attrs:
+            attrs['summary_published'] = True
+        return attrs
+
+
+class ArticleListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    Lightweight list projection: full ``content`` is deferred and replaced by
+    an ``excerpt`` annotated in SQL (see ArticleViewSet.get_queryset).
+    """
     author = serializers.StringRelatedField(read_only=True)
+    excerpt = serializers.SerializerMethodField()
+    summary = serializers.SerializerMethodField()
 
     class Meta:
         model = Article
         fields = [
-            'id', 'title', 'content', 'tags', 'summary',
+            'id', 'title', 'excerpt', 'tags', 'summary', 'reading_time',
             'author', 'created_at', 'updated_at'
         ]
 
+    def get_summary(self, obj):
+        return obj.summary if obj.summary_published else None
+
+    def get_excerpt(self, obj):
+        text = getattr(obj, 'excerpt', '') or ''
+        if len(text) > EXCERPT_LENGTH:
+            return text[:EXCERPT_LENGTH] + '...'
+        return text
+
+
+class TagSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Tag
+        fields = ['name', 'slug', 'article_count']
+
 
 class AIUsageSerializer(serializers.ModelSerializer):
     article_title = serializers.SerializerMethodField()
@@ -36,8 +115,47 @@ class AIUsageSerializer(serializers.ModelSerializer):
         model = AIUsage
         fields = [
             'id', 'article_title', 'feature',
-            'tokens_used', 'estimated_cost', 'created_at'
+            'tokens_used', 'estimated_cost', 'cached', 'coalesced', 'local', 'created_at'
         ]
 
     def get_article_title(self, obj):
         return obj.article.title if obj.article else "N/A"
+
+
+class AIJobSerializer(serializers.ModelSerializer):
+    article = serializers.PrimaryKeyRelatedField(
+        queryset=Article.objects.all(), required=False, allow_null=True
+    )
+    feature = serializers.ChoiceField(choices=CLIENT_FEATURES)
+    topic = serializers.CharField(write_only=True, required=False, allow_blank=True)
+
+    class Meta:
+        model = AIJob
+        fields = [
+            'id', 'feature', 'article', 'topic', 'status', 'attempts',
+            'max_attempts', 'error', 'created_at', 'finished_at'
+        ]
+        read_only_fields = ['status', 'attempts', 'max_attempts', 'error', 'created_at', 'finished_at']
+
+    def validate(self, attrs):
+        if attrs['feature'] == 'generate':
+            if not attrs.get('topic', '').strip():
+                raise serializers.ValidationError({'topic': 'Topic is required'})
+        else:
+            article = attrs.get('article')
+            if article is None:
+                raise serializers.ValidationError({'article': 'Article is required'})
+            if not (article.content or '').strip():
+                raise serializers.ValidationError({'article': 'Article content is empty'})
+        return attrs
+
+    def create(self, validated_data):
+        params = {}
+        if validated_data['feature'] == 'generate':
+            params['topic'] = validated_data['topic'].strip()
+        return submit_job(
+            user=validated_data['user'],
+            feature=validated_data['feature'],
+            article=validated_data.get('article'),
+            params=params,
+        )
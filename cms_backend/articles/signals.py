@@ -0,0 +1,86 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import analysis, dedup, keywords, related, response_cache, search, tagging
+from .models import Article
+
+
+@receiver(post_save, sender=Article)
+def index_saved_article(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    search.index_article(instance)
+
+
+@receiver(post_delete, sender=Article)
+def unindex_deleted_article(sender, instance, **kwargs):
+    search.remove_article(instance.pk)
+
+
+@receiver(post_save, sender=Article)
+def fingerprint_saved_article(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    dedup.index_article(instance)
+
+
+@receiver(post_save, sender=Article)
+def count_saved_article_keywords(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    keywords.index_article(instance)
+
+
+@receiver(pre_delete, sender=Article)
+def release_deleted_article_keywords(sender, instance, **kwargs):
+    keywords.release_article(instance.pk)
+
+
+@receiver(post_save, sender=Article)
+def sync_saved_article_tags(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if tagging.sync_article_tags(instance):
+        # cached ?tag= lists may now gain or lose this article
+        response_cache.article_changed(instance.pk, relisted=True)
+
+
+@receiver(pre_delete, sender=Article)
+def release_deleted_article_tags(sender, instance, **kwargs):
+    tagging.release_article_tags(instance)
+
+
+@receiver(post_save, sender=Article)
+def queue_saved_article_analysis(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    analysis.queue_analysis(instance)
+
+
+@receiver(post_save, sender=Article)
+def invalidate_saved_article_responses(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    response_cache.article_changed(instance.pk, created=created)
+
+
+@receiver(post_delete, sender=Article)
+def invalidate_deleted_article_responses(sender, instance, **kwargs):
+    response_cache.article_changed(instance.pk, deleted=True)
+
+
+@receiver(post_save, sender=Article)
+def index_saved_article_vector(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if update_fields is not None and not {"title", "content", "tags"} & set(update_fields):
+        return
+    # the index lives outside the database, so only record committed saves
+    transaction.on_commit(lambda: related.index_article(instance))
+
+
+@receiver(post_delete, sender=Article)
+def unindex_deleted_article_vector(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: related.remove_article(pk))
@@ -0,0 +1,225 @@
+# articles/singleflight.py
+"""
+Single-flight coalescing of identical in-flight Gemini calls.
+
+Calls are keyed by the result-cache key (feature, model, prompt version,
+config, input hash). While one call for a key is running, identical calls
+in the same process wait for it and share its result (or its error)
+instead of going upstream again; sync and async callers share the same
+in-flight call.
+
+With DISTRIBUTED, the in-process leader also takes a short lock in a
+shared Django cache (CACHE_ALIAS: Redis or a file cache, not locmem), so
+leaders in other worker processes poll for its result instead of calling
+Gemini themselves. If the lock holder finishes without a result, or holds
+the lock past LOCK_TIMEOUT, waiters make the call on their own.
+
+``coalesced_call`` / ``acoalesced_call`` return (result, coalesced);
+callers still record a usage row for a coalesced call, marked coalesced
+and with no upstream spend.
+"""
+import asyncio
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+DEFAULTS = {
+    "ENABLED": True,
+    "DISTRIBUTED": False,
+    "CACHE_ALIAS": "default",
+    "KEY_PREFIX": "ai-flight",
+    "LOCK_TIMEOUT": 90,
+    "POLL_INTERVAL": 0.1,
+    "RESULT_TTL": 30,
+}
+
+
+def get_setting(name):
+    return getattr(settings, "AI_SINGLE_FLIGHT", {}).get(name, DEFAULTS[name])
+
+
+class LeaderCancelled(Exception):
+    """The call being waited on was cancelled before it finished."""
+
+
+# ----------------- IN-PROCESS -----------------
+class SingleFlight:
+    def __init__(self):
+        self.calls = {}  # key -> concurrent.futures.Future of the running call
+        self.lock = threading.Lock()
+
+    def claim(self, key):
+        """
+        Return (future, leader): a new future if this caller leads the call for
+        ``key``, else the future of the call already running.
+        """
+        with self.lock:
+            future = self.calls.get(key)
+            if future is not None:
+                return future, False
+            future = self.calls[key] = Future()
+            return future, True
+
+    def release(self, key, future, result=None, error=None):
+        with self.lock:
+            if self.calls.get(key) is future:
+                del self.calls[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def run(self, key, fn):
+        future, leader = self.claim(key)
+        if not leader:
+            try:
+                return future.result(), True
+            except LeaderCancelled:
+                return fn(), False
+        try:
+            result = fn()
+        except BaseException as e:
+            self.release(key, future, error=e if isinstance(e, Exception) else LeaderCancelled())
+            raise
+        self.release(key, future, result=result)
+        return result, False
+
+    async def arun(self, key, fn):
+        future, leader = self.claim(key)
+        if not leader:
+            try:
+                # wrap_future also works when the leader runs in another thread / event loop
+                return await asyncio.wrap_future(future), True
+            except LeaderCancelled:
+                return await fn(), False
+        try:
+            result = await fn()
+        except BaseException as e:
+            # e.g. CancelledError when the leader's client disconnects
+            self.release(key, future, error=e if isinstance(e, Exception) else LeaderCancelled())
+            raise
+        self.release(key, future, result=result)
+        return result, False
+
+
+# ----------------- CROSS-PROCESS (cache lock) -----------------
+def flight_keys(key):
+    prefix = get_setting("KEY_PREFIX")
+    return f"{prefix}:lock:{key}", f"{prefix}:result:{key}"
+
+
+def locked_call(key, fn):
+    """
+    Run ``fn`` under the shared cache lock for ``key``, or wait for the
+    process holding it. Returns (result, coalesced).
+    """
+    cache = caches[get_setting("CACHE_ALIAS")]
+    lock_key, result_key = flight_keys(key)
+    token = uuid.uuid4().hex
+    if cache.add(lock_key, token, timeout=get_setting("LOCK_TIMEOUT")):
+        try:
+            result = fn()
+            if result:
+                cache.set(f"{result_key}:{token}", result, get_setting("RESULT_TTL"))
+            return result, False
+        finally:
+            if cache.get(lock_key) == token:
+                cache.delete(lock_key)
+
+    deadline = time.monotonic() + get_setting("LOCK_TIMEOUT")
+    holder = cache.get(lock_key)
+    while holder is not None and time.monotonic() < deadline:
+        time.sleep(get_setting("POLL_INTERVAL"))
+        result = cache.get(f"{result_key}:{holder}")
+        if result:
+            return result, True
+        if cache.get(lock_key) != holder:
+            # released: any result was stored before the lock was dropped
+            result = cache.get(f"{result_key}:{holder}")
+            if result:
+                return result, True
+            break
+    return fn(), False
+
+
+async def alocked_call(key, fn):
+    """
+    Async twin of ``locked_call``; ``fn`` is a coroutine function.
+    """
+    cache = caches[get_setting("CACHE_ALIAS")]
+    lock_key, result_key = flight_keys(key)
+    token = uuid.uuid4().hex
+    if await cache.aadd(lock_key, token, timeout=get_setting("LOCK_TIMEOUT")):
+        try:
+            result = await fn()
+            if result:
+                await cache.aset(f"{result_key}:{token}", result, get_setting("RESULT_TTL"))
+            return result, False
+        finally:
+            if await cache.aget(lock_key) == token:
+                await cache.adelete(lock_key)
+
+    deadline = time.monotonic() + get_setting("LOCK_TIMEOUT")
+    holder = await cache.aget(lock_key)
+    while holder is not None and time.monotonic() < deadline:
+        await asyncio.sleep(get_setting("POLL_INTERVAL"))
+        result = await cache.aget(f"{result_key}:{holder}")
+        if result:
+            return result, True
+        if await cache.aget(lock_key) != holder:
+            result = await cache.aget(f"{result_key}:{holder}")
+            if result:
+                return result, True
+            break
+    return await fn(), False
+
+
+# ----------------- ENTRY POINTS -----------------
+@lru_cache(maxsize=None)
+def get_single_flight():
+    return SingleFlight()
+
+
+def coalesced_call(key, fn):
+    """
+    Return (fn(), False), or (result, True) when an identical call already in
+    flight produced the result.
+    """
+    if not get_setting("ENABLED"):
+        return fn(), False
+    if not get_setting("DISTRIBUTED"):
+        return get_single_flight().run(key, fn)
+
+    shared = {}
+
+    def leader():
+        result, shared["coalesced"] = locked_call(key, fn)
+        return result
+
+    result, coalesced = get_single_flight().run(key, leader)
+    return result, coalesced or shared.get("coalesced", False)
+
+
+async def acoalesced_call(key, fn):
+    """
+    Async twin of ``coalesced_call``; ``fn`` is a coroutine function.
+    """
+    if not get_setting("ENABLED"):
+        return await fn(), False
+    if not get_setting("DISTRIBUTED"):
+        return await get_single_flight().arun(key, fn)
+
+    shared = {}
+
+    async def leader():
+        result, shared["coalesced"] = await alocked_call(key, fn)
+        return result
+
+    result, coalesced = await get_single_flight().arun(key, leader)
+    return result, coalesced or shared.get("coalesced", False)
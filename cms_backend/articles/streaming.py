@@ -0,0 +1,49 @@
+# articles/streaming.py
+"""
+Streaming responses that flush per chunk under both WSGI and ASGI.
+
+Under ASGI, Django drains a sync iterator with ``sync_to_async(list)`` before
+sending anything, so SSE / NDJSON bodies would arrive in one piece once the
+work is done. ``streaming_response`` hands ASGI servers an async iterator
+instead, which steps the sync generator one chunk at a time in the request's
+worker thread (the one its DB connection lives on). WSGI keeps the plain
+generator.
+"""
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+
+_DONE = object()
+
+
+async def aiterate(iterator):
+    """
+    Async iterator over a sync one, pulling each item in a worker thread.
+    Closing it (client disconnect) closes the sync generator too, so its
+    GeneratorExit handling still runs.
+    """
+    step = sync_to_async(next)
+    try:
+        while True:
+            item = await step(iterator, _DONE)
+            if item is _DONE:
+                return
+            yield item
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            await sync_to_async(close)()
+
+
+def streaming_response(request, iterator, content_type):
+    """
+    StreamingHttpResponse over ``iterator`` that reaches the client chunk by
+    chunk on either server interface. Proxy buffering is turned off.
+    """
+    django_request = getattr(request, "_request", request)
+    if isinstance(django_request, ASGIRequest):
+        iterator = aiterate(iter(iterator))
+    response = StreamingHttpResponse(iterator, content_type=content_type)
+    response["X-Accel-Buffering"] = "no"
+    return response
@@ -0,0 +1,75 @@
+# articles/tagging.py
+"""
+Keeps the normalized Tag / ArticleTag tables and Tag.article_count in step
+with the free-form ``Article.tags`` string clients read and write.
+"""
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils.text import slugify
+
+from .models import ArticleTag, Tag
+
+MAX_TAG_LENGTH = 64
+
+
+def parse_tag_string(value):
+    """
+    Split a comma-separated tag string into {slug: name}, keeping the first
+    spelling of each tag and dropping empties / leading '#'.
+    """
+    tags = {}
+    for raw in (value or "").split(","):
+        name = raw.strip().lstrip("#").strip()[:MAX_TAG_LENGTH]
+        slug = slugify(name)[:MAX_TAG_LENGTH]
+        if slug and slug not in tags:
+            tags[slug] = name
+    return tags
+
+
+def sync_article_tags(article):
+    """
+    Diff the article's parsed tags against its ArticleTag rows, applying only
+    the adds/removes and adjusting the affected counters with F() updates.
+    Returns True when the article's tag set changed.
+    """
+    wanted = parse_tag_string(article.tags)
+    current = dict(
+        ArticleTag.objects.filter(article=article).values_list("tag__slug", "tag_id")
+    )
+    added = [slug for slug in wanted if slug not in current]
+    removed_ids = [tag_id for slug, tag_id in current.items() if slug not in wanted]
+    if not added and not removed_ids:
+        return False
+
+    with transaction.atomic():
+        if removed_ids:
+            ArticleTag.objects.filter(article=article, tag_id__in=removed_ids).delete()
+            Tag.objects.filter(pk__in=removed_ids).update(article_count=F("article_count") - 1)
+        if added:
+            tags = [Tag.objects.get_or_create(slug=slug, defaults={"name": wanted[slug]})[0] for slug in added]
+            ArticleTag.objects.bulk_create(
+                [ArticleTag(article=article, tag=tag) for tag in tags], ignore_conflicts=True
+            )
+            Tag.objects.filter(pk__in=[tag.pk for tag in tags]).update(article_count=F("article_count") + 1)
+    return True
+
+
+def release_article_tags(article):
+    """
+    Decrement counters for an article about to be deleted (its ArticleTag
+    rows then go away with the cascade).
+    """
+    tag_ids = list(ArticleTag.objects.filter(article=article).values_list("tag_id", flat=True))
+    if tag_ids:
+        Tag.objects.filter(pk__in=tag_ids).update(article_count=F("article_count") - 1)
+
+
+def recount_tags():
+    """
+    Recompute every Tag.article_count from ArticleTag (repair tool).
+    """
+    counts = (
+        ArticleTag.objects.filter(tag=OuterRef("pk")).order_by().values("tag").annotate(n=Count("id")).values("n")
+    )
+    return Tag.objects.update(article_count=Coalesce(Subquery(counts), 0))
@@ -1,3 +1,1375 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from prometheus_client import REGISTRY
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import ai, bulk, dedup, keywords, related, rendering, transfer
+from . import search as article_search
+from .ai_cache import get_ai_cache
+from .chunking import split_markdown
+from .fake_gemini import FakeGeminiClient, FakeGeminiError
+from .jobs import claim_next_job, execute_job, lease_heartbeat, renew_lease, submit_job
+from .models import AIJob, AIUsage, AIUsageDaily, Article, ArticleFingerprint, ArticleLSHBand, KeywordTerm
+from .prompts import DEFAULT_TAGS
+from .quota import FakeClock, MemoryBackend, QuotaExceeded, QuotaLimiter
+from .resilience import AITimeout, AIUnavailable, CircuitBreaker, CircuitOpen, ResilientCaller
+from .usage_buffer import DEAD_LETTER_FILE, UsageBuffer, make_event
+
+
+NOW = 1_700_000_000.0
+
+
+# ----------------- AI RESULT CACHE -----------------
+@override_settings(AI_USAGE_BUFFER={"ENABLED": False}, AI_AUTO_ANALYSIS={"ENABLED": False})
+class AIResultCacheTests(TestCase):
+    def setUp(self):
+        get_ai_cache().clear()
+        self.user = User.objects.create_user("writer", password="pw")
+        self.article = Article.objects.create(
+            title="Caching", content="Why a content-addressed cache pays off.", author=self.user,
+        )
+        self.fake = FakeGeminiClient(seed=1)
+        patcher = mock.patch.object(ai, "client", self.fake)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def summarize(self, query=""):
+        return self.client.post(f"/api/articles/{self.article.pk}/summarize/{query}")
+
+    def test_miss_then_hit(self):
+        first = self.summarize()
+        self.assertEqual(first.status_code, 200)
+        self.assertFalse(first.data["cached"])
+        self.assertGreater(first.data["estimated_cost"], 0)
+
+        second = self.summarize()
+        self.assertEqual(second.status_code, 200)
+        self.assertTrue(second.data["cached"])
+        self.assertEqual(second.data["summary"], first.data["summary"])
+        self.assertEqual(second.data["estimated_cost"], 0.0)
+        self.assertEqual(self.fake.models.calls, 1)
+
+        usage = AIUsage.objects.filter(user=self.user, feature="summarize").order_by("id")
+        self.assertEqual([row.cached for row in usage], [False, True])
+        self.assertEqual(usage[1].tokens_used, 0)
+
+    def test_refresh_bypasses_the_cache(self):
+        self.summarize()
+        refreshed = self.summarize("?refresh=1")
+        self.assertFalse(refreshed.data["cached"])
+        self.assertEqual(self.fake.models.calls, 2)
+
+    def test_changed_content_misses(self):
+        self.summarize()
+        self.article.content = "A different article body entirely."
+        self.article.save()
+        self.assertFalse(self.summarize().data["cached"])
+        self.assertEqual(self.fake.models.calls, 2)
+
+    def test_empty_answers_are_not_cached(self):
+        self.fake.plan.empty_rate = 1.0
+        self.assertEqual(self.summarize().status_code, 400)
+        self.fake.plan.empty_rate = 0.0
+        response = self.summarize()
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.data["cached"])
+
+
+# ----------------- ARTICLE RESPONSE CACHE -----------------
+class ArticleResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("author", password="pw")
+        self.article = Article.objects.create(title="First", content="Body", author=self.user)
+        self.client = APIClient()
+
+    def test_anonymous_list_is_served_from_cache_until_an_article_changes(self):
+        self.assertEqual(self.client.get("/api/articles/")["X-Cache"], "MISS")
+        self.assertEqual(self.client.get("/api/articles/")["X-Cache"], "HIT")
+
+        # generations are bumped once the write commits
+        with self.captureOnCommitCallbacks(execute=True):
+            self.article.title = "First, edited"
+            self.article.save()
+        response = self.client.get("/api/articles/")
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data["results"][0]["title"], "First, edited")
+
+    def test_new_article_invalidates_the_list(self):
+        self.client.get("/api/articles/")
+        with self.captureOnCommitCallbacks(execute=True):
+            Article.objects.create(title="Second", content="Body", author=self.user)
+        response = self.client.get("/api/articles/")
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(len(response.data["results"]), 2)
+
+    def test_detail_is_cached_per_article(self):
+        url = f"/api/articles/{self.article.pk}/"
+        self.assertEqual(self.client.get(url)["X-Cache"], "MISS")
+        self.assertEqual(self.client.get(url)["X-Cache"], "HIT")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.article.content = "New body"
+            self.article.save()
+        self.assertEqual(self.client.get(url)["X-Cache"], "MISS")
+
+
+# ----------------- QUOTA -----------------
+class QuotaBucketTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("quota", password="pw")
+        self.clock = FakeClock(NOW)
+
+    def limiter(self, **limits):
+        options = {
+            "USER_REQUESTS_PER_MINUTE": 0,
+            "GLOBAL_REQUESTS_PER_MINUTE": 0,
+            "USER_TOKENS_PER_DAY": 0,
+            "GLOBAL_TOKENS_PER_DAY": 0,
+        }
+        options.update(limits)
+        return QuotaLimiter(backend=MemoryBackend(), clock=self.clock, limits=options)
+
+    def test_bucket_empties_and_refills(self):
+        quota = self.limiter(USER_REQUESTS_PER_MINUTE=2)
+        quota.check(self.user)
+        quota.check(self.user)
+        with self.assertRaises(QuotaExceeded) as caught:
+            quota.check(self.user)
+        # one request comes back every 60 / 2 seconds
+        self.assertAlmostEqual(caught.exception.retry_after, 30.0)
+
+        self.clock.advance(29)
+        with self.assertRaises(QuotaExceeded) as caught:
+            quota.check(self.user)
+        self.assertAlmostEqual(caught.exception.retry_after, 1.0)
+
+        self.clock.advance(1)
+        quota.check(self.user)
+
+    def test_rejected_check_consumes_nothing(self):
+        quota = self.limiter(USER_REQUESTS_PER_MINUTE=5, GLOBAL_REQUESTS_PER_MINUTE=1)
+        other = User.objects.create_user("other", password="pw")
+        quota.check(other)
+        with self.assertRaises(QuotaExceeded):
+            quota.check(self.user)
+        # the user bucket taken before the global one refused is given back
+        tokens, _ = quota.backend.buckets[quota.key("rpm", f"user:{self.user.pk}")]
+        self.assertEqual(tokens, 5)
+
+    def test_users_have_separate_buckets(self):
+        quota = self.limiter(USER_REQUESTS_PER_MINUTE=1)
+        other = User.objects.create_user("other", password="pw")
+        quota.check(self.user)
+        quota.check(other)
+        with self.assertRaises(QuotaExceeded):
+            quota.check(self.user)
+
+    def test_daily_tokens_block_until_midnight(self):
+        quota = self.limiter(USER_TOKENS_PER_DAY=100)
+        quota.charge(self.user.pk, 60)
+        quota.check(self.user)
+        quota.charge(self.user.pk, 40)
+        with self.assertRaises(QuotaExceeded) as caught:
+            quota.check(self.user)
+        _, midnight = quota.day_bounds(NOW)
+        self.assertAlmostEqual(caught.exception.retry_after, midnight - NOW)
+
+        self.clock.advance(midnight - NOW)
+        quota.check(self.user)
+
+    def test_daily_tokens_are_reconciled_from_recorded_usage(self):
+        quota = self.limiter(USER_TOKENS_PER_DAY=100)
+        day, _ = quota.day_bounds(NOW)
+        AIUsageDaily.objects.create(user=self.user, feature="summarize", day=day, calls=1, tokens_used=100)
+        with self.assertRaises(QuotaExceeded):
+            quota.check(self.user)
+
+
+# ----------------- RESILIENCE -----------------
+class ResilientCallerTests(TestCase):
+    def setUp(self):
+        self.clock = FakeClock(NOW)
+        self.sleeps = []
+        self.fake = FakeGeminiClient(seed=1)
+
+    def caller(self, **options):
+        defaults = {
+            "TIMEOUT": 10.0,
+            "DEADLINE": 60.0,
+            "MAX_RETRIES": 2,
+            "BACKOFF_BASE": 0.5,
+            "BACKOFF_MAX": 8.0,
+            "FAILURE_THRESHOLD": 3,
+            "RESET_TIMEOUT": 30.0,
+            "MAX_WORKERS": 1,
+        }
+        defaults.update(options)
+
+        def sleep(seconds):
+            self.sleeps.append(seconds)
+            self.clock.advance(seconds)
+
+        # rng=1.0 makes every backoff its full ceiling
+        return ResilientCaller(clock=self.clock, sleep=sleep, rng=lambda: 1.0, options=defaults)
+
+    def gemini(self, timeout):
+        return ai.extract_gemini_text(self.fake.models.generate_content("fake-model", "Summarize this"))
+
+    def failing_then_ok(self, failures, error):
+        outcomes = [error] * failures
+
+        def fn(timeout):
+            if outcomes:
+                raise outcomes.pop()
+            return "ok"
+        return fn
+
+    def test_transient_errors_are_retried_with_backoff(self):
+        caller = self.caller()
+        self.assertEqual(caller.call(self.failing_then_ok(2, FakeGeminiError(503))), "ok")
+        self.assertEqual(self.sleeps, [0.5, 1.0])
+        self.assertEqual(caller.breaker.state, CircuitBreaker.CLOSED)
+        self.assertEqual(caller.breaker.failures, 0)
+
+    def test_gives_up_after_max_retries(self):
+        self.fake.plan.failure_rate = 1.0
+        caller = self.caller(FAILURE_THRESHOLD=10)
+        with self.assertRaises(AIUnavailable):
+            caller.call(self.gemini)
+        self.assertEqual(self.fake.models.calls, 3)
+        self.assertEqual(len(self.sleeps), 2)
+
+    def test_deadline_stops_retries(self):
+        caller = self.caller(DEADLINE=1.0, MAX_RETRIES=5)
+        with self.assertRaises(AIUnavailable):
+            caller.call(self.failing_then_ok(10, FakeGeminiError(503)))
+        # 0.5s backoff fits in the deadline, the next 1s does not
+        self.assertEqual(self.sleeps, [0.5])
+
+    def test_attempt_timeout_is_capped_by_the_deadline(self):
+        timeouts = []
+        caller = self.caller(TIMEOUT=10.0, DEADLINE=12.0)
+
+        def fn(timeout):
+            timeouts.append(timeout)
+            if len(timeouts) == 1:
+                self.clock.advance(timeout)
+                raise TimeoutError("slow")
+            return "ok"
+
+        self.assertEqual(caller.call(fn), "ok")
+        self.assertEqual(timeouts, [10.0, 1.5])
+
+    def test_exhausted_deadline_is_not_a_breaker_failure(self):
+        caller = self.caller(DEADLINE=10.0)
+        # the backoff sleep overran the deadline; no further request goes out
+        caller.sleep = lambda seconds: self.clock.advance(seconds + 10)
+        calls = []
+
+        def fn(timeout):
+            calls.append(timeout)
+            raise FakeGeminiError(503)
+
+        with self.assertRaises(AITimeout):
+            caller.call(fn)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(caller.breaker.failures, 1)
+
+    async def test_async_exhausted_deadline_is_not_a_breaker_failure(self):
+        caller = self.caller(DEADLINE=10.0)
+
+        async def asleep(seconds):
+            self.clock.advance(seconds + 10)
+
+        async def fn(timeout):
+            raise FakeGeminiError(503)
+
+        caller.asleep = asleep
+        with self.assertRaises(AITimeout):
+            await caller.acall(fn)
+        self.assertEqual(caller.breaker.failures, 1)
+
+    def test_client_errors_are_not_retried_or_counted(self):
+        caller = self.caller()
+        with self.assertRaises(FakeGeminiError):
+            caller.call(self.failing_then_ok(1, FakeGeminiError(400)))
+        self.assertEqual(self.sleeps, [])
+        self.assertEqual(caller.breaker.failures, 0)
+
+    def test_local_errors_leave_the_breaker_alone(self):
+        caller = self.caller(FAILURE_THRESHOLD=1, MAX_RETRIES=0)
+        with self.assertRaises(AIUnavailable):
+            caller.call(self.failing_then_ok(1, FakeGeminiError(503)))
+        self.clock.advance(30)
+        # the half-open trial call fails before reaching Gemini
+        with self.assertRaises(ValueError):
+            caller.call(self.failing_then_ok(1, ValueError("bad prompt")))
+        self.assertEqual(caller.breaker.state, CircuitBreaker.HALF_OPEN)
+        # ...so the trial slot is free for the next call
+        self.assertEqual(caller.call(self.gemini)[:6], "# Fake")
+        self.assertEqual(caller.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_breaker_opens_then_half_opens(self):
+        self.fake.plan.failure_rate = 1.0
+        caller = self.caller(MAX_RETRIES=0)
+        for _ in range(3):
+            with self.assertRaises(AIUnavailable):
+                caller.call(self.gemini)
+        self.assertEqual(caller.breaker.state, CircuitBreaker.OPEN)
+
+        with self.assertRaises(CircuitOpen) as caught:
+            caller.call(self.gemini)
+        self.assertAlmostEqual(caught.exception.retry_after, 30.0)
+        self.assertEqual(self.fake.models.calls, 3)
+
+        # a failed trial call re-opens the circuit at once
+        self.clock.advance(30)
+        with self.assertRaises(AIUnavailable):
+            caller.call(self.gemini)
+        self.assertEqual(caller.breaker.state, CircuitBreaker.OPEN)
+
+        self.clock.advance(30)
+        self.fake.plan.failure_rate = 0.0
+        caller.call(self.gemini)
+        self.assertEqual(caller.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_half_open_allows_one_trial_call(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5, clock=self.clock)
+        breaker.record_failure()
+        self.clock.advance(5)
+        breaker.before_call()
+        with self.assertRaises(CircuitOpen):
+            breaker.before_call()
+        breaker.record_success()
+        breaker.before_call()
+
+    def test_stream_failures_count_against_the_breaker(self):
+        self.fake.plan.failure_rate = 1.0
+        caller = self.caller(FAILURE_THRESHOLD=1)
+        with self.assertRaises(FakeGeminiError):
+            list(caller.guard_stream(self.fake.models.generate_content_stream("fake-model", "hi")))
+        self.assertEqual(caller.breaker.state, CircuitBreaker.OPEN)
+
+
+# ----------------- USAGE BUFFER -----------------
+class UsageBufferFlushTests(TestCase):
+    def setUp(self):
+        # flushed by hand; the background thread is not started
+        patcher = mock.patch.object(UsageBuffer, "ensure_thread")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user("reader", password="pw")
+        self.article = Article.objects.create(title="Usage", content="Body", author=self.user)
+        self.spool = tempfile.TemporaryDirectory()
+        self.addCleanup(self.spool.cleanup)
+
+    def buffer(self, spool=False):
+        return UsageBuffer(max_size=100, flush_interval=60, spool_dir=self.spool.name if spool else "")
+
+    def event(self, user=None, article=None, tokens=10):
+        return make_event(user or self.user, article or self.article, "summarize", tokens, 0.0002)
+
+    def test_flush_writes_rows_and_rollups(self):
+        buffer = self.buffer()
+        buffer.add(self.event(tokens=10))
+        buffer.add(self.event(tokens=5))
+        self.assertEqual(AIUsage.objects.count(), 0)
+
+        self.assertEqual(buffer.flush(), 2)
+        self.assertEqual(AIUsage.objects.filter(article=self.article).count(), 2)
+        daily = AIUsageDaily.objects.get(user=self.user, feature="summarize")
+        self.assertEqual((daily.calls, daily.tokens_used), (2, 15))
+        self.assertEqual(buffer.flush(), 0)
+
+    def test_deleted_article_is_written_without_article(self):
+        buffer = self.buffer()
+        buffer.add(self.event())
+        self.article.delete()
+        self.assertEqual(buffer.flush(), 1)
+        self.assertIsNone(AIUsage.objects.get().article_id)
+        self.assertEqual(buffer.events, [])
+
+    def test_deleted_user_events_are_dropped(self):
+        gone = User.objects.create_user("gone", password="pw")
+        buffer = self.buffer()
+        buffer.add(self.event(user=gone))
+        buffer.add(self.event())
+        gone.delete()
+        self.assertEqual(buffer.flush(), 1)
+        self.assertEqual(AIUsage.objects.get().user, self.user)
+
+    def test_rejected_event_is_dead_lettered(self):
+        buffer = self.buffer(spool=True)
+        written = self.event()
+        buffer.add(written)
+        buffer.flush()
+        # the same event_id again violates the unique constraint
+        buffer.add(written)
+        buffer.add({**self.event(), "tokens_used": "many"})
+        buffer.add(self.event())
+
+        self.assertEqual(buffer.flush(), 1)
+        self.assertEqual(buffer.events, [])
+        with open(os.path.join(self.spool.name, DEAD_LETTER_FILE), encoding="utf-8") as fh:
+            dead = [json.loads(line) for line in fh]
+        self.assertEqual(len(dead), 2)
+        self.assertEqual(dead[0]["event_id"], written["event_id"])
+        self.assertEqual(AIUsage.objects.count(), 2)
+
+    def test_bug_in_the_write_path_is_not_dead_lettered(self):
+        buffer = self.buffer(spool=True)
+        broken = self.event()
+        del broken["feature"]
+        buffer.add(broken)
+        self.assertEqual(buffer.flush(), 0)
+        # kept for the next flush instead of being dropped as bad data
+        self.assertEqual(buffer.events, [broken])
+        self.assertFalse(os.path.exists(os.path.join(self.spool.name, DEAD_LETTER_FILE)))
+
+    def test_transient_error_requeues_the_batch(self):
+        buffer = self.buffer()
+        events = [self.event(), self.event()]
+        for event in events:
+            buffer.add(event)
+        with mock.patch("articles.usage_buffer.write_events", side_effect=OperationalError("database is locked")):
+            self.assertEqual(buffer.flush(), 0)
+        self.assertEqual(buffer.events, events)
+        self.assertEqual(buffer.flush(), 2)
+
+    def test_spooled_events_survive_a_crash(self):
+        buffer = self.buffer(spool=True)
+        event = self.event()
+        buffer.add(event)
+        # a process that died before flushing left its spool behind
+        os.replace(buffer.spool_path(), os.path.join(self.spool.name, "usage-999999999.jsonl"))
+        self.buffer(spool=True)
+        self.assertEqual(str(AIUsage.objects.get().event_id), event["event_id"])
+        # replaying again never inserts the row twice
+        self.assertEqual(buffer.write_each([event], skip_existing=True), (0, []))
+
+
+# ----------------- CURSOR PAGINATION -----------------
+class ArticleCursorPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("paginator", password="pw")
+        self.ids = [
+            Article.objects.create(title=f"Article {n}", content=f"Body {n}", author=self.user).pk
+            for n in range(45)
+        ]
+        self.client = APIClient()
+
+    def pages(self, url):
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            yield response.data
+            url = response.data["next"]
+
+    def test_walks_every_article_once_newest_first(self):
+        pages = list(self.pages("/api/articles/?page_size=20"))
+        self.assertEqual([len(page["results"]) for page in pages], [20, 20, 5])
+        seen = [item["id"] for page in pages for item in page["results"]]
+        self.assertEqual(seen, sorted(self.ids, reverse=True))
+        self.assertIsNone(pages[0]["previous"])
+
+    def test_new_articles_do_not_shift_later_pages(self):
+        first = self.client.get("/api/articles/?page_size=20").data
+        Article.objects.create(title="Breaking", content="Just in", author=self.user)
+        rest = list(self.pages(first["next"]))
+        seen = [item["id"] for page in [first, *rest] for item in page["results"]]
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(sorted(seen), sorted(self.ids))
+
+    def test_page_size_is_capped(self):
+        Article.objects.bulk_create([
+            Article(title=f"Extra {n}", content="Body", author=self.user) for n in range(60)
+        ])
+        response = self.client.get("/api/articles/?page_size=500")
+        self.assertEqual(len(response.data["results"]), 100)
+
+
+# ----------------- STREAMING -----------------
+@override_settings(AI_USAGE_BUFFER={"ENABLED": False})
+class StreamingResponseTests(TestCase):
+    def setUp(self):
+        get_ai_cache().clear()
+        self.user = User.objects.create_user("streamer", password="pw", is_staff=True)
+        self.headers = {"Authorization": f"Bearer {AccessToken.for_user(self.user)}"}
+        self.fake = FakeGeminiClient(seed=1, chunks=4)
+        patcher = mock.patch.object(ai, "client", self.fake)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.finished = False
+        stream = ai.stream_gemini
+
+        def tracked(spec, prompt):
+            yield from stream(spec, prompt)
+            self.finished = True
+
+        patcher = mock.patch.object(ai, "stream_gemini", tracked)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_asgi_sends_the_first_event_before_generation_ends(self):
+        response = await self.async_client.post(
+            "/api/articles/generate/?stream=1", {"topic": "Streaming"}, content_type="application/json",
+            headers=self.headers,
+        )
+        self.assertTrue(response.is_async)
+        chunks = aiter(response.streaming_content)
+        first = await anext(chunks)
+        self.assertTrue(first.startswith(b"event: chunk"))
+        self.assertFalse(self.finished)
+
+        rest = b"".join([chunk async for chunk in chunks])
+        self.assertTrue(self.finished)
+        self.assertIn(b"event: done", rest)
+        self.assertEqual(await AIUsage.objects.filter(user=self.user, feature="generate").acount(), 1)
+
+    def test_wsgi_keeps_the_sync_generator(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post("/api/articles/generate/?stream=1", {"topic": "Streaming"}, format="json")
+        self.assertFalse(response.is_async)
+        body = b"".join(response.streaming_content)
+        self.assertGreater(body.count(b"event: chunk"), 1)
+        self.assertIn(b"event: done", body)
+
+    def test_chunks_streamed_before_an_upstream_error_are_billed(self):
+        def failing(spec, prompt):
+            yield SimpleNamespace(text="# Half a post\n\n")
+            yield SimpleNamespace(text="and then Gemini fell over")
+            raise FakeGeminiError(503)
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with mock.patch.object(ai, "stream_gemini", failing), mock.patch("articles.ai.charge_quota") as charge:
+            response = client.post("/api/articles/generate/?stream=1", {"topic": "Outage"}, format="json")
+            body = b"".join(response.streaming_content)
+        self.assertIn(b"event: error", body)
+        usage = AIUsage.objects.get(user=self.user, feature="generate")
+        self.assertGreater(usage.tokens_used, 0)
+        charge.assert_called_once_with(self.user.pk, usage.tokens_used)
+
+    def test_disconnect_mid_stream_bills_the_chunks_sent(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post("/api/articles/generate/?stream=1", {"topic": "Walk away"}, format="json")
+        next(iter(response.streaming_content))
+        response.close()
+        self.assertFalse(self.finished)
+        self.assertGreater(AIUsage.objects.get(user=self.user, feature="generate").tokens_used, 0)
+
+    @override_settings(DATA_TRANSFER={"CHUNK_SIZE": 2})
+    async def test_asgi_export_streams_in_chunks(self):
+        await Article.objects.abulk_create([
+            Article(title=f"Export {n}", content="Body", author=self.user) for n in range(5)
+        ])
+        response = await self.async_client.get("/api/articles/export/", headers=self.headers)
+        self.assertTrue(response.is_async)
+        chunks = [chunk async for chunk in response.streaming_content]
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(sum(chunk.count(b"\n") for chunk in chunks), 5)
+
+    async def test_streamed_latency_is_observed_when_the_body_is_sent(self):
+        self.fake.plan.latency = 0.2
+        labels = {"view": "articles-generate", "method": "POST"}
+
+        def observed(sample="count", **extra):
+            return REGISTRY.get_sample_value(f"cms_http_request_duration_seconds_{sample}", {**labels, **extra}) or 0
+
+        before, fast = observed(), observed("bucket", le="0.1")
+        response = await self.async_client.post(
+            "/api/articles/generate/?stream=1", {"topic": "Latency"}, content_type="application/json",
+            headers=self.headers,
+        )
+        chunks = aiter(response.streaming_content)
+        await anext(chunks)
+        self.assertEqual(observed(), before)
+        [chunk async for chunk in chunks]
+        self.assertEqual(observed(), before + 1)
+        # timed to the last chunk, not to the view returning the stream
+        self.assertEqual(observed("bucket", le="0.1"), fast)
+
+
+# ----------------- CONDITIONAL GET -----------------
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("etag", password="pw")
+        self.first = Article.objects.create(title="First", content="Body", author=self.user)
+        self.second = Article.objects.create(title="Second", content="Body", author=self.user)
+        # authenticated requests skip the anonymous response cache
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_detail_revalidates_with_etag_and_last_modified(self):
+        url = f"/api/articles/{self.first.pk}/"
+        response = self.client.get(url)
+        etag, last_modified = response["ETag"], response["Last-Modified"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        self.first.content = "Edited"
+        self.first.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_list_etag_changes_on_delete(self):
+        response = self.client.get("/api/articles/")
+        etag = response["ETag"]
+        self.assertTrue(etag.startswith("W/"))
+        self.assertEqual(self.client.get("/api/articles/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.second.delete()
+        response = self.client.get("/api/articles/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), 1)
+
+    def test_list_ignores_if_modified_since(self):
+        response = self.client.get("/api/articles/")
+        self.assertFalse(response.has_header("Last-Modified"))
+        # deleting leaves max(updated_at) unchanged, so a date cannot validate a list
+        self.second.delete()
+        response = self.client.get("/api/articles/", HTTP_IF_MODIFIED_SINCE="Fri, 01 Jan 2100 00:00:00 GMT")
+        self.assertEqual(response.status_code, 200)
+
+    def test_list_etag_depends_on_the_query(self):
+        etag = self.client.get("/api/articles/")["ETag"]
+        response = self.client.get("/api/articles/?page_size=1", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_cached_anonymous_response_answers_304(self):
+        anonymous = APIClient()
+        etag = anonymous.get("/api/articles/")["ETag"]
+        response = anonymous.get("/api/articles/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["X-Cache"], "HIT")
+
+
+# ----------------- AI JOBS -----------------
+@override_settings(AI_USAGE_BUFFER={"ENABLED": False})
+class AIJobLeaseTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("jobs", password="pw")
+        self.fake = FakeGeminiClient(seed=1)
+        patcher = mock.patch.object(ai, "client", self.fake)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def expire_lease(self, job):
+        AIJob.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+
+    def test_job_runs_and_stores_its_result(self):
+        job = submit_job(self.user, "generate", params={"topic": "Queues"})
+        claimed = claim_next_job("worker-a")
+        self.assertEqual((claimed.pk, claimed.attempts, claimed.locked_by), (job.pk, 1, "worker-a"))
+        self.assertIsNone(claim_next_job("worker-b"))
+
+        execute_job(claimed)
+        job.refresh_from_db()
+        self.assertEqual(job.status, AIJob.SUCCEEDED)
+        self.assertTrue(job.result["content"])
+        self.assertEqual(AIUsage.objects.filter(user=self.user, feature="generate").count(), 1)
+
+    def test_transient_failure_is_requeued_and_permanent_one_dead_lettered(self):
+        submit_job(self.user, "generate", params={"topic": "Queues"})
+        job = claim_next_job("worker-a")
+        with mock.patch("articles.jobs.run_feature", side_effect=AIUnavailable("circuit open")):
+            execute_job(job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, AIJob.QUEUED)
+        self.assertGreater(job.run_after, timezone.now())
+
+        bad = submit_job(self.user, "generate", params={})
+        execute_job(claim_next_job("worker-a"))
+        bad.refresh_from_db()
+        self.assertEqual(bad.status, AIJob.DEAD)
+        self.assertEqual(bad.error, "Topic is required")
+
+    def test_outcome_of_a_reclaimed_job_is_discarded(self):
+        submit_job(self.user, "generate", params={"topic": "Slow"})
+        job = claim_next_job("worker-a")
+
+        def slow_run(job):
+            # worker-a looks dead to the others while it is still running
+            self.expire_lease(job)
+            self.assertIsNotNone(claim_next_job("worker-b"))
+            return {"content": "late"}
+
+        with mock.patch("articles.jobs.run_feature", side_effect=slow_run):
+            execute_job(job)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by, job.attempts, job.result), (AIJob.RUNNING, "worker-b", 2, None))
+        # nor can the old claim renew the lease
+        stale = AIJob(pk=job.pk, locked_by="worker-a", attempts=1)
+        self.assertFalse(renew_lease(stale))
+        self.assertTrue(renew_lease(job))
+
+    def test_expired_job_without_attempts_left_is_dead_lettered(self):
+        job = submit_job(self.user, "generate", params={"topic": "Crashy"})
+        for attempt in range(1, job.max_attempts + 1):
+            claimed = claim_next_job("worker-a")
+            self.assertEqual(claimed.attempts, attempt)
+            self.expire_lease(claimed)
+        self.assertIsNone(claim_next_job("worker-a"))
+        job.refresh_from_db()
+        self.assertEqual(job.status, AIJob.DEAD)
+        self.assertIn("Lease expired", job.error)
+
+    @override_settings(AI_JOBS={"LEASE_TIMEOUT": 0.03})
+    def test_heartbeat_renews_the_lease_while_running(self):
+        job = AIJob(pk=1, locked_by="worker-a", attempts=1)
+        with mock.patch("articles.jobs.renew_lease", return_value=True) as renew:
+            with lease_heartbeat(job):
+                time.sleep(0.1)
+        self.assertGreaterEqual(renew.call_count, 2)
+        calls = renew.call_count
+        time.sleep(0.05)
+        self.assertEqual(renew.call_count, calls)
+
+    @override_settings(AI_JOBS={"POLL_INTERVAL": 0.01})
+    def test_worker_survives_a_failed_claim(self):
+        out = io.StringIO()
+        claims = mock.Mock(side_effect=[OperationalError("database is locked"), None])
+        # keep the test runner's own SIGINT handling
+        with mock.patch("signal.signal"), mock.patch("articles.management.commands.run_ai_worker.claim_next_job", claims):
+            with mock.patch("sys.stdout", io.StringIO()) as printed:
+                call_command("run_ai_worker", burst=True, stdout=out)
+        self.assertEqual(claims.call_count, 2)
+        self.assertIn("AI job claim error", printed.getvalue())
+        self.assertIn("AI worker stopped", out.getvalue())
+
+
+# ----------------- ASYNC USAGE RECORDING -----------------
+@override_settings(AI_USAGE_BUFFER={"ENABLED": False})
+class AsyncRecordUsageTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("async", password="pw")
+
+    async def test_quota_is_charged_off_the_event_loop(self):
+        loop_thread = threading.get_ident()
+        threads = []
+        with mock.patch("articles.ai.charge_quota", side_effect=lambda *args: threads.append(threading.get_ident())):
+            await ai.arecord_usage(self.user, None, "generate", 10, 0.0002)
+        self.assertEqual(len(threads), 1)
+        self.assertNotEqual(threads[0], loop_thread)
+        self.assertEqual(await AIUsage.objects.filter(user=self.user).acount(), 1)
+
+    async def test_row_and_rollup_are_written_together(self):
+        with mock.patch("articles.ai.apply_rollups", side_effect=OperationalError("database is locked")):
+            with self.assertRaises(OperationalError):
+                await ai.arecord_usage(self.user, None, "generate", 10, 0.0002)
+        self.assertEqual(await AIUsage.objects.filter(user=self.user).acount(), 0)
+
+
+# ----------------- IMPORT / EXPORT -----------------
+class TransferRoundTripTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("porter", password="pw")
+        self.article = Article.objects.create(
+            title="Portable", content="# Heading\n\nBody", tags="Django, Export", author=self.user,
+        )
+        for tokens in (10, 20):
+            AIUsage.objects.create(
+                event_id=uuid.uuid4(), user=self.user, article=self.article, feature="summarize",
+                tokens_used=tokens, estimated_cost=Decimal("0.0002"),
+            )
+
+    def export(self, kind, fmt):
+        return "".join(transfer.stream_export(kind, transfer.export_queryset(kind), fmt, chunk_size=1))
+
+    def import_text(self, kind, text, fmt="ndjson", batch_size=None):
+        importer = transfer.Importer(kind, batch_size=batch_size, reindex=False)
+        stats = importer.run(io.StringIO(text), fmt)
+        return stats, importer.errors
+
+    def snapshot(self):
+        articles = list(Article.objects.values_list("author__username", "title", "content", "tags", "created_at"))
+        usage = list(AIUsage.objects.order_by("tokens_used").values_list(
+            "event_id", "user__username", "feature", "tokens_used", "estimated_cost", "article__title", "created_at",
+        ))
+        return articles, usage
+
+    def test_round_trip(self):
+        for fmt in transfer.FORMATS:
+            with self.subTest(fmt=fmt):
+                before = self.snapshot()
+                articles, usage = self.export("articles", fmt), self.export("usage", fmt)
+                AIUsage.objects.all().delete()
+                Article.objects.all().delete()
+
+                stats, errors = self.import_text("articles", articles, fmt)
+                self.assertEqual((stats["created"], stats["failed"], errors), (1, 0, []))
+                stats, errors = self.import_text("usage", usage, fmt)
+                self.assertEqual((stats["created"], stats["failed"], errors), (2, 0, []))
+                self.assertEqual(self.snapshot(), before)
+
+                # importing the same file again updates in place
+                stats, _ = self.import_text("usage", usage, fmt)
+                self.assertEqual((stats["created"], stats["updated"]), (0, 2))
+                self.assertEqual(AIUsage.objects.count(), 2)
+
+    def test_repeated_event_id_in_one_batch_keeps_the_last(self):
+        event_id = str(uuid.uuid4())
+        lines = [
+            json.dumps({"event_id": event_id, "user": "porter", "feature": "generate", "tokens_used": tokens})
+            for tokens in (5, 7)
+        ]
+        stats, errors = self.import_text("usage", "\n".join(lines) + "\n", batch_size=10)
+        self.assertEqual((stats["created"], stats["failed"], errors), (1, 0, []))
+        self.assertEqual(AIUsage.objects.get(event_id=event_id).tokens_used, 7)
+        daily = AIUsageDaily.objects.get(user=self.user, feature="generate")
+        self.assertEqual((daily.calls, daily.tokens_used), (1, 7))
+
+
+# ----------------- CHUNKING -----------------
+class ChunkingTests(TestCase):
+    def section(self, title, sentences=40):
+        return f"## {title}\n\n" + " ".join(f"{title} sentence {n} says something." for n in range(sentences))
+
+    def test_short_text_is_one_chunk(self):
+        self.assertEqual(split_markdown("# Title\n\nShort body.", chunk_chars=100), ["# Title\n\nShort body."])
+        self.assertEqual(split_markdown("   ", chunk_chars=100), [])
+
+    def test_chunks_start_at_headings_and_fit(self):
+        text = "\n\n".join(self.section(name) for name in ("Alpha", "Beta", "Gamma"))
+        chunks = split_markdown(text, chunk_chars=1500, min_chars=100)
+        self.assertTrue(all(len(chunk) <= 1500 for chunk in chunks))
+        self.assertEqual([chunk.splitlines()[0] for chunk in chunks if chunk.startswith("##")], ["## Alpha", "## Beta", "## Gamma"])
+
+    def test_editing_one_section_keeps_the_other_chunks(self):
+        sections = [self.section(name) for name in ("Alpha", "Beta", "Gamma")]
+        before = split_markdown("\n\n".join(sections), chunk_chars=1500, min_chars=100)
+        sections[1] = sections[1].replace("sentence 3 ", "sentence three ")
+        after = split_markdown("\n\n".join(sections), chunk_chars=1500, min_chars=100)
+        self.assertEqual(len(before), len(after))
+        changed = [i for i, (old, new) in enumerate(zip(before, after)) if old != new]
+        self.assertEqual(len(changed), 1)
+        self.assertIn("## Beta", after[changed[0]])
+
+    def test_oversized_fence_is_closed_and_reopened(self):
+        code = "\n".join(f"    value_{n} = compute({n})  # line {n}" for n in range(300))
+        text = f"# Code\n\nHere it is:\n```python\n{code}\n```\n\nAfter the code."
+        chunks = split_markdown(text, chunk_chars=3000, min_chars=400)
+        fenced = [chunk for chunk in chunks if "```" in chunk]
+        self.assertGreater(len(fenced), 1)
+        for chunk in chunks:
+            self.assertLessEqual(len(chunk), 3000)
+            self.assertEqual(chunk.count("```"), 2 if chunk in fenced else 0)
+        for chunk in fenced:
+            self.assertTrue(chunk.startswith("```python\n"))
+        lines = [line for chunk in fenced for line in chunk.splitlines() if line.startswith("    value_")]
+        self.assertEqual("\n".join(lines), code)
+
+    def test_max_chunks_grows_the_chunk_size(self):
+        text = "\n\n".join(self.section(f"Part {n}", sentences=10) for n in range(20))
+        self.assertLessEqual(len(split_markdown(text, chunk_chars=400, min_chars=0, max_chunks=5)), 5)
+
+
+# ----------------- SEARCH -----------------
+class SearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("searcher", password="pw")
+        self.client = APIClient()
+
+    def article(self, title, content="Body text.", tags=""):
+        return Article.objects.create(title=title, content=content, tags=tags, author=self.user)
+
+    def search(self, q, **params):
+        response = self.client.get("/api/articles/search/", {"q": q, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_title_matches_rank_above_content_matches(self):
+        in_content = self.article("Weekly notes", "A long digression about django deployments.")
+        in_title = self.article("Django deployments", "Notes.")
+        self.article("Unrelated", "Nothing to see.")
+        ids = [hit["id"] for hit in self.search("django")["results"]]
+        self.assertEqual(ids, [in_title.pk, in_content.pk])
+
+    def test_last_word_is_a_prefix_and_stemming_applies(self):
+        article = self.article("Deploying services", "We deployed everything.")
+        self.assertEqual([hit["id"] for hit in self.search("deploy")["results"]], [article.pk])
+        self.assertEqual([hit["id"] for hit in self.search("servi")["results"]], [article.pk])
+
+    def test_query_syntax_is_not_injected(self):
+        self.article("Quotes", 'He said "hello" OR NOT.')
+        for q in ['"', 'title:hello', 'hello OR *', 'NEAR(', "-- ;"]:
+            with self.subTest(q=q):
+                self.search(q)
+
+    def test_highlights_are_escaped(self):
+        self.article("<b>Django</b> tips", "Use <script>django</script> wisely.")
+        hit = self.search("django")["results"][0]
+        self.assertEqual(hit["title_highlight"], "&lt;b&gt;<mark>Django</mark>&lt;/b&gt; tips")
+        self.assertNotIn("<script>", hit["snippet"])
+        self.assertIn("<mark>django</mark>", hit["snippet"])
+
+    def test_index_follows_edits_and_deletes(self):
+        article = self.article("Caching", "Redis notes.")
+        article.content = "Memcached notes."
+        article.save()
+        self.assertEqual(self.search("redis")["results"], [])
+        self.assertEqual(len(self.search("memcached")["results"]), 1)
+        article.delete()
+        self.assertEqual(self.search("memcached")["results"], [])
+
+    def test_cursor_pages_do_not_repeat_hits(self):
+        created = {self.article(f"Python tip {n}", "python " * (n + 1)).pk for n in range(5)}
+        seen, params = [], {"page_size": 2}
+        while True:
+            page = self.search("python", **params)
+            seen += [hit["id"] for hit in page["results"]]
+            if not page["next"]:
+                break
+            params["cursor"] = QueryDict(page["next"].split("?", 1)[1])["cursor"]
+        self.assertEqual(len(seen), 5)
+        self.assertEqual(set(seen), created)
+
+    def test_invalid_cursor_is_a_bad_request(self):
+        response = self.client.get("/api/articles/search/", {"q": "x", "cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_fallback_scan_on_other_databases(self):
+        first = self.article("Django and Redis", "Both words here.")
+        self.article("Only Django", "Nothing else.")
+        third = self.article("Redis first", "then django.")
+        with mock.patch("articles.search.is_sqlite", return_value=False):
+            hits, next_cursor = article_search.search("django redis", limit=1)
+            self.assertEqual([hit["id"] for hit in hits], [first.pk])
+            self.assertIn("<mark>Django</mark>", hits[0]["title_highlight"])
+            hits, _ = article_search.search("django redis", limit=1, cursor=next_cursor)
+            self.assertEqual([hit["id"] for hit in hits], [third.pk])
+
+
+# ----------------- RELATED ARTICLES -----------------
+class RelatedArticlesTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        override = override_settings(RELATED_ARTICLES={"INDEX_DIR": os.path.join(self.tmp.name, "index")})
+        override.enable()
+        self.addCleanup(override.disable)
+        related.get_index.cache_clear()
+        self.addCleanup(related.get_index.cache_clear)
+        self.user = User.objects.create_user("reader", password="pw")
+        self.client = APIClient()
+
+    def article(self, title, content):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Article.objects.create(title=title, content=content, author=self.user)
+
+    def test_endpoint_ranks_similar_articles_and_skips_itself(self):
+        source = self.article("Baking sourdough bread", "Starter, flour, water and a hot oven make sourdough bread.")
+        close = self.article("Sourdough starter care", "Feed the sourdough starter flour and water before baking bread.")
+        self.article("Kubernetes networking", "Pods, services and ingress controllers route cluster traffic.")
+        response = self.client.get(f"/api/articles/{source.pk}/related/", {"k": 5})
+        self.assertEqual(response.status_code, 200)
+        ids = [hit["id"] for hit in response.data["results"]]
+        self.assertEqual(ids[0], close.pk)
+        self.assertNotIn(source.pk, ids)
+
+    def test_deleted_articles_leave_the_index(self):
+        source = self.article("Tea brewing", "Green tea brewing temperature and steeping time.")
+        other = self.article("Tea steeping", "Steeping green tea at the right temperature.")
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        self.assertEqual(len(related.get_index()), 1)
+        response = self.client.get(f"/api/articles/{source.pk}/related/")
+        self.assertEqual(response.data["results"], [])
+
+    def test_missing_article_is_encoded_on_the_fly(self):
+        Article.objects.create(title="Unindexed chess openings", content="Sicilian defence.", author=self.user)
+        indexed = self.article("Chess openings", "The Sicilian defence and other chess openings.")
+        unindexed = Article.objects.get(title__startswith="Unindexed")
+        self.assertEqual([pk for pk, _ in related.related_to(unindexed, 3)], [indexed.pk])
+        self.assertEqual(len(related.get_index()), 2)
+
+    def test_slots_are_reused_and_the_index_grows(self):
+        index = related.get_index()
+        vectors = np.eye(index.dim, dtype=np.float32)
+        index.path.mkdir(parents=True)
+        index.create(capacity=2)
+        index.upsert([1, 2, 3], vectors[:3])
+        self.assertEqual(index.meta["capacity"], 4)
+        index.remove(2)
+        index.upsert([4], vectors[3:4])
+        self.assertEqual(index.meta["count"], 3)
+        self.assertEqual(len(index), 3)
+        self.assertEqual(index.query(vectors[3], 1), [(4, 1.0)])
+
+    def test_batched_query_matches_a_single_pass(self):
+        index = related.get_index()
+        rng = np.random.default_rng(0)
+        vectors = rng.standard_normal((50, index.dim)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        index.upsert(list(range(1, 51)), vectors)
+        probe = vectors[7]
+        expected = index.query(probe, 5, exclude=[8])
+        index.batch_rows = 3
+        batched = index.query(probe, 5, exclude=[8])
+        self.assertEqual([pk for pk, _ in batched], [pk for pk, _ in expected])
+        np.testing.assert_allclose([score for _, score in batched], [score for _, score in expected], rtol=1e-5)
+        self.assertNotIn(8, [pk for pk, _ in expected])
+        self.assertEqual(len(expected), 5)
+
+    def test_rebuild_replaces_the_index(self):
+        keep = self.article("Rust ownership", "Borrowing and lifetimes in Rust.")
+        gone = self.article("Go channels", "Goroutines talk over channels.")
+        Article.objects.filter(pk=gone.pk).delete()  # bypasses the index
+        self.assertEqual(related.rebuild_index(Article.objects.all()), 1)
+        index = related.get_index()
+        self.assertEqual(len(index), 1)
+        self.assertIsNotNone(index.vector_of(keep.pk))
+        self.assertIsNone(index.vector_of(gone.pk))
+        self.assertFalse(os.path.exists(os.path.join(self.tmp.name, "index.building")))
+
+
+# ----------------- NEAR-DUPLICATES -----------------
+LOREM = (
+    "The quarterly report shows steady growth in subscriptions across every region, "
+    "driven by the new onboarding flow, lower churn among annual plans, and a marketing "
+    "campaign that focused on small teams rather than large enterprises this year. "
+)
+
+
+@override_settings(AI_AUTO_ANALYSIS={"ENABLED": False})
+class NearDuplicateTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("editor", password="pw")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def article(self, content, title="Report"):
+        return Article.objects.create(title=title, content=content, author=self.user)
+
+    def test_signature_agreement_estimates_jaccard(self):
+        sig = dedup.signature(LOREM * 3)
+        self.assertIsNone(dedup.signature("  ... "))
+        self.assertEqual(dedup.similarity(sig, sig[None, :])[0], 1.0)
+        near = dedup.signature(LOREM * 3 + "One extra closing sentence.")
+        other = dedup.signature("Completely different words about gardening, tomatoes and compost heaps.")
+        self.assertGreater(dedup.similarity(sig, near[None, :])[0], 0.8)
+        self.assertLess(dedup.similarity(sig, other[None, :])[0], 0.1)
+
+    def test_duplicates_endpoint_finds_near_copies(self):
+        original = self.article(LOREM * 3)
+        copy = self.article(LOREM * 3 + "Minor edit.", title="Report (copy)")
+        self.article("Completely different words about gardening, tomatoes and compost heaps.")
+        response = self.client.get(f"/api/articles/{original.pk}/duplicates/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([hit["id"] for hit in response.data["results"]], [copy.pk])
+        response = self.client.get(f"/api/articles/{original.pk}/duplicates/", {"threshold": "high"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_unchanged_content_is_not_refingerprinted(self):
+        article = self.article(LOREM)
+        with mock.patch.object(dedup, "signature", wraps=dedup.signature) as computed:
+            article.title = "Renamed"
+            article.save()
+            computed.assert_not_called()
+            article.content = LOREM + "More."
+            article.save()
+            computed.assert_called_once()
+
+    def test_edited_article_leaves_its_old_buckets(self):
+        original = self.article(LOREM * 3)
+        copy = self.article(LOREM * 3)
+        copy.content = "Completely different words about gardening, tomatoes and compost heaps."
+        copy.save()
+        self.assertEqual(dedup.find_duplicates(original), [])
+
+    @override_settings(ARTICLE_DEDUP={"CHECK_ON_CREATE": "reject"})
+    def test_reject_mode_blocks_create_unless_forced(self):
+        existing = self.article(LOREM * 3)
+        payload = {"title": "Again", "content": LOREM * 3}
+        response = self.client.post("/api/articles/", payload, format="json")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual([hit["id"] for hit in response.data["near_duplicates"]], [existing.pk])
+        self.assertEqual(Article.objects.count(), 1)
+        response = self.client.post("/api/articles/?force=1", payload, format="json")
+        self.assertEqual(response.status_code, 201)
+
+    @override_settings(ARTICLE_DEDUP={"CHECK_ON_CREATE": "flag"})
+    def test_flag_mode_reports_matches(self):
+        existing = self.article(LOREM * 3)
+        response = self.client.post("/api/articles/", {"title": "Again", "content": LOREM * 3}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([hit["id"] for hit in response.data["near_duplicates"]], [existing.pk])
+
+    def test_rebuild_index(self):
+        first = self.article(LOREM * 3)
+        second = self.article(LOREM * 3)
+        self.article("")
+        ArticleFingerprint.objects.all().delete()
+        ArticleLSHBand.objects.all().delete()
+        self.assertEqual(dedup.rebuild_index(Article.objects.all()), 2)
+        self.assertEqual(dedup.find_duplicates(first), [(second.pk, 1.0)])
+
+
+# ----------------- TAG SUGGESTIONS -----------------
+@override_settings(AI_AUTO_ANALYSIS={"ENABLED": False})
+class TagSuggestionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("tagger", password="pw")
+        self.client = APIClient()
+
+    def article(self, title, content, tags=""):
+        return Article.objects.create(title=title, content=content, tags=tags, author=self.user)
+
+    def frequencies(self):
+        return dict(KeywordTerm.objects.filter(doc_freq__gt=0).values_list("term", "doc_freq"))
+
+    def test_candidate_terms(self):
+        self.assertEqual(
+            keywords.candidate_terms("Machine learning in Django"),
+            ["machine", "machine learning", "learning", "django"],
+        )
+        # punctuation ends a phrase; urls, numbers and repetitions are skipped
+        self.assertEqual(
+            keywords.candidate_terms("Redis, see https://redis.io 2024 data data."),
+            ["redis", "data", "data"],
+        )
+
+    def test_incremental_counts_match_a_rebuild(self):
+        first = self.article("Django caching", "Cache views with Redis.")
+        second = self.article("Redis streams", "Consumer groups in Redis.")
+        self.article("Postgres indexes", "B-tree and GIN indexes.")
+        first.content = "Cache views with Memcached."
+        first.save()
+        second.delete()
+        incremental = self.frequencies()
+        self.assertNotIn("redis", incremental)
+        self.assertEqual(incremental["memcached"], 1)
+        self.assertEqual(keywords.rebuild_index(Article.objects.all()), 2)
+        self.assertEqual(self.frequencies(), incremental)
+
+    def test_unchanged_articles_are_not_recounted(self):
+        article = self.article("Django caching", "Cache views with Redis.")
+        article.tags = "django"
+        article.save()
+        self.assertEqual(keywords.index_article(article), 0)
+
+    def test_suggestions_prefer_phrases_and_never_share_words(self):
+        article = self.article(
+            "Machine learning with Django REST",
+            "Machine learning models behind a Django REST API. Machine learning "
+            "inference is slow, so the Django REST views queue it.",
+        )
+        names = [name for name, _ in keywords.suggest_tags(article)]
+        self.assertIn("Machine learning", names)
+        self.assertIn("Django REST", names)
+        words = [word.lower() for name in names for word in name.split()]
+        self.assertEqual(len(words), len(set(words)))
+
+    def test_existing_tags_keep_their_spelling(self):
+        self.article("Older post", "Unrelated.", tags="PostgreSQL")
+        article = self.article("Tuning postgresql", "postgresql vacuum settings and postgresql indexes.")
+        names = [name for name, _ in keywords.suggest_tags(article)]
+        self.assertEqual(names[0], "PostgreSQL")
+
+    def test_endpoint_marks_applied_tags(self):
+        article = self.article("Kubernetes operators", "Writing kubernetes operators in Go.", tags="kubernetes")
+        response = self.client.get(f"/api/articles/{article.pk}/tags/suggest/", {"limit": 3})
+        self.assertEqual(response.status_code, 200)
+        applied = {result["slug"]: result["applied"] for result in response.data["results"]}
+        self.assertLessEqual(len(applied), 3)
+        self.assertTrue(applied["kubernetes"])
+
+    def test_generated_tags(self):
+        self.assertEqual(keywords.generated_tags("Body\n\n### 🏷️ Related Tags\nRust, WASM"), ["Rust", "WASM"])
+        local = keywords.generated_tags("WebAssembly modules compiled from Rust. Rust and WebAssembly together.")
+        self.assertIn("Rust", local)
+        self.assertEqual(keywords.generated_tags("!!!"), list(DEFAULT_TAGS))
+
+
+# ----------------- RENDERING -----------------
+@override_settings(AI_AUTO_ANALYSIS={"ENABLED": False})
+class RenderingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("writer", password="pw")
+        self.client = APIClient()
+
+    def article(self, content, title="Rendered"):
+        return Article.objects.create(title=title, content=content, author=self.user)
+
+    def test_html_is_sanitized(self):
+        html = rendering.render(
+            "<script>alert(1)</script>\n\n"
+            "[click](javascript:alert(1)) [site](https://example.com) <img src=x onerror=alert(1)>\n\n"
+            "Visit www.example.org"
+        )["content_html"]
+        self.assertNotIn("<script", html)
+        self.assertNotIn("javascript:", html)
+        self.assertNotIn("onerror", html)
+        self.assertIn('<a href="https://example.com" rel="nofollow noopener">site</a>', html)
+        self.assertIn('rel="nofollow noopener">www.example.org</a>', html)
+
+    def test_code_is_not_linkified(self):
+        html = rendering.render("```\ncurl https://example.com\n```")["content_html"]
+        self.assertNotIn("<a", html)
+
+    def test_toc_and_reading_time(self):
+        rendered = rendering.render("# Intro\n\n## Setup & *install*\n\n#### Deep\n\n## Intro\n\n" + "word " * 450)
+        self.assertEqual(rendered["content_toc"], [
+            {"level": 1, "id": "intro", "text": "Intro"},
+            {"level": 2, "id": "setup-install", "text": "Setup & install"},
+            {"level": 2, "id": "intro-2", "text": "Intro"},
+        ])
+        self.assertIn('<h2 id="intro-2">', rendered["content_html"])
+        self.assertEqual(rendered["reading_time"], 3)
+        self.assertEqual(rendering.render("")["reading_time"], 0)
+
+    def test_save_renders_only_when_content_changes(self):
+        article = self.article("# Title\n\nBody")
+        self.assertIn('<h1 id="title">Title</h1>', article.content_html)
+        with mock.patch.object(rendering, "render", wraps=rendering.render) as render:
+            article.title = "Renamed"
+            article.save()
+            render.assert_not_called()
+            article.content = "# Other"
+            article.save(update_fields=["content"])
+            render.assert_called_once()
+        article.refresh_from_db()
+        self.assertEqual(article.content_toc, [{"level": 1, "id": "other", "text": "Other"}])
+
+    def test_format_html_serves_the_stored_html(self):
+        article = self.article("**bold**")
+        response = self.client.get(f"/api/articles/{article.pk}/", {"format": "html"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["content"], "<p><strong>bold</strong></p>\n")
+        response = self.client.get(f"/api/articles/{article.pk}/")
+        self.assertEqual(response.json()["content"], "**bold**")
+
+    def test_render_articles_backfills_stale_rows(self):
+        fresh = self.article("fresh")
+        stale = self.article("stale *text*")
+        Article.objects.filter(pk=stale.pk).update(content_html="", content_toc=[], rendered_hash="")
+        out = io.StringIO()
+        call_command("render_articles", "--batch-size", "1", stdout=out)
+        self.assertIn("Rendered 1 of 2 articles", out.getvalue())
+        stale.refresh_from_db()
+        self.assertEqual(stale.content_html, "<p>stale <em>text</em></p>\n")
+        call_command("render_articles", "--force", "--ids", str(fresh.pk), stdout=out)
+        self.assertIn("Rendered 1 of 1 articles", out.getvalue())
+
+
+# ----------------- BULK ANALYSIS -----------------
+# pool threads cannot use tables the test transaction holds locked, so the AI
+# cache stays in memory here
+@override_settings(
+    AI_USAGE_BUFFER={"ENABLED": False}, AI_AUTO_ANALYSIS={"ENABLED": False}, AI_BULK={"RATE_PER_MINUTE": 0},
+    AI_CACHE={"TIERS": ["articles.ai_cache.MemoryTier"]},
+)
+class BulkAnalyzeTests(TestCase):
+    def setUp(self):
+        get_ai_cache.cache_clear()
+        self.addCleanup(get_ai_cache.cache_clear)
+        cache.clear()
+        self.user = User.objects.create_user("bulk", password="pw")
+        self.other = User.objects.create_user("someone", password="pw")
+        self.articles = [
+            Article.objects.create(title=f"Post {n}", content=f"Distinct body number {n}.", author=self.user)
+            for n in range(3)
+        ]
+        self.foreign = Article.objects.create(title="Theirs", content="Another author's body.", author=self.other)
+        self.fake = FakeGeminiClient(seed=1)
+        patcher = mock.patch.object(ai, "client", self.fake)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self, body):
+        return self.client.post("/api/articles/bulk-analyze/", body, format="json")
+
+    def lines(self, response):
+        return [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+
+    def test_validation_errors(self):
+        for body in (
+            {},
+            {"ids": "1,2"},
+            {"ids": [1], "features": ["translate"]},
+            {"filter": {"created_after": "yesterday"}},
+        ):
+            with self.subTest(body=body):
+                self.assertEqual(self.post(body).status_code, 400)
+        with override_settings(AI_BULK={"MAX_ARTICLES": 2}):
+            self.assertEqual(self.post({"filter": {"author": "bulk"}}).status_code, 400)
+
+    def test_streams_one_line_per_task_then_totals(self):
+        ids = [article.pk for article in self.articles] + [self.foreign.pk]
+        response = self.post({"ids": ids, "features": ["summarize"], "save": True})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        *results, totals = self.lines(response)
+        self.assertEqual(sorted(result["article"] for result in results), sorted(ids))
+        self.assertTrue(all(result["summary"] for result in results))
+        self.assertEqual(totals["succeeded"], 4)
+        self.assertEqual(totals["saved"], 3)
+        self.assertEqual(AIUsage.objects.filter(user=self.user, feature="summarize").count(), 4)
+        self.assertEqual(AIUsageDaily.objects.get(user=self.user, feature="summarize").calls, 4)
+        self.assertTrue(all(Article.objects.get(pk=article.pk).summary_published for article in self.articles))
+        self.assertFalse(Article.objects.get(pk=self.foreign.pk).summary)
+
+    def test_failures_are_reported_per_task(self):
+        empty = Article.objects.create(title="Empty", content="   ", author=self.user)
+        response = self.post({"ids": [self.articles[0].pk, empty.pk], "features": ["summarize"]})
+        *results, totals = self.lines(response)
+        errors = {result["article"]: result.get("error") for result in results}
+        self.assertEqual(errors, {self.articles[0].pk: None, empty.pk: "Article content is empty"})
+        self.assertEqual((totals["succeeded"], totals["failed"]), (1, 1))
+        self.assertEqual(AIUsage.objects.filter(user=self.user).count(), 1)
+
+    def test_abandoned_run_cancels_queued_tasks(self):
+        started, release = [], threading.Event()
+        analyze_one = bulk.analyze_one
+
+        def gated(article, *args):
+            started.append(article.pk)
+            if len(started) > 1:
+                release.wait(5)
+            return analyze_one(article, *args)
+
+        queryset = bulk.resolve_articles(ids=[article.pk for article in self.articles])
+        with mock.patch.object(bulk, "analyze_one", gated), mock.patch.object(bulk, "bill_late") as bill_late:
+            results = bulk.iter_bulk_analysis(self.user, queryset, ["summarize"], concurrency=1, enforce_quota=False)
+            self.assertEqual(next(results)["article"], self.articles[0].pk)
+            while len(started) < 2:
+                time.sleep(0.01)
+            results.close()
+            release.set()
+            for _ in range(500):
+                if bill_late.called:
+                    break
+                time.sleep(0.01)
+        # the second task was running and bills itself; the third never started
+        self.assertEqual(started, [self.articles[0].pk, self.articles[1].pk])
+        self.assertEqual(bill_late.call_args.args[1], self.articles[1])
+        self.assertEqual(AIUsage.objects.filter(user=self.user).count(), 1)
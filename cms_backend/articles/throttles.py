@@ -0,0 +1,20 @@
+from rest_framework.exceptions import Throttled
+from rest_framework.throttling import BaseThrottle
+
+from .quota import QuotaExceeded, check_quota
+
+
+class AIQuotaThrottle(BaseThrottle):
+    """
+    Applies the AI_QUOTA per-user and global limits (see articles/quota.py)
+    to AI actions. Rejected requests get 429 with a Retry-After header.
+    """
+
+    def allow_request(self, request, view):
+        if not request.user or not request.user.is_authenticated:
+            return True
+        try:
+            check_quota(request.user)
+        except QuotaExceeded as e:
+            raise Throttled(wait=e.retry_after, detail=str(e))
+        return True
@@ -0,0 +1,448 @@
+# articles/transfer.py
+"""
+Streaming export / import of articles and AI usage as NDJSON or CSV.
+
+Exports read with ``QuerySet.values_list(...).iterator(chunk_size=...)`` and
+yield text chunks, so memory stays flat for any table size; the same
+generators back the /export/ actions (see articles/streaming.py) and
+`manage.py export_data`.
+
+`manage.py import_data` parses the file as a stream and writes BATCH_SIZE
+records per transaction with bulk_create / bulk_update, upserting by
+natural key:
+
+- articles: (author username, title); when several articles share the
+  key, the oldest one is updated.
+- usage: event_id, or (username, feature, created_at) for rows without one.
+
+Authors are resolved by username (optionally created). bulk_create skips
+the Article signals, so each imported batch syncs tags, bumps the response
+cache and updates the search, near-duplicate and related-articles indexes
+here instead (the last three can be skipped and rebuilt afterwards).
+Auto-analysis jobs are not queued for imports.
+"""
+import csv
+import json
+import time
+import traceback
+import uuid
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import dedup, keywords, related, rendering, response_cache, search, tagging
+from .models import AIUsage, Article, content_hash
+from .usage import apply_rollups, rebuild_rollups
+
+
+DEFAULTS = {
+    "CHUNK_SIZE": 2000,
+    "BATCH_SIZE": 500,
+}
+
+FORMATS = ("ndjson", "csv")
+KINDS = ("articles", "usage")
+
+# exported column -> ORM lookup
+ARTICLE_COLUMNS = {
+    "author": "author__username",
+    "title": "title",
+    "content": "content",
+    "tags": "tags",
+    "summary": "summary",
+    "summary_published": "summary_published",
+    "sentiment": "sentiment",
+    "created_at": "created_at",
+    "updated_at": "updated_at",
+}
+USAGE_COLUMNS = {
+    "event_id": "event_id",
+    "user": "user__username",
+    "feature": "feature",
+    "tokens_used": "tokens_used",
+    "estimated_cost": "estimated_cost",
+    "cached": "cached",
+    "coalesced": "coalesced",
+    "local": "local",
+    "article_author": "article__author__username",
+    "article_title": "article__title",
+    "created_at": "created_at",
+}
+COLUMNS = {"articles": ARTICLE_COLUMNS, "usage": USAGE_COLUMNS}
+ARTICLE_FIELDS = ["title", "content", "tags", "summary", "summary_published", "sentiment"]
+USAGE_FIELDS = ["feature", "tokens_used", "estimated_cost", "cached", "coalesced", "local", "article_id", "created_at"]
+MAX_REPORTED_ERRORS = 50
+
+
+def get_setting(name):
+    return getattr(settings, "DATA_TRANSFER", {}).get(name, DEFAULTS[name])
+
+
+def content_type(fmt):
+    return "text/csv" if fmt == "csv" else "application/x-ndjson"
+
+
+# ----------------- EXPORT -----------------
+def export_queryset(kind):
+    model = Article if kind == "articles" else AIUsage
+    return model.objects.order_by("id")
+
+
+def iter_records(kind, queryset, chunk_size=None):
+    """
+    Yield one dict per row; only the exported columns are fetched.
+    """
+    columns = COLUMNS[kind]
+    rows = queryset.values_list(*columns.values()).iterator(chunk_size=chunk_size or get_setting("CHUNK_SIZE"))
+    for row in rows:
+        yield dict(zip(columns, row))
+
+
+class Echo:
+    """A file-like object whose write() hands the line back to csv.writer's caller."""
+
+    def write(self, value):
+        return value
+
+
+class ExportJSONEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder, but datetimes keep their microseconds (as in CSV exports)."""
+
+    def default(self, o):
+        if isinstance(o, datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+def stream_export(kind, queryset, fmt="ndjson", chunk_size=None):
+    """
+    Yield the export as text, CHUNK_SIZE records per chunk.
+    """
+    chunk_size = chunk_size or get_setting("CHUNK_SIZE")
+    writer = csv.writer(Echo()) if fmt == "csv" else None
+    lines = []
+    if writer:
+        lines.append(writer.writerow(list(COLUMNS[kind])))
+    for record in iter_records(kind, queryset, chunk_size):
+        if writer:
+            lines.append(writer.writerow([csv_value(value) for value in record.values()]))
+        else:
+            lines.append(json.dumps(record, cls=ExportJSONEncoder) + "\n")
+        if len(lines) >= chunk_size:
+            yield "".join(lines)
+            lines = []
+    if lines:
+        yield "".join(lines)
+
+
+# ----------------- PARSING -----------------
+def read_records(stream, fmt):
+    """
+    Yield (line number, record or None, error) from a text stream.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record, None
+        return
+    for number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield number, None, f"invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield number, None, "expected a JSON object"
+            continue
+        yield number, record, None
+
+
+def text_value(record, name):
+    value = record.get(name)
+    return None if value in (None, "") else str(value)
+
+
+def bool_value(record, name):
+    value = record.get(name)
+    if isinstance(value, bool):
+        return value
+    return str(value or "").strip().lower() in ("1", "true", "yes")
+
+
+def datetime_value(record, name):
+    value = record.get(name)
+    if not value:
+        return None
+    parsed = parse_datetime(str(value))
+    if parsed is None:
+        raise ValueError(f"'{name}' is not an ISO datetime")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, timezone.get_default_timezone())
+    return parsed
+
+
+# ----------------- IMPORT -----------------
+class Importer:
+    """
+    Upserts records in batches; ``stats`` counts created / updated / failed
+    rows and ``errors`` keeps the first MAX_REPORTED_ERRORS messages.
+    """
+
+    def __init__(self, kind, batch_size=None, create_users=False, reindex=True, dry_run=False):
+        self.kind = kind
+        self.batch_size = batch_size or get_setting("BATCH_SIZE")
+        self.create_users = create_users
+        self.reindex = reindex
+        self.dry_run = dry_run
+        self.stats = {"rows": 0, "created": 0, "updated": 0, "failed": 0, "seconds": 0.0}
+        self.errors = []
+        self.users = {}
+        self.rollup_users = set()
+
+    def fail(self, number, message):
+        self.stats["failed"] += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"line {number}: {message}")
+
+    def run(self, stream, fmt, progress=None):
+        """
+        Import every record of ``stream``; ``progress(stats)`` is called after each batch.
+        """
+        self.started = time.perf_counter()
+        batch = []
+        for number, record, error in read_records(stream, fmt):
+            self.stats["rows"] += 1
+            if error:
+                self.fail(number, error)
+                continue
+            batch.append((number, record))
+            if len(batch) == self.batch_size:
+                self.write_batch(batch)
+                batch = []
+                if progress:
+                    progress(self.progress())
+        if batch:
+            self.write_batch(batch)
+        if self.rollup_users and not self.dry_run:
+            # updated usage rows changed totals already folded into the rollups
+            for user in User.objects.filter(pk__in=self.rollup_users):
+                rebuild_rollups(user=user)
+        return self.progress()
+
+    def progress(self):
+        elapsed = time.perf_counter() - self.started
+        self.stats["seconds"] = round(elapsed, 3)
+        return {**self.stats, "rows_per_second": round(self.stats["rows"] / elapsed, 1) if elapsed else None}
+
+    def write_batch(self, batch):
+        write = self.import_articles if self.kind == "articles" else self.import_usage
+        created = updated = 0
+        rolled_back = self.dry_run
+        failed, reported = self.stats["failed"], len(self.errors)
+        try:
+            with transaction.atomic():
+                created, updated = write(batch)
+                if self.dry_run:
+                    transaction.set_rollback(True)
+        except Exception as e:
+            print("❌ Import batch failed:", e)
+            print(traceback.format_exc())
+            # every row of the batch fails, whatever was counted before
+            self.stats["failed"] = failed
+            del self.errors[reported:]
+            for number, _ in batch:
+                self.fail(number, f"batch rolled back: {e}")
+            created = updated = 0
+            rolled_back = True
+        if rolled_back:
+            # users created inside the batch went away with it
+            self.users = {}
+        self.stats["created"] += created
+        self.stats["updated"] += updated
+
+    def resolve_users(self, batch, field):
+        names = {str(record.get(field) or "").strip() for _, record in batch} - {""} - set(self.users)
+        for user in User.objects.filter(username__in=names):
+            self.users[user.username] = user
+        for name in names - set(self.users):
+            if self.create_users:
+                self.users[name] = User.objects.create_user(username=name)
+        return self.users
+
+    # ---------------- articles ----------------
+    def import_articles(self, batch):
+        users = self.resolve_users(batch, "author")
+        records = {}
+        for number, record in batch:
+            author = users.get(str(record.get("author") or "").strip())
+            title = text_value(record, "title")
+            if author is None:
+                self.fail(number, f"unknown author {record.get('author')!r}")
+                continue
+            if not title or record.get("content") is None:
+                self.fail(number, "'title' and 'content' are required")
+                continue
+            try:
+                created_at = datetime_value(record, "created_at")
+                updated_at = datetime_value(record, "updated_at")
+            except ValueError as e:
+                self.fail(number, str(e))
+                continue
+            values = {
+                "title": title[:255],
+                "content": str(record["content"]),
+                "tags": text_value(record, "tags"),
+                "summary": text_value(record, "summary"),
+                "summary_published": bool_value(record, "summary_published"),
+                "sentiment": text_value(record, "sentiment"),
+            }
+            # the last record wins when a batch repeats a key
+            records[(author.pk, values["title"])] = (values, created_at, updated_at)
+
+        existing = {}
+        for article in Article.objects.filter(
+            author_id__in={key[0] for key in records}, title__in={key[1] for key in records}
+        ).order_by("id"):
+            existing.setdefault((article.author_id, article.title), article)
+
+        now = timezone.now()
+        created, updated = [], []
+        for key, (values, created_at, updated_at) in records.items():
+            article = existing.get(key)
+            if article is None:
+                article = Article(author_id=key[0], **values)
+                created.append((article, created_at or now, updated_at or created_at or now))
+            else:
+                for field, value in values.items():
+                    setattr(article, field, value)
+                article.updated_at = updated_at or now
+                updated.append(article)
+            article.content_hash = content_hash(article.content)
+            rendering.render_article(article)
+
+        if created:
+            Article.objects.bulk_create([article for article, _, _ in created], batch_size=self.batch_size)
+            # auto_now_add / auto_now override the file's timestamps on insert; restore them
+            for article, created_at, updated_at in created:
+                article.created_at, article.updated_at = created_at, updated_at
+            Article.objects.bulk_update(
+                [article for article, _, _ in created], ["created_at", "updated_at"], batch_size=self.batch_size
+            )
+        if updated:
+            Article.objects.bulk_update(
+                updated, ARTICLE_FIELDS + ["content_hash", "updated_at"] + rendering.RENDERED_FIELDS, batch_size=self.batch_size
+            )
+        articles = [article for article, _, _ in created] + updated
+        if articles and not self.dry_run:
+            self.after_write(articles, created=bool(created))
+        return len(created), len(updated)
+
+    def after_write(self, articles, created=False):
+        """
+        What the Article signals would have done; the indexes that have
+        rebuild commands can be skipped (``reindex=False``).
+        """
+        relisted = False
+        for article in articles:
+            relisted = tagging.sync_article_tags(article) or relisted
+            if self.reindex:
+                search.index_article(article)
+                dedup.index_article(article)
+        response_cache.article_changed(
+            *[article.pk for article in articles], created=created, relisted=relisted
+        )
+        if self.reindex:
+            keywords.index_articles(articles)
+            transaction.on_commit(lambda: related.index_articles(articles))
+
+    # ---------------- usage ----------------
+    def import_usage(self, batch):
+        users = self.resolve_users(batch, "user")
+        article_keys = {
+            (str(record.get("article_author") or ""), str(record.get("article_title") or ""))
+            for _, record in batch if record.get("article_title")
+        }
+        articles = {}
+        if article_keys:
+            for article_id, author, title in Article.objects.filter(
+                author__username__in={key[0] for key in article_keys}, title__in={key[1] for key in article_keys}
+            ).order_by("-id").values_list("id", "author__username", "title"):
+                articles[(author, title)] = article_id
+
+        records = {}
+        for number, record in batch:
+            user = users.get(str(record.get("user") or "").strip())
+            if user is None:
+                self.fail(number, f"unknown user {record.get('user')!r}")
+                continue
+            try:
+                event_id = uuid.UUID(str(record["event_id"])) if record.get("event_id") else None
+                created_at = datetime_value(record, "created_at") or timezone.now()
+                tokens = int(record.get("tokens_used") or 0)
+                cost = Decimal(str(record.get("estimated_cost") or 0))
+            except (ValueError, InvalidOperation) as e:
+                self.fail(number, f"invalid value: {e}")
+                continue
+            feature = text_value(record, "feature")
+            if not feature:
+                self.fail(number, "'feature' is required")
+                continue
+            article_id = articles.get((str(record.get("article_author") or ""), str(record.get("article_title") or "")))
+            # the last record wins when a batch repeats a key
+            key = event_id or (user.pk, feature, created_at)
+            records[key] = AIUsage(
+                event_id=event_id, user=user, feature=feature, tokens_used=tokens, estimated_cost=cost,
+                cached=bool_value(record, "cached"), coalesced=bool_value(record, "coalesced"),
+                local=bool_value(record, "local"), article_id=article_id, created_at=created_at,
+            )
+        records = list(records.values())
+
+        by_event = AIUsage.objects.in_bulk(
+            [row.event_id for row in records if row.event_id], field_name="event_id"
+        )
+        without_event = [row for row in records if not row.event_id]
+        by_natural = {}
+        if without_event:
+            for row in AIUsage.objects.filter(
+                event_id__isnull=True,
+                user_id__in={row.user_id for row in without_event},
+                created_at__in={row.created_at for row in without_event},
+            ):
+                by_natural[(row.user_id, row.feature, row.created_at)] = row
+
+        created, updated = [], []
+        for row in records:
+            current = by_event.get(row.event_id) if row.event_id else by_natural.get((row.user_id, row.feature, row.created_at))
+            if current is None:
+                created.append(row)
+                continue
+            for field in USAGE_FIELDS:
+                setattr(current, field, getattr(row, field))
+            updated.append(current)
+            self.rollup_users.add(current.user_id)
+
+        if created:
+            AIUsage.objects.bulk_create(created, batch_size=self.batch_size)
+            apply_rollups(created)
+        if updated:
+            AIUsage.objects.bulk_update(updated, USAGE_FIELDS, batch_size=self.batch_size)
+        return len(created), len(updated)
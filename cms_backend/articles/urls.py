@@ -4,16 +4,26 @@ from .views import (
     RegisterView,
     ArticleViewSet,
     AIUsageViewSet,
+    AIJobViewSet,
+    TagViewSet,
     CurrentUserView,
 )
+from . import async_views
 
 router = DefaultRouter()
 router.register(r'articles', ArticleViewSet, basename='articles')
 router.register(r'usage', AIUsageViewSet, basename='aiusage')
+router.register(r'jobs', AIJobViewSet, basename='aijobs')
+router.register(r'tags', TagViewSet, basename='tags')
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
     path('auth/me/', CurrentUserView.as_view(), name='current-user'),
 
+    # Native async AI actions (serve with an ASGI server, see Procfile)
+    path('async/articles/generate/', async_views.generate, name='async-generate'),
+    path('async/articles/<int:pk>/summarize/', async_views.summarize, name='async-summarize'),
+    path('async/articles/<int:pk>/sentiment/', async_views.sentiment, name='async-sentiment'),
+
     path('', include(router.urls)),
 ]
@@ -0,0 +1,131 @@
+# articles/usage.py
+"""
+Daily AIUsage rollups.
+
+Every path that records AIUsage also calls ``apply_rollups`` with the new
+rows, which folds them into AIUsageDaily with F() increments. Summary
+queries then read O(days x features) rollup rows instead of every call.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import AIUsage, AIUsageDaily
+
+GROUP_BY_FIELDS = {
+    "day": ["day"],
+    "feature": ["feature"],
+    "day_feature": ["day", "feature"],
+    "total": [],
+}
+
+
+def apply_rollups(rows):
+    """
+    Fold saved AIUsage rows into their (user, feature, day) rollups.
+    """
+    deltas = defaultdict(lambda: {"calls": 0, "cached_calls": 0, "coalesced_calls": 0, "local_calls": 0, "tokens_used": 0, "estimated_cost": Decimal("0")})
+    for row in rows:
+        day = timezone.localdate(row.created_at or timezone.now())
+        delta = deltas[(row.user_id, row.feature, day)]
+        delta["calls"] += 1
+        delta["cached_calls"] += 1 if row.cached else 0
+        delta["coalesced_calls"] += 1 if row.coalesced else 0
+        delta["local_calls"] += 1 if row.local else 0
+        delta["tokens_used"] += row.tokens_used or 0
+        delta["estimated_cost"] += Decimal(str(row.estimated_cost or 0))
+
+    for (user_id, feature, day), delta in deltas.items():
+        _increment(user_id, feature, day, delta)
+
+
+def _increment(user_id, feature, day, delta):
+    lookup = {"user_id": user_id, "feature": feature, "day": day}
+    changes = {field: F(field) + value for field, value in delta.items()}
+    if AIUsageDaily.objects.filter(**lookup).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            AIUsageDaily.objects.create(**lookup, **delta)
+    except IntegrityError:
+        # another writer created the row first; add on top of theirs
+        AIUsageDaily.objects.filter(**lookup).update(**changes)
+
+
+def rebuild_rollups(user=None):
+    """
+    Recompute rollups from the raw AIUsage table. Returns the number of rollup rows.
+    """
+    usage = AIUsage.objects.all()
+    rollups = AIUsageDaily.objects.all()
+    if user is not None:
+        usage = usage.filter(user=user)
+        rollups = rollups.filter(user=user)
+
+    grouped = (
+        usage.annotate(day=TruncDate("created_at"))
+        .values("user_id", "feature", "day")
+        .annotate(
+            calls=Count("id"),
+            cached_calls=Count("id", filter=Q(cached=True)),
+            coalesced_calls=Count("id", filter=Q(coalesced=True)),
+            local_calls=Count("id", filter=Q(local=True)),
+            tokens=Sum("tokens_used"),
+            cost=Sum("estimated_cost"),
+        )
+        .order_by()
+    )
+    with transaction.atomic():
+        rollups.delete()
+        created = AIUsageDaily.objects.bulk_create(
+            [
+                AIUsageDaily(
+                    user_id=row["user_id"],
+                    feature=row["feature"],
+                    day=row["day"],
+                    calls=row["calls"],
+                    cached_calls=row["cached_calls"],
+                    coalesced_calls=row["coalesced_calls"],
+                    local_calls=row["local_calls"],
+                    tokens_used=row["tokens"] or 0,
+                    estimated_cost=row["cost"] or 0,
+                )
+                for row in grouped.iterator()
+            ],
+            batch_size=1000,
+        )
+    return len(created)
+
+
+def usage_summary(user, start=None, end=None, group_by="day"):
+    """
+    Aggregate the user's rollups between ``start`` and ``end`` (inclusive dates).
+    """
+    rollups = AIUsageDaily.objects.filter(user=user)
+    if start:
+        rollups = rollups.filter(day__gte=start)
+    if end:
+        rollups = rollups.filter(day__lte=end)
+
+    fields = GROUP_BY_FIELDS[group_by]
+    totals = dict(
+        calls=Sum("calls"),
+        cached_calls=Sum("cached_calls"),
+        coalesced_calls=Sum("coalesced_calls"),
+        local_calls=Sum("local_calls"),
+        tokens_used=Sum("tokens_used"),
+        estimated_cost=Sum("estimated_cost"),
+    )
+    if not fields:
+        rows = [rollups.aggregate(**totals)]
+    else:
+        rows = list(rollups.values(*fields).annotate(**totals).order_by(*fields))
+    for row in rows:
+        for key in totals:
+            row[key] = row[key] or 0
+        row["estimated_cost"] = round(Decimal(row["estimated_cost"]), 6)
+    return rows
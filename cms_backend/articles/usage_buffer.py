@@ -0,0 +1,288 @@
+# articles/usage_buffer.py
+"""
+Buffered AIUsage writer.
+
+Requests hand usage events to an in-process buffer instead of inserting a
+row each; a background thread flushes them with one bulk_create (plus the
+daily rollup update) when MAX_SIZE events are waiting or FLUSH_INTERVAL
+seconds have passed, and once more at interpreter exit.
+
+With SPOOL_DIR set, every event is also appended to a per-process JSONL
+spool before it is acknowledged. Spool files left behind by a crashed
+process are replayed on the next start; each event carries a unique
+``event_id`` so replays never double-insert.
+
+Events whose article was deleted before the flush are written with no
+article (AIUsage.article is SET_NULL); events of deleted users are dropped.
+If a batch still fails, its events are retried one at a time: rows the
+database rejects are dead-lettered (logged, and appended to
+``usage-dead.jsonl`` in SPOOL_DIR) and only events that hit a transient
+error go back into the buffer.
+"""
+import atexit
+import glob
+import json
+import os
+import threading
+import traceback
+import uuid
+from decimal import Decimal
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import DataError, IntegrityError, connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import AIUsage, Article
+from .usage import apply_rollups
+
+
+# the database (or field validation) rejecting the row: retrying the same
+# event can never fix it. Anything else, bugs included, is not swallowed.
+PERMANENT_ERRORS = (IntegrityError, DataError, ValueError)
+DEAD_LETTER_FILE = "usage-dead.jsonl"
+
+DEFAULTS = {
+    "ENABLED": True,
+    "MAX_SIZE": 100,
+    "FLUSH_INTERVAL": 2.0,
+    "SPOOL_DIR": None,
+}
+
+
+def get_setting(name):
+    return getattr(settings, "AI_USAGE_BUFFER", {}).get(name, DEFAULTS[name])
+
+
+def make_event(user, article, feature, tokens, estimated_cost, cached=False, coalesced=False, local=False):
+    return {
+        "event_id": str(uuid.uuid4()),
+        "user_id": user.pk,
+        "article_id": article.pk if article is not None else None,
+        "feature": feature,
+        "tokens_used": tokens,
+        "estimated_cost": str(estimated_cost),
+        "cached": cached,
+        "coalesced": coalesced,
+        "local": local,
+        "created_at": timezone.now().isoformat(),
+    }
+
+
+def event_to_row(event):
+    return AIUsage(
+        event_id=event["event_id"],
+        user_id=event["user_id"],
+        article_id=event["article_id"],
+        feature=event["feature"],
+        tokens_used=event["tokens_used"],
+        estimated_cost=Decimal(event["estimated_cost"]),
+        cached=event["cached"],
+        # spools written before coalescing existed have no such key
+        coalesced=event.get("coalesced", False),
+        local=event.get("local", False),
+        created_at=parse_datetime(event["created_at"]),
+    )
+
+
+def drop_missing_references(events):
+    """
+    Clear the article of events whose article no longer exists and drop the
+    events of deleted users, mirroring what the foreign keys would have done.
+    """
+    article_ids = {e["article_id"] for e in events if e["article_id"] is not None}
+    articles = set(Article.objects.filter(pk__in=article_ids).values_list("pk", flat=True)) if article_ids else set()
+    users = set(User.objects.filter(pk__in={e["user_id"] for e in events}).values_list("pk", flat=True))
+    return [
+        e if e["article_id"] is None or e["article_id"] in articles else {**e, "article_id": None}
+        for e in events if e["user_id"] in users
+    ]
+
+
+def write_events(events, skip_existing=False):
+    """
+    Insert events as AIUsage rows and fold them into the daily rollups.
+    ``skip_existing`` drops events already in the table (spool replay).
+    """
+    if skip_existing:
+        seen = set(
+            str(pk) for pk in AIUsage.objects.filter(
+                event_id__in=[e["event_id"] for e in events]
+            ).values_list("event_id", flat=True)
+        )
+        events = [e for e in events if e["event_id"] not in seen]
+    if events:
+        events = drop_missing_references(events)
+    if not events:
+        return 0
+    rows = [event_to_row(e) for e in events]
+    with transaction.atomic():
+        AIUsage.objects.bulk_create(rows, batch_size=500)
+        apply_rollups(rows)
+    return len(rows)
+
+
+class UsageBuffer:
+    def __init__(self, max_size=None, flush_interval=None, spool_dir=None):
+        self.max_size = max_size or get_setting("MAX_SIZE")
+        self.flush_interval = flush_interval or get_setting("FLUSH_INTERVAL")
+        self.spool_dir = spool_dir if spool_dir is not None else get_setting("SPOOL_DIR")
+        self.events = []
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.rotation = 0
+        self.thread = None
+        if self.spool_dir:
+            os.makedirs(self.spool_dir, exist_ok=True)
+            self.replay_orphaned_spools()
+
+    # ---------------- spool ----------------
+    def spool_path(self):
+        return os.path.join(str(self.spool_dir), f"usage-{os.getpid()}.jsonl")
+
+    def append_to_spool(self, event):
+        with open(self.spool_path(), "a", encoding="utf-8") as fh:
+            fh.write(json.dumps(event) + "\n")
+            fh.flush()
+            os.fsync(fh.fileno())
+
+    def rotate_spool(self):
+        """
+        Move the live spool aside (called with ``self.lock`` held, together with
+        swapping the in-memory buffer) so new events start a fresh file.
+        """
+        path = self.spool_path()
+        if not os.path.exists(path):
+            return None
+        self.rotation += 1
+        rotated = f"{path}.{self.rotation}.flushing"
+        os.replace(path, rotated)
+        return rotated
+
+    def replay_orphaned_spools(self):
+        """
+        Insert events from spool files whose owning process is gone.
+        """
+        for path in glob.glob(os.path.join(str(self.spool_dir), "usage-*.jsonl*")):
+            pid = os.path.basename(path).split("-", 1)[1].split(".", 1)[0]
+            if not pid.isdigit() or pid_alive(int(pid)):
+                continue
+            try:
+                with open(path, encoding="utf-8") as fh:
+                    events = [json.loads(line) for line in fh if line.strip()]
+                count, retry = self.write_each(events, skip_existing=True)
+                if retry:
+                    print(f"⚠️ Replayed {count} usage events from {path}, {len(retry)} left for the next start")
+                    continue
+                os.remove(path)
+                print(f"♻️ Replayed {count} usage events from {path}")
+            except Exception as e:
+                print("⚠️ Usage spool replay failed:", path, e)
+
+    # ---------------- buffer ----------------
+    def add(self, event):
+        with self.lock:
+            if self.spool_dir:
+                self.append_to_spool(event)
+            self.events.append(event)
+            full = len(self.events) >= self.max_size
+        self.ensure_thread()
+        if full:
+            self.wakeup.set()
+
+    def dead_letter(self, event, error):
+        print("❌ Dropping usage event the database rejects:", event.get("event_id"), error)
+        if self.spool_dir:
+            with open(os.path.join(str(self.spool_dir), DEAD_LETTER_FILE), "a", encoding="utf-8") as fh:
+                fh.write(json.dumps({**event, "error": str(error)}) + "\n")
+
+    def write_each(self, events, skip_existing=False):
+        """
+        Write events one at a time after a failed batch. Returns (written,
+        events to retry); rejected events are dead-lettered, and the first
+        transient error stops the pass, leaving the rest for the next flush.
+        """
+        written = 0
+        for index, event in enumerate(events):
+            try:
+                written += write_events([event], skip_existing=skip_existing)
+            except PERMANENT_ERRORS as e:
+                self.dead_letter(event, e)
+            except Exception as e:
+                print("❌ Usage write error:", e)
+                print(traceback.format_exc())
+                return written, events[index:]
+        return written, []
+
+    def flush(self):
+        """
+        Write everything buffered so far. When the batch fails its events are
+        written one by one; those that fail transiently go back to the front
+        of the buffer (and their spool file is kept) for the next flush.
+        """
+        with self.flush_lock:
+            with self.lock:
+                events, self.events = self.events, []
+                if self.spool_dir:
+                    self.rotate_spool()
+            if not events:
+                return 0
+            try:
+                count = write_events(events)
+            except Exception as e:
+                print("❌ Usage flush error:", e)
+                print(traceback.format_exc())
+                count, retry = self.write_each(events)
+                if retry:
+                    with self.lock:
+                        self.events[:0] = retry
+                    return count
+            if self.spool_dir:
+                # every earlier rotated file's events were re-queued and are now written
+                for path in glob.glob(f"{self.spool_path()}.*.flushing"):
+                    os.remove(path)
+            return count
+
+    def ensure_thread(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        with self.lock:
+            if self.thread is not None and self.thread.is_alive():
+                return
+            self.thread = threading.Thread(target=self.run, name="usage-buffer", daemon=True)
+            self.thread.start()
+
+    def run(self):
+        while True:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            try:
+                self.flush()
+            finally:
+                connection.close()
+
+
+def pid_alive(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+@lru_cache(maxsize=None)
+def get_usage_buffer():
+    buffer = UsageBuffer()
+    atexit.register(buffer.flush)
+    return buffer
+
+
+def buffering_enabled():
+    return get_setting("ENABLED")
@@ -1,81 +1,165 @@
 # articles/views.py
-import os
+import json
+import math
 import traceback
-from dotenv import load_dotenv
-from rest_framework import viewsets, status, generics
+from django.db.models.functions import Substr
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.text import slugify
+from rest_framework import viewsets, status, generics, mixins
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.views import APIView
-from google import genai
-from google.genai import types
-from .models import Article, AIUsage, User
-from .serializers import ArticleSerializer, AIUsageSerializer, UserRegisterSerializer
+from .models import Article, AIUsage, AIJob, Tag, User
+from .serializers import (
+    EXCERPT_LENGTH,
+    ArticleSerializer,
+    ArticleListSerializer,
+    AIUsageSerializer,
+    AIJobSerializer,
+    TagSerializer,
+    UserRegisterSerializer,
+)
+from .pagination import ArticleCursorPagination
+from .usage import GROUP_BY_FIELDS, usage_summary
 from .permissions import IsAuthorOrReadOnly
+from .throttles import AIQuotaThrottle
+from .analysis import stored_result
+from .tagging import parse_tag_string
+from .renderers import ArticleHTMLRenderer, CSVRenderer, EventStreamRenderer, NDJSONRenderer
+from . import bulk
+from . import conditional
+from . import dedup
+from . import keywords
+from . import response_cache
+from . import related as related_articles
+from . import search as article_search
+from . import transfer
+from . import ai
+from .ai import estimate_usage, get_ai_cache, record_usage, result_cache_key
+from .keywords import generated_tags
+from .prompts import GENERATE_PROMPT
+from .resilience import AIUnavailable
+from .streaming import streaming_response
+
+# ?tier= values accepted by the sentiment actions
+SENTIMENT_TIERS = (None, "local", "llm")
+
+
+def query_flag(request, name):
+    return request.query_params.get(name, "").lower() in ("1", "true", "yes")
+
+
+def unavailable_response(error):
+    """
+    503 for a Gemini outage (open circuit, timeouts), with Retry-After when known.
+    """
+    headers = {"Retry-After": str(math.ceil(error.retry_after))} if error.retry_after else None
+    return Response({"error": str(error)}, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers=headers)
 
-# Load env
-load_dotenv()
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
-# Init Gemini client (safe)
-try:
-    client = genai.Client(api_key=GEMINI_API_KEY) if GEMINI_API_KEY else None
-except Exception as e:
-    print("⚠️ Gemini init error:", e)
-    client = None
+def duplicate_results(matches):
+    """
+    [(pk, similarity)] from articles.dedup -> response rows, best match first.
+    """
+    articles = Article.objects.select_related("author").only(
+        "id", "title", "created_at", "author__username"
+    ).in_bulk([pk for pk, _ in matches])
+    return [
+        {
+            "id": pk,
+            "title": articles[pk].title,
+            "similarity": round(score, 3),
+            "author": articles[pk].author.username,
+            "created_at": articles[pk].created_at,
+        }
+        for pk, score in matches if pk in articles
+    ]
+
+
+def export_response(request, kind, queryset):
+    """
+    Stream ``queryset`` as NDJSON, or CSV when that renderer was negotiated.
+    """
+    fmt = "csv" if request.accepted_renderer.format == "csv" else "ndjson"
+    response = streaming_response(request, transfer.stream_export(kind, queryset, fmt), transfer.content_type(fmt))
+    response["Content-Disposition"] = f'attachment; filename="{kind}-{timezone.now():%Y%m%d-%H%M%S}.{fmt}"'
+    return response
+
 
-# Token pricing example: $0.02 per 1k tokens -> 0.00002 per token
-TOKEN_PRICE = 0.00002
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 
-def extract_gemini_text(resp):
+def stream_generate_events(user, topic, refresh=False):
     """
-    Robust extractor for Gemini generate_content responses.
-    Returns the best available text or empty string.
+    Yield Server-Sent Events for a streamed blog generation: one ``chunk`` event
+    per markdown fragment, then a final ``done`` event carrying tags + usage
+    (or an ``error`` event). AIUsage is written once the stream has finished.
     """
-    if not resp:
-        return ""
+    spec = GENERATE_PROMPT
+    cache = get_ai_cache()
+    use_cache = cache.enabled_for(spec.feature)
+    key = result_cache_key(spec, topic)
+    parts = []
+    finished = False
 
-    # common attribute
     try:
-        if hasattr(resp, "text") and resp.text:
-            return resp.text.strip()
-    except Exception:
-        pass
+        hit = cache.get(key) if use_cache and not refresh else None
+        cached = bool(hit and hit.get("text"))
+        if cached:
+            text = hit["text"]
+            yield sse_event("chunk", {"text": text})
+        else:
+            for chunk in ai.stream_gemini(spec, spec.render(topic=topic)):
+                # keep whitespace as-is; chunks are concatenated by the client
+                piece = getattr(chunk, "text", None) or ""
+                if piece:
+                    parts.append(piece)
+                    yield sse_event("chunk", {"text": piece})
+            text = "".join(parts).strip()
+            if text and use_cache:
+                cache.set(key, {"text": text}, feature=spec.feature, model=spec.model)
+
+        finished = True
+        if not text:
+            yield sse_event("error", {"error": "Empty AI response"})
+            return
+
+        tokens, estimated_cost = estimate_usage(topic, text, cached)
+        record_usage(user, None, "generate", tokens, estimated_cost, cached=cached)
+
+        yield sse_event("done", {
+            "topic": topic,
+            "tags": generated_tags(text),
+            "tokens_used": tokens,
+            "estimated_cost": estimated_cost,
+            "cached": cached,
+        })
 
-    # other possible attributes
-    try:
-        if hasattr(resp, "output_text") and resp.output_text:
-            return resp.output_text.strip()
-    except Exception:
-        pass
+    except GeneratorExit:
+        # client went away mid-stream; still bill the tokens already produced
+        bill_partial_stream(user, topic, parts, finished)
+        raise
 
-    # candidates -> candidate.content.parts[*].text
-    try:
-        if hasattr(resp, "candidates") and resp.candidates:
-            cand = resp.candidates[0]
-            content = getattr(cand, "content", None)
-            parts = getattr(content, "parts", None)
-            if parts:
-                texts = []
-                for p in parts:
-                    # p may be dict-like or object-like
-                    text = getattr(p, "text", None) if hasattr(p, "text") else (p.get("text") if isinstance(p, dict) else None)
-                    if text:
-                        texts.append(text)
-                if texts:
-                    return " ".join(texts).strip()
-    except Exception:
-        pass
-
-    # parsed (if present)
-    try:
-        if hasattr(resp, "parsed") and resp.parsed:
-            return str(resp.parsed).strip()
-    except Exception:
-        pass
+    except Exception as e:
+        print("❌ AI Error (generate stream):", e)
+        print(traceback.format_exc())
+        # Gemini failed mid-stream; the chunks sent so far were still generated
+        bill_partial_stream(user, topic, parts, finished)
+        yield sse_event("error", {"error": str(e)})
 
-    return ""
+
+def bill_partial_stream(user, topic, parts, finished):
+    """
+    Record usage for the chunks of a stream that ended before its ``done`` event.
+    """
+    if parts and not finished:
+        tokens, estimated_cost = estimate_usage(topic, "".join(parts))
+        record_usage(user, None, "generate", tokens, estimated_cost)
 
 
 # ----------------- USER REGISTRATION -----------------
@@ -86,20 +170,226 @@ class RegisterView(generics.CreateAPIView):
 
 # ----------------- ARTICLE MANAGEMENT -----------------
 class ArticleViewSet(viewsets.ModelViewSet):
-    queryset = Article.objects.all().order_by("-created_at")
+    queryset = Article.objects.select_related("author").order_by("-created_at", "-id")
     serializer_class = ArticleSerializer
     permission_classes = [IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly]
+    pagination_class = ArticleCursorPagination
+    # ?format=html returns the pre-rendered HTML content
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, ArticleHTMLRenderer]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == "list":
+            # one extra char lets the serializer tell whether to add an ellipsis
+            queryset = self.filter_by_tag(queryset).defer("content", "content_html", "content_toc").annotate(
+                excerpt=Substr("content", 1, EXCERPT_LENGTH + 1)
+            )
+        return queryset
+
+    def filter_by_tag(self, queryset):
+        tag = self.request.query_params.get("tag")
+        if tag:
+            queryset = queryset.filter(tag_set__slug=slugify(tag))
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == "list":
+            return ArticleListSerializer
+        return super().get_serializer_class()
+
+    # ---------------- Conditional GET (ETag, detail Last-Modified) + anonymous response cache ----------------
+    def list(self, request, *args, **kwargs):
+        cached, self.response_cache_pending = response_cache.lookup(request)
+        if cached is not None:
+            return cached
+        etag, last_modified = conditional.list_validators(request, self.filter_by_tag(Article.objects.all()))
+        response = conditional.not_modified(request, etag, last_modified)
+        if response is None:
+            response = super().list(request, *args, **kwargs)
+        return conditional.set_validators(response, etag, last_modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        cached, self.response_cache_pending = response_cache.lookup(request, pk=kwargs[self.lookup_field])
+        if cached is not None:
+            return cached
+        etag, last_modified = conditional.detail_validators(request, Article.objects.all(), kwargs[self.lookup_field])
+        response = conditional.not_modified(request, etag, last_modified)
+        if response is None:
+            response = super().retrieve(request, *args, **kwargs)
+        return conditional.set_validators(response, etag, last_modified)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        pending = getattr(self, "response_cache_pending", None)
+        if pending and response.status_code == status.HTTP_200_OK:
+            page = getattr(self.paginator, "page", None) if self.action == "list" else None
+            response_cache.store(response, pending, [article.pk for article in page or []])
+        return response
+
+    def create(self, request, *args, **kwargs):
+        try:
+            response = super().create(request, *args, **kwargs)
+        except dedup.NearDuplicate as e:
+            return Response({
+                "error": "Near-duplicate of existing articles; resend with ?force=1 to save anyway",
+                "near_duplicates": e.matches,
+            }, status=status.HTTP_409_CONFLICT)
+        if getattr(self, "near_duplicates", None):
+            response.data["near_duplicates"] = self.near_duplicates
+        return response
 
     def perform_create(self, serializer):
+        # optional pre-publish near-duplicate check (ARTICLE_DEDUP["CHECK_ON_CREATE"])
+        mode = dedup.get_setting("CHECK_ON_CREATE")
+        if dedup.get_setting("ENABLED") and mode in ("flag", "reject") and not query_flag(self.request, "force"):
+            matches = duplicate_results(dedup.find_similar_text(serializer.validated_data.get("content", "")))
+            if matches and mode == "reject":
+                raise dedup.NearDuplicate(matches)
+            self.near_duplicates = matches
         serializer.save(author=self.request.user)
 
+    # ---------------- Full-text Search ----------------
+    @action(detail=False, methods=["get"])
+    def search(self, request):
+        """
+        Ranked full-text search over title, content and tags.
+        GET /articles/search/?q=...&page_size=20&cursor=...
+        Returns BM25 / ts_rank ordered hits with <mark>-highlighted title and snippet.
+        """
+        q = request.query_params.get("q", "").strip()
+        if not q:
+            return Response({"error": "Query parameter 'q' is required"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            page_size = min(max(int(request.query_params.get("page_size", 20)), 1), 100)
+        except ValueError:
+            page_size = 20
+
+        try:
+            hits, next_cursor = article_search.search(q, limit=page_size, cursor=request.query_params.get("cursor"))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        articles = Article.objects.select_related("author").only(
+            "id", "title", "tags", "created_at", "author__username"
+        ).in_bulk([hit["id"] for hit in hits])
+        results = []
+        for hit in hits:
+            article = articles.get(hit["id"])
+            if article is None:
+                continue
+            results.append({
+                "id": article.id,
+                "title": article.title,
+                "title_highlight": hit["title_highlight"],
+                "snippet": hit["snippet"],
+                "score": hit["score"],
+                "tags": article.tags,
+                "author": article.author.username,
+                "created_at": article.created_at,
+            })
+
+        next_url = None
+        if next_cursor:
+            next_url = replace_query_param(request.build_absolute_uri(), "cursor", next_cursor)
+        return Response({"next": next_url, "results": results}, status=status.HTTP_200_OK)
+
+    # ---------------- Related Articles ----------------
+    @action(detail=True, methods=["get"])
+    def related(self, request, pk=None):
+        """
+        Articles most similar to this one, from the local vector index.
+        GET /articles/{id}/related/?k=5
+        """
+        if not related_articles.get_setting("ENABLED"):
+            return Response({"error": "Related articles are disabled"}, status=status.HTTP_404_NOT_FOUND)
+        article = self.get_object()
+        try:
+            k = min(max(int(request.query_params.get("k", 5)), 1), related_articles.get_setting("MAX_K"))
+        except ValueError:
+            k = 5
+
+        try:
+            # a few spare candidates cover rows whose delete has not reached the index yet
+            matches = related_articles.related_to(article, k + 5)
+        except Exception as e:
+            print("❌ Related articles error:", e)
+            print(traceback.format_exc())
+            return Response({"error": "Related articles are unavailable"}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        articles = Article.objects.select_related("author").only(
+            "id", "title", "tags", "created_at", "author__username"
+        ).in_bulk([match_pk for match_pk, _ in matches])
+        results = []
+        for match_pk, score in matches:
+            other = articles.get(match_pk)
+            if other is None:
+                continue
+            results.append({
+                "id": other.id,
+                "title": other.title,
+                "score": round(score, 4),
+                "tags": other.tags,
+                "author": other.author.username,
+                "created_at": other.created_at,
+            })
+        return Response({"results": results[:k]}, status=status.HTTP_200_OK)
+
+    # ---------------- Near-duplicates ----------------
+    @action(detail=True, methods=["get"])
+    def duplicates(self, request, pk=None):
+        """
+        Articles whose content is a near-duplicate of this one (MinHash LSH).
+        GET /articles/{id}/duplicates/?threshold=0.8
+        """
+        if not dedup.get_setting("ENABLED"):
+            return Response({"error": "Duplicate detection is disabled"}, status=status.HTTP_404_NOT_FOUND)
+        article = self.get_object()
+        try:
+            threshold = min(max(float(request.query_params.get("threshold", dedup.get_setting("THRESHOLD"))), 0.0), 1.0)
+        except ValueError:
+            return Response({"error": "threshold must be a number between 0 and 1"}, status=status.HTTP_400_BAD_REQUEST)
+        matches = dedup.find_duplicates(article, threshold=threshold)
+        return Response({"threshold": threshold, "results": duplicate_results(matches)}, status=status.HTTP_200_OK)
+
+    # ---------------- Tag Suggestions ----------------
+    @action(detail=True, methods=["get"], url_path="tags/suggest")
+    def suggest_tags(self, request, pk=None):
+        """
+        Tags suggested for this article by local keyphrase extraction (TF-IDF
+        over the article corpus); no Gemini call, no AI usage.
+        GET /articles/{id}/tags/suggest/?limit=6
+        """
+        if not keywords.get_setting("ENABLED"):
+            return Response({"error": "Tag suggestions are disabled"}, status=status.HTTP_404_NOT_FOUND)
+        article = self.get_object()
+        try:
+            limit = min(max(int(request.query_params.get("limit", keywords.get_setting("MAX_TAGS"))), 1), 20)
+        except ValueError:
+            limit = keywords.get_setting("MAX_TAGS")
+
+        applied = set(parse_tag_string(article.tags))
+        results = [
+            {"name": name, "slug": slugify(name), "score": score, "applied": slugify(name) in applied}
+            for name, score in keywords.suggest_tags(article, limit=limit)
+        ]
+        return Response({
+            "id": article.id,
+            "tags": ", ".join(result["name"] for result in results),
+            "results": results,
+        }, status=status.HTTP_200_OK)
+
     # ---------------- Generate (returns content+tags; DOES NOT auto-save article) ----------------
-    @action(detail=False, methods=["post"], permission_classes=[IsAuthenticated])
+    @action(
+        detail=False, methods=["post"], permission_classes=[IsAuthenticated], throttle_classes=[AIQuotaThrottle],
+        renderer_classes=[*api_settings.DEFAULT_RENDERER_CLASSES, EventStreamRenderer],
+    )
     def generate(self, request):
         """
         Generate blog content + tags and return them.
         Important: This endpoint no longer auto-saves the Article.
         Frontend should call POST /articles/ to save when user publishes.
+        Pass ?refresh=1 to skip the result cache and force a new generation.
+        Pass ?stream=1 to receive the post as Server-Sent Events while it is generated.
         """
         if not request.user or not request.user.is_authenticated:
             return Response({"error": "Please login first."}, status=status.HTTP_401_UNAUTHORIZED)
@@ -107,78 +397,57 @@ class ArticleViewSet(viewsets.ModelViewSet):
         topic = request.data.get("topic", "").strip()
         if not topic:
             return Response({"error": "Topic is required"}, status=status.HTTP_400_BAD_REQUEST)
-        if not client:
+        if not ai.client:
             return Response({"error": "Gemini client not initialized"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        try:
-            prompt = (
-                f"You are a professional blog writer. Write a polished, SEO-friendly blog post about '{topic}'.\n\n"
-                "Requirements:\n"
-                " - Use a catchy title (with one emoji).\n"
-                " - Add an engaging intro paragraph.\n"
-                " - Use markdown headings (##, ###), short paragraphs, spacing, and occasional emojis.\n"
-                " - Highlight key ideas using bold or italic where helpful.\n"
-                " - End with an inspiring conclusion.\n"
-                " - Then include a section titled '### 🏷️ Related Tags' and list 6 short tags separated by commas.\n\n"
-                "Return ONLY the final markdown blog post (no extra commentary)."
-            )
-
-            resp = client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=[types.Part(text=prompt)],
-                config=types.GenerateContentConfig(temperature=0.9, max_output_tokens=3500),
+        if query_flag(request, "stream"):
+            response = streaming_response(
+                request,
+                stream_generate_events(request.user, topic, refresh=query_flag(request, "refresh")),
+                "text/event-stream",
             )
+            response["Cache-Control"] = "no-cache"
+            return response
 
-            text = extract_gemini_text(resp)
+        try:
+            text, cached, coalesced = ai.run_generate(topic, refresh=query_flag(request, "refresh"))
             if not text:
                 return Response({"error": "Empty AI response"}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Extract tag list from bottom 'Related Tags' section if present
-            tags_list = []
-            if "Related Tags" in text:
-                try:
-                    section = text.split("Related Tags", 1)[-1]
-                    section = section.replace("🏷️", "").replace("#", "")
-                    tags_list = [t.strip() for t in section.split(",") if t.strip()]
-                    # trim to 6 tags max
-                    tags_list = tags_list[:6]
-                except Exception:
-                    tags_list = []
-            if not tags_list:
-                tags_list = ["AI", "Blogging", "Innovation", "Technology", "Learning", "Creativity"]
-
-            # Estimate tokens / cost
-            tokens = max((len(topic) + len(text)) // 4, 1)
-            estimated_cost = round(tokens * TOKEN_PRICE, 6)
+            # 'Related Tags' section if present, else local keyword extraction
+            tags_list = generated_tags(text)
+
+            # Estimate tokens / cost (cache hits are free)
+            tokens, estimated_cost = estimate_usage(topic, text, cached, coalesced)
 
             # Record AI usage (article not yet created) — link article=None
-            AIUsage.objects.create(
-                user=request.user,
-                article=None,
-                feature="generate",
-                tokens_used=tokens,
-                estimated_cost=estimated_cost,
-            )
+            record_usage(request.user, None, "generate", tokens, estimated_cost, cached=cached, coalesced=coalesced)
 
             return Response({
                 "topic": topic,
                 "content": text,
                 "tags": tags_list,
                 "tokens_used": tokens,
-                "estimated_cost": estimated_cost
+                "estimated_cost": estimated_cost,
+                "cached": cached,
+                "coalesced": coalesced,
             }, status=status.HTTP_200_OK)
 
+        except AIUnavailable as e:
+            return unavailable_response(e)
         except Exception as e:
             print("❌ AI Error (generate):", e)
             print(traceback.format_exc())
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     # ---------------- Summarize (returns summary; DOES NOT save to Article) ----------------
-    @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated])
+    @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated], throttle_classes=[AIQuotaThrottle])
     def summarize(self, request, pk=None):
         """
         Generate and return a summary for the article.
         Does NOT save the summary to the Article model to avoid showing it on home page automatically.
+        While a stored auto-analysis summary matches the current content it is returned
+        without calling Gemini (pass ?refresh=1 to regenerate).
         """
         if not request.user or not request.user.is_authenticated:
             return Response({"error": "Please login first."}, status=status.HTTP_401_UNAUTHORIZED)
@@ -187,63 +456,41 @@ class ArticleViewSet(viewsets.ModelViewSet):
         content = (article.content or "").strip()
         if not content:
             return Response({"error": "Article content is empty"}, status=status.HTTP_400_BAD_REQUEST)
-        if not client:
+        stored = stored_result(article, "summarize")
+        if stored and not query_flag(request, "refresh"):
+            return Response(
+                {"summary": stored, "estimated_cost": 0.0, "cached": True, "stored": True}, status=status.HTTP_200_OK
+            )
+        if not ai.client:
             return Response({"error": "Gemini client not initialized"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        # trim to reasonable length for model
-        content_short = content[:3000]
-
         try:
-            prompt = (
-                "Summarize the following blog post in 4-6 clear, professional sentences. "
-                "Avoid bullet points. Include emojis only when relevant.\n\n"
-                f"{content_short}"
-            )
-
-            resp = client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=[types.Part(text=prompt)],
-                config=types.GenerateContentConfig(temperature=0.6, max_output_tokens=600),
-            )
-
-            summary = extract_gemini_text(resp)
-
-            # fallback retry with simpler prompt if empty
-            if not summary:
-                fallback_prompt = f"Briefly summarize this text in 2-3 sentences:\n\n{content_short[:1200]}"
-                resp2 = client.models.generate_content(
-                    model="gemini-2.5-flash",
-                    contents=[types.Part(text=fallback_prompt)],
-                    config=types.GenerateContentConfig(temperature=0.4, max_output_tokens=300),
-                )
-                summary = extract_gemini_text(resp2)
+            summary, cached, coalesced, usage = ai.run_summarize(content, refresh=query_flag(request, "refresh"))
 
             if not summary:
                 return Response({"error": "AI returned an empty summary. Try again."}, status=status.HTTP_400_BAD_REQUEST)
 
             # Log usage (we keep article reference but do NOT write summary into the model)
-            tokens = max((len(content) + len(summary)) // 4, 1)
-            estimated_cost = round(tokens * TOKEN_PRICE, 6)
-            AIUsage.objects.create(
-                user=request.user,
-                article=article,
-                feature="summarize",
-                tokens_used=tokens,
-                estimated_cost=estimated_cost,
-            )
+            tokens, estimated_cost = usage["tokens_used"], usage["estimated_cost"]
+            record_usage(request.user, article, "summarize", tokens, estimated_cost, cached=cached, coalesced=coalesced)
 
-            return Response({"summary": summary, "estimated_cost": estimated_cost}, status=status.HTTP_200_OK)
+            return Response({"summary": summary, "estimated_cost": estimated_cost, "cached": cached, "coalesced": coalesced, "chunks": usage["chunks"]}, status=status.HTTP_200_OK)
 
+        except AIUnavailable as e:
+            return unavailable_response(e)
         except Exception as e:
             print("❌ Summarization Error:", e)
             print(traceback.format_exc())
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     # ---------------- Sentiment Analysis ----------------
-    @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated])
+    @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated], throttle_classes=[AIQuotaThrottle])
     def sentiment(self, request, pk=None):
         """
         Return sentiment classification for the article content.
+        A stored auto-analysis result for the current content is returned as-is.
+        The local classifier answers when confident, else Gemini; "tier" in the
+        response says which. ?tier=local / ?tier=llm forces one of them.
         """
         if not request.user or not request.user.is_authenticated:
             return Response({"error": "Please login first."}, status=status.HTTP_401_UNAUTHORIZED)
@@ -252,46 +499,123 @@ class ArticleViewSet(viewsets.ModelViewSet):
         content = (article.content or "").strip()
         if not content:
             return Response({"error": "Article content is empty"}, status=status.HTTP_400_BAD_REQUEST)
-        if not client:
-            return Response({"error": "Gemini client not initialized"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-        content_short = content[:3000]
-
-        try:
-            prompt = (
-                "Read the article below and classify its overall sentiment as either: "
-                "'Positive', 'Negative', or 'Neutral/Mixed'. Return the classification followed by one short sentence justification.\n\n"
-                f"{content_short}"
+        tier = request.query_params.get("tier") or None
+        if tier not in SENTIMENT_TIERS:
+            return Response({"error": "tier must be 'local' or 'llm'"}, status=status.HTTP_400_BAD_REQUEST)
+        stored = stored_result(article, "sentiment")
+        if stored and not query_flag(request, "refresh") and not tier:
+            return Response(
+                {"sentiment": stored, "estimated_cost": 0.0, "cached": True, "stored": True, "tier": "stored"},
+                status=status.HTTP_200_OK,
             )
 
-            resp = client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=[types.Part(text=prompt)],
-                config=types.GenerateContentConfig(temperature=0.3, max_output_tokens=300),
-            )
-
-            sentiment_text = extract_gemini_text(resp)
+        try:
+            sentiment_text, cached, coalesced, usage = ai.run_sentiment(content, refresh=query_flag(request, "refresh"), tier=tier)
             if not sentiment_text:
                 return Response({"error": "Sentiment analysis failed. Empty AI response."}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Log usage
-            tokens = max((len(content) + len(sentiment_text)) // 4, 1)
-            estimated_cost = round(tokens * TOKEN_PRICE, 6)
-            AIUsage.objects.create(
-                user=request.user,
-                article=article,
-                feature="sentiment",
-                tokens_used=tokens,
-                estimated_cost=estimated_cost,
-            )
+            # Log usage (local answers are recorded at zero cost)
+            tokens, estimated_cost = usage["tokens_used"], usage["estimated_cost"]
+            local = usage["tier"] == "local"
+            record_usage(request.user, article, "sentiment", tokens, estimated_cost, cached=cached, coalesced=coalesced, local=local)
 
-            return Response({"sentiment": sentiment_text, "estimated_cost": estimated_cost}, status=status.HTTP_200_OK)
+            return Response({
+                "sentiment": sentiment_text,
+                "estimated_cost": estimated_cost,
+                "cached": cached,
+                "coalesced": coalesced,
+                "chunks": usage["chunks"],
+                "tier": usage["tier"],
+                "confidence": usage["confidence"],
+            }, status=status.HTTP_200_OK)
 
+        except AIUnavailable as e:
+            return unavailable_response(e)
         except Exception as e:
             print("❌ Sentiment Error:", e)
             print(traceback.format_exc())
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    # ---------------- Bulk Summarize / Sentiment ----------------
+    @action(
+        detail=False, methods=["post"], url_path="bulk-analyze",
+        permission_classes=[IsAuthenticated], throttle_classes=[AIQuotaThrottle],
+        renderer_classes=[*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer],
+    )
+    def bulk_analyze(self, request):
+        """
+        Run summarize and/or sentiment over many articles, streaming one NDJSON
+        line per (article, feature) as it completes and a final totals line.
+        Body: {"ids": [...]} or {"filter": {...}}, "features": [...], "save": bool.
+        """
+        ids = request.data.get("ids") or []
+        filters = request.data.get("filter") or {}
+        features = request.data.get("features") or list(bulk.BULK_FEATURES)
+        if not ids and not filters:
+            return Response({"error": "Provide 'ids' or 'filter'"}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(ids, list) or not isinstance(filters, dict) or not isinstance(features, list):
+            return Response({"error": "'ids' and 'features' must be lists, 'filter' an object"}, status=status.HTTP_400_BAD_REQUEST)
+        unknown = [f for f in features if f not in bulk.BULK_FEATURES]
+        if unknown:
+            return Response({"error": f"Unsupported features: {', '.join(map(str, unknown))}"}, status=status.HTTP_400_BAD_REQUEST)
+        if not ai.client:
+            return Response({"error": "Gemini client not initialized"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        try:
+            articles = bulk.resolve_articles(ids=ids, filters=filters)
+        except (ValueError, TypeError) as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        max_articles = bulk.get_setting("MAX_ARTICLES")
+        if articles.count() > max_articles:
+            return Response({"error": f"At most {max_articles} articles per request"}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = bulk.iter_bulk_analysis(
+            request.user, articles, list(dict.fromkeys(features)),
+            save=bool(request.data.get("save")),
+            refresh=query_flag(request, "refresh"),
+        )
+        return streaming_response(request, bulk.ndjson_lines(results), "application/x-ndjson")
+
+
+    # ---------------- Streaming Export ----------------
+    @action(
+        detail=False, methods=["get"], permission_classes=[IsAuthenticated],
+        renderer_classes=[NDJSONRenderer, CSVRenderer, *api_settings.DEFAULT_RENDERER_CLASSES],
+    )
+    def export(self, request):
+        """
+        Stream articles as NDJSON (default) or CSV (?format=csv), in constant memory.
+        Staff export every article, other users their own.
+        """
+        queryset = transfer.export_queryset("articles")
+        if not request.user.is_staff:
+            queryset = queryset.filter(author=request.user)
+        return export_response(request, "articles", queryset)
+
+
+# ----------------- TAGS -----------------
+class TagViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Tag cloud: tags ordered by the denormalized article_count (no GROUP BY).
+    ?limit=N returns only the N most used tags.
+    """
+    serializer_class = TagSerializer
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    lookup_field = "slug"
+
+    def get_queryset(self):
+        return Tag.objects.filter(article_count__gt=0).order_by("-article_count", "name")
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.get_queryset()
+        try:
+            limit = int(request.query_params.get("limit", 0))
+        except ValueError:
+            limit = 0
+        if limit > 0:
+            queryset = queryset[:limit]
+        return Response(self.get_serializer(queryset, many=True).data)
+
 
 # ----------------- AI USAGE LOG -----------------
 class AIUsageViewSet(viewsets.ReadOnlyModelViewSet):
@@ -301,6 +625,86 @@ class AIUsageViewSet(viewsets.ReadOnlyModelViewSet):
     def get_queryset(self):
         return AIUsage.objects.filter(user=self.request.user).select_related("article").order_by("-created_at")
 
+    @action(detail=False, methods=["get"])
+    def summary(self, request):
+        """
+        Spend summary read from the daily rollups only.
+        GET /usage/summary/?from=YYYY-MM-DD&to=YYYY-MM-DD&group_by=day|feature|day_feature|total
+        """
+        group_by = request.query_params.get("group_by", "day")
+        if group_by not in GROUP_BY_FIELDS:
+            return Response(
+                {"error": f"group_by must be one of: {', '.join(GROUP_BY_FIELDS)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        bounds = {}
+        for param in ("from", "to"):
+            value = request.query_params.get(param)
+            if not value:
+                continue
+            try:
+                bounds[param] = parse_date(value)
+            except ValueError:
+                bounds[param] = None
+            if bounds[param] is None:
+                return Response({"error": f"'{param}' must be a date (YYYY-MM-DD)"}, status=status.HTTP_400_BAD_REQUEST)
+
+        rows = usage_summary(request.user, start=bounds.get("from"), end=bounds.get("to"), group_by=group_by)
+        return Response({
+            "from": bounds.get("from"),
+            "to": bounds.get("to"),
+            "group_by": group_by,
+            "results": rows,
+        }, status=status.HTTP_200_OK)
+
+    @action(
+        detail=False, methods=["get"],
+        renderer_classes=[NDJSONRenderer, CSVRenderer, *api_settings.DEFAULT_RENDERER_CLASSES],
+    )
+    def export(self, request):
+        """
+        Stream raw AIUsage rows as NDJSON (default) or CSV (?format=csv).
+        Staff export every user's rows, other users their own.
+        """
+        queryset = transfer.export_queryset("usage")
+        if not request.user.is_staff:
+            queryset = queryset.filter(user=request.user)
+        return export_response(request, "usage", queryset)
+
+
+# ----------------- BACKGROUND AI JOBS -----------------
+class AIJobViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
+    """
+    Submit AI work to the background queue (`manage.py run_ai_worker`) and poll it.
+    POST /jobs/ -> 202 with the job; GET /jobs/{id}/ -> status; GET /jobs/{id}/result/ -> result.
+    """
+    serializer_class = AIJobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return AIJob.objects.filter(user=self.request.user).order_by("-created_at")
+
+    def get_throttles(self):
+        # submitting a job spends AI quota; polling it does not
+        if self.action == "create":
+            return [AIQuotaThrottle()]
+        return super().get_throttles()
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save(user=request.user)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=["get"])
+    def result(self, request, pk=None):
+        job = self.get_object()
+        if job.status == AIJob.SUCCEEDED:
+            return Response({"status": job.status, "result": job.result}, status=status.HTTP_200_OK)
+        if job.status == AIJob.DEAD:
+            return Response({"status": job.status, "error": job.error}, status=status.HTTP_409_CONFLICT)
+        return Response({"status": job.status, "attempts": job.attempts}, status=status.HTTP_202_ACCEPTED)
+
 
 # ----------------- CURRENT USER -----------------
 class CurrentUserView(APIView):
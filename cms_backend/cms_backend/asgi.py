@@ -5,6 +5,12 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Served by gunicorn with uvicorn workers (see Procfile and gunicorn.conf.py),
+so the async AI endpoints under /api/async/ run on each worker's event loop
+instead of tying up a worker thread each. Streaming responses (SSE,
+NDJSON, exports) are handed to the server as async iterators by
+articles/streaming.py so they still flush chunk by chunk.
 """
 
 import os
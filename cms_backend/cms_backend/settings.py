@@ -4,6 +4,7 @@ Django settings for cms_backend project.
 Generated by 'django-admin startproject' using Django 5.2.7.
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,6 +43,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',  # Must be first
+    'articles.metrics.MetricsMiddleware',  # Times everything below it
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -114,6 +116,282 @@ SIMPLE_JWT = {
     "AUTH_HEADER_TYPES": ("Bearer",),
 }
 
+# -----------------------------
+# AI Result Cache
+# -----------------------------
+# Gemini results are cached by (feature, model, prompt version, config, input hash).
+# TIERS are looked up in order; the first is the per-process LRU, the second
+# persists across worker restarts (swap in articles.ai_cache.FileTier for a
+# file-backed store under FILE_DIR).
+AI_CACHE = {
+    "ENABLED": True,
+    "FEATURES": ["generate", "summarize", "sentiment"],
+    "TTL": 7 * 24 * 3600,
+    "TIERS": [
+        "articles.ai_cache.MemoryTier",
+        "articles.ai_cache.DatabaseTier",
+    ],
+    "MEMORY_MAX_ENTRIES": 1024,
+    "MEMORY_MAX_BYTES": 8 * 1024 * 1024,
+    "FILE_DIR": BASE_DIR / "ai_cache",
+}
+# -----------------------------
+# Background AI Jobs
+# -----------------------------
+# Jobs submitted to /api/jobs/ are executed by `python manage.py run_ai_worker`.
+# Failed attempts back off RETRY_BACKOFF * 2^n seconds and are dead-lettered
+# after MAX_ATTEMPTS; a RUNNING job whose lease is older than LEASE_TIMEOUT
+# seconds is picked up again by another worker.
+AI_JOBS = {
+    "CONCURRENCY": 4,
+    "MAX_ATTEMPTS": 3,
+    "RETRY_BACKOFF": 5,
+    "POLL_INTERVAL": 1.0,
+    "LEASE_TIMEOUT": 300,
+}
+# -----------------------------
+# Bulk AI Analysis
+# -----------------------------
+# POST /api/articles/bulk-analyze/ and `manage.py bulk_analyze` fan out to
+# Gemini on at most CONCURRENCY threads, starting at most RATE_PER_MINUTE
+# calls per user per minute (0 disables pacing). API runs also take each
+# call from the user's AI_QUOTA, waiting up to MAX_QUOTA_WAIT seconds for it.
+AI_BULK = {
+    "CONCURRENCY": 8,
+    "RATE_PER_MINUTE": 120,
+    "MAX_ARTICLES": 1000,
+    "MAX_QUOTA_WAIT": 60,
+}
+# -----------------------------
+# Buffered AI Usage Writer
+# -----------------------------
+# AIUsage rows are queued in-process and written with one bulk_create when
+# MAX_SIZE events are waiting or every FLUSH_INTERVAL seconds (and at exit).
+# Set SPOOL_DIR to also append events to a local file so they survive a crash.
+AI_USAGE_BUFFER = {
+    "ENABLED": True,
+    "MAX_SIZE": 100,
+    "FLUSH_INTERVAL": 2.0,
+    "SPOOL_DIR": None,
+}
+# -----------------------------
+# AI Quotas
+# -----------------------------
+# Checked before every AI action: requests per minute (token bucket) and
+# tokens per day, per user and across all users; 0 disables a limit.
+# BACKEND "memory" keeps state per process; "redis" shares it via REDIS_URL.
+# Daily totals are re-synced from AIUsage every RECONCILE_INTERVAL seconds.
+AI_QUOTA = {
+    "ENABLED": True,
+    "BACKEND": "memory",
+    "REDIS_URL": "redis://localhost:6379/0",
+    "USER_REQUESTS_PER_MINUTE": 20,
+    "GLOBAL_REQUESTS_PER_MINUTE": 300,
+    "USER_TOKENS_PER_DAY": 200000,
+    "GLOBAL_TOKENS_PER_DAY": 5000000,
+    "RECONCILE_INTERVAL": 60,
+}
+# -----------------------------
+# Auto-analysis
+# -----------------------------
+# Opt-in: when an article is created or its content changes, queue one
+# background job (run_ai_worker) that stores FEATURES on the article, so the
+# summarize / sentiment actions become plain reads. Summaries are stored
+# unpublished and stay off the home page.
+AI_AUTO_ANALYSIS = {
+    "ENABLED": False,
+    "FEATURES": ["summarize", "sentiment"],
+}
+# -----------------------------
+# Caches / anonymous article response cache
+# -----------------------------
+# Any Django backend works, e.g. FileBasedCache with a LOCATION directory or
+# "django.core.cache.backends.redis.RedisCache" with LOCATION "redis://...".
+# Anonymous GETs of /api/articles/ and /api/articles/{id}/ are cached in
+# CACHE_ALIAS for up to TIMEOUT seconds and invalidated by generation counters.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+}
+ARTICLE_RESPONSE_CACHE = {
+    "ENABLED": True,
+    "CACHE_ALIAS": "default",
+    "TIMEOUT": 300,
+}
+# -----------------------------
+# Gemini Resilience
+# -----------------------------
+# Every Gemini call gets TIMEOUT seconds per attempt and DEADLINE overall,
+# retrying up to MAX_RETRIES times on timeouts / 429 / 5xx with jittered
+# exponential backoff. FAILURE_THRESHOLD consecutive failures open the
+# circuit for RESET_TIMEOUT seconds (requests fail fast with 503).
+# HEDGE_ENABLED starts summarize's fallback prompt once the main prompt has
+# taken HEDGE_DELAY seconds instead of waiting for it to come back empty.
+AI_RESILIENCE = {
+    "TIMEOUT": 30.0,
+    "DEADLINE": 60.0,
+    "MAX_RETRIES": 2,
+    "BACKOFF_BASE": 0.5,
+    "BACKOFF_MAX": 8.0,
+    "FAILURE_THRESHOLD": 5,
+    "RESET_TIMEOUT": 30.0,
+    "HEDGE_ENABLED": False,
+    "HEDGE_DELAY": 2.0,
+}
+# -----------------------------
+# AI Single-flight
+# -----------------------------
+# Identical AI calls (same feature, model and input) running at the same time
+# share one upstream call; the extra requesters get usage rows marked
+# coalesced with no token spend. DISTRIBUTED also coalesces across worker
+# processes through a lock in CACHE_ALIAS, which must then be a shared
+# cache (Redis or file based, not locmem).
+AI_SINGLE_FLIGHT = {
+    "ENABLED": True,
+    "DISTRIBUTED": False,
+    "CACHE_ALIAS": "default",
+    "LOCK_TIMEOUT": 90,
+    "POLL_INTERVAL": 0.1,
+    "RESULT_TTL": 30,
+}
+# -----------------------------
+# Fake Gemini (offline)
+# -----------------------------
+# FAKE_GEMINI=1 replaces the Gemini client with articles.fake_gemini, so the
+# app and `manage.py bench_api` run without an API key or network. Latency
+# follows DISTRIBUTION (constant, uniform, normal, lognormal, exponential)
+# around LATENCY seconds with JITTER spread; OUTPUT_TOKENS pads replies.
+AI_FAKE_GEMINI = {
+    "ENABLED": os.getenv("FAKE_GEMINI") == "1",
+    "LATENCY": 0.5,
+    "DISTRIBUTION": "lognormal",
+    "JITTER": 0.3,
+    "OUTPUT_TOKENS": 400,
+    "FAILURE_RATE": 0.0,
+    "EMPTY_RATE": 0.0,
+    "SEED": 42,
+}
+# -----------------------------
+# Prometheus Metrics
+# -----------------------------
+# GET /metrics serves request, DB, Gemini, AI usage and cache metrics (set
+# AUTH_TOKEN to require "Authorization: Bearer <token>"). The Procfile's
+# gunicorn workers share metrics through PROMETHEUS_MULTIPROC_DIR, which
+# gunicorn.conf.py sets up.
+METRICS = {
+    "ENABLED": True,
+    "AUTH_TOKEN": None,
+}
+# -----------------------------
+# Chunked Summarization
+# -----------------------------
+# Articles longer than CHUNK_CHARS are split on headings and paragraphs;
+# each chunk is summarized / classified on its own (at most CONCURRENCY at a
+# time, each cached by its own hash) and the partial results are combined by
+# a reduce prompt. Sections under MIN_CHUNK_CHARS merge into the next one.
+AI_CHUNKING = {
+    "ENABLED": True,
+    "CHUNK_CHARS": 3000,
+    "MIN_CHUNK_CHARS": 400,
+    "MAX_CHUNKS": 24,
+    "CONCURRENCY": 4,
+}
+# -----------------------------
+# Related Articles
+# -----------------------------
+# GET /api/articles/{id}/related/?k= ranks articles by cosine similarity of
+# DIM-dimensional float32 vectors kept in memory-mapped files under INDEX_DIR
+# (updated on save / delete; `manage.py rebuild_related_index` re-encodes
+# everything). ENCODER is a dotted path to a class taking ``dim`` with an
+# ``encode(texts)`` method, so an embedding model can replace the default
+# hashed n-grams; changing it or DIM needs a rebuild.
+RELATED_ARTICLES = {
+    "ENABLED": True,
+    "INDEX_DIR": BASE_DIR / "related_index",
+    "ENCODER": "articles.related.HashedNgramEncoder",
+    "DIM": 256,
+    "BATCH_ROWS": 65536,
+    "MAX_K": 50,
+}
+# -----------------------------
+# Near-duplicate Detection
+# -----------------------------
+# Every saved article gets a MinHash signature over SHINGLE_SIZE-word shingles
+# and BANDS LSH band keys; GET /api/articles/{id}/duplicates/ lists articles
+# whose estimated Jaccard similarity is at least THRESHOLD. The optional
+# pre-publish check is off by default; set CHECK_ON_CREATE to "flag" to add
+# the matches to create responses, or "reject" to answer 409 unless ?force=1.
+# Changing the shingle or signature settings needs
+# `manage.py rebuild_duplicate_index`.
+ARTICLE_DEDUP = {
+    "ENABLED": True,
+    "SHINGLE_SIZE": 3,
+    "NUM_PERM": 128,
+    "BANDS": 16,
+    "SEED": 1,
+    "THRESHOLD": 0.8,
+    "MAX_CANDIDATES": 1000,
+    "CHECK_ON_CREATE": "off",
+}
+# -----------------------------
+# Import / Export
+# -----------------------------
+# GET /api/articles/export/ and /api/usage/export/ (?format=ndjson|csv) and
+# `manage.py export_data` stream rows fetched CHUNK_SIZE at a time;
+# `manage.py import_data` upserts BATCH_SIZE records per transaction.
+DATA_TRANSFER = {
+    "CHUNK_SIZE": 2000,
+    "BATCH_SIZE": 500,
+}
+# -----------------------------
+# Tag suggestions
+# -----------------------------
+# GET /api/articles/{id}/tags/suggest/ and `manage.py suggest_tags` score
+# keyphrases locally with TF-IDF; document frequencies are kept up to date on
+# every article save. Changing MAX_PHRASE_WORDS or MIN_WORD_LENGTH needs
+# `manage.py rebuild_keyword_index`.
+TAG_SUGGESTIONS = {
+    "ENABLED": True,
+    "MAX_TAGS": 6,
+    "MAX_PHRASE_WORDS": 2,
+    "MIN_WORD_LENGTH": 2,
+    "TITLE_WEIGHT": 3.0,
+    "PHRASE_WEIGHT": 0.5,
+    "MIN_PHRASE_COUNT": 2,
+    "KNOWN_TAG_WEIGHT": 1.5,
+    "MAX_DOC_RATIO": 0.5,
+    "MIN_CORPUS_SIZE": 20,
+}
+# -----------------------------
+# Local sentiment tier
+# -----------------------------
+# The sentiment actions (and bulk/queued sentiment) ask a local classifier
+# first and only call Gemini when its confidence is below THRESHOLD. Local
+# answers are recorded in AIUsage with local=True at zero cost. CLASSIFIER
+# "auto" uses the model saved by `manage.py train_sentiment_model` (trained
+# from stored Gemini labels) when it exists, else a word lexicon.
+LOCAL_SENTIMENT = {
+    "ENABLED": True,
+    "CLASSIFIER": "auto",
+    "THRESHOLD": 0.8,
+    "MODEL_PATH": BASE_DIR / "sentiment_model.joblib",
+    "MIN_TRAINING_LABELS": 50,
+}
+# -----------------------------
+# Article rendering
+# -----------------------------
+# Article.save() renders the markdown content to sanitized HTML, a table of
+# contents (headings up to TOC_MAX_LEVEL) and a reading time, stored on the
+# row; ?format=html on the article endpoints returns the stored HTML.
+# Requests never render: run `manage.py render_articles` after migrating
+# (existing rows have empty rendered fields until then) and after changing
+# these settings, which marks every row stale.
+ARTICLE_RENDERING = {
+    "ENABLED": True,
+    "WORDS_PER_MINUTE": 200,
+    "TOC_MAX_LEVEL": 3,
+}
 
 STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
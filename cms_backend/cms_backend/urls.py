@@ -18,6 +18,7 @@ Including another URLconf
 
 from django.contrib import admin
 from django.urls import path, include
+from articles.metrics import metrics_view
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
@@ -33,6 +34,7 @@ urlpatterns = [
     path('', include('articles.urls')), # Assuming articles.urls is where your API root is defined
     
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),   
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'), 
     path('api/', include('articles.urls')),   
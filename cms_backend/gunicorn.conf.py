@@ -0,0 +1,36 @@
+# gunicorn.conf.py
+"""
+gunicorn settings for serving the ASGI app with several uvicorn worker
+processes (the Procfile's web process):
+
+    gunicorn cms_backend.asgi:application -c gunicorn.conf.py
+
+Every worker writes its Prometheus metrics to files in
+PROMETHEUS_MULTIPROC_DIR (a temp directory unless set) and /metrics
+aggregates them (see articles/metrics.py). The directory is emptied when
+gunicorn starts, and a dead worker's live gauges are dropped.
+"""
+import os
+import shutil
+import tempfile
+
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+# async views (/api/async/) run on each worker's event loop
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# set before the workers fork and import prometheus_client
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "cms-metrics"))
+
+
+def on_starting(server):
+    # metric files from a previous run would be added to the new totals
+    directory = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    # drop the dead worker's live gauges (in-flight requests)
+    multiprocess.mark_process_dead(worker.pid)
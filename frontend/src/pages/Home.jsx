@@ -6,6 +6,7 @@ import ReactMarkdown from 'react-markdown';
 
 function Home() {
   const [articles, setArticles] = useState([]);
+  const [nextPage, setNextPage] = useState(null);
   const [user, setUser] = useState(null);
   const navigate = useNavigate();
 
@@ -14,10 +15,12 @@ function Home() {
     fetchUser();
   }, []);
 
-  const fetchArticles = async () => {
+  // List is cursor-paginated: { next, previous, results }
+  const fetchArticles = async (url = 'articles/') => {
     try {
-      const res = await axiosInstance.get('articles/');
-      setArticles(res.data);
+      const res = await axiosInstance.get(url);
+      setArticles((prev) => (url === 'articles/' ? res.data.results : [...prev, ...res.data.results]));
+      setNextPage(res.data.next);
     } catch (err) {
       console.error('Error fetching articles', err);
     }
@@ -83,10 +86,7 @@ const handleDelete = async (id) => {
                 </p>
                 <div className="text-gray-700 text-base leading-relaxed line-clamp-5 prose prose-sm max-w-none">
   <ReactMarkdown>
-    {article.summary ||
-      (article.content?.length > 300
-        ? article.content.slice(0, 300) + '...'
-        : article.content)}
+    {article.summary || article.excerpt}
   </ReactMarkdown>
 </div>
 
@@ -122,6 +122,17 @@ const handleDelete = async (id) => {
           ))}
         </div>
       )}
+
+      {nextPage && (
+        <div className="flex justify-center mt-8">
+          <button
+            onClick={() => fetchArticles(nextPage)}
+            className="px-5 py-2 rounded-lg border border-gray-300 text-gray-700 hover:bg-gray-100"
+          >
+            Load more
+          </button>
+        </div>
+      )}
     </div>
   );
 }